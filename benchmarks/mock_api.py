@@ -0,0 +1,213 @@
+"""
+A local stand-in for the ClouDNS API endpoints used by the plugin.
+
+Zones and records are kept in memory. Every response can be delayed by a
+fixed latency, and a share of the requests can be answered with throttling
+(HTTP 429) or server errors (HTTP 500).
+"""
+import collections
+import contextlib
+import itertools
+import json
+import multiprocessing
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qsl
+from urllib.parse import urlsplit
+
+MISSING_ZONE = {"status": "Failed", "statusDescription": "Missing domain-name"}
+
+
+class MockClouDNSAPI:
+    """Serves the mocked API on localhost until stopped."""
+
+    def __init__(self, zones=(), latency=0.0, throttle_rate=0.0,
+                 error_rate=0.0, seed=0):
+        self.zones = {zone: {} for zone in zones}
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.calls = collections.Counter()
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.api = self
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+
+    @property
+    def endpoint(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def record_count(self):
+        with self._lock:
+            return sum(len(records) for records in self.zones.values())
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def handle(self, path, params):
+        """Returns the HTTP status and JSON payload for a request."""
+        if path == '/_stats':
+            with self._lock:
+                return 200, {"calls": dict(self.calls),
+                             "records": sum(map(len, self.zones.values()))}
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            self.calls[path] += 1
+            roll = self._random.random()
+            if roll < self.throttle_rate:
+                return 429, {"status": "Failed",
+                             "statusDescription": "Too many requests"}
+            if roll < self.throttle_rate + self.error_rate:
+                return 500, {"status": "Failed",
+                             "statusDescription": "Internal error"}
+
+            handler = _ENDPOINTS.get(path)
+            if handler is None:
+                return 404, {"status": "Failed",
+                             "statusDescription": "Not found"}
+            return 200, handler(self, params)
+
+    def _get_zone_info(self, params):
+        zone = params.get('domain-name')
+        if zone not in self.zones:
+            return MISSING_ZONE
+        return {"name": zone, "type": "master", "zone": "domain",
+                "status": "1"}
+
+    def _get_pages_count(self, params):
+        rows = int(params['rows-per-page'])
+        return -(-len(self.zones) // rows)
+
+    def _list_zones(self, params):
+        rows = int(params['rows-per-page'])
+        start = (int(params['page']) - 1) * rows
+        return [{"name": zone, "type": "master", "zone": "domain",
+                 "status": "1"}
+                for zone in sorted(self.zones)[start:start + rows]]
+
+    def _list_records(self, params):
+        records = self.zones.get(params.get('domain-name'))
+        if records is None:
+            return MISSING_ZONE
+        matches = [
+            (record_id, record) for record_id, record in records.items()
+            if params.get('host') in (None, record['host'])
+            and params.get('type') in (None, record['type'])
+        ]
+        if 'rows-per-page' in params:
+            rows = int(params['rows-per-page'])
+            start = (int(params.get('page', 1)) - 1) * rows
+            matches = matches[start:start + rows]
+        return dict(matches) or []
+
+    def _add_record(self, params):
+        records = self.zones.get(params.get('domain-name'))
+        if records is None:
+            return MISSING_ZONE
+        record_id = str(next(self._ids))
+        records[record_id] = {
+            "id": record_id, "type": params['record-type'],
+            "host": params.get('host', ''), "record": params['record'],
+            "ttl": params.get('ttl', '3600'), "status": 1,
+        }
+        return {"status": "Success",
+                "statusDescription": "The record was added successfully.",
+                "data": {"id": int(record_id)}}
+
+    def _delete_record(self, params):
+        records = self.zones.get(params.get('domain-name'))
+        if records is None:
+            return MISSING_ZONE
+        if records.pop(params.get('record-id'), None) is None:
+            return {"status": "Failed",
+                    "statusDescription": "Invalid record-id param."}
+        return {"status": "Success",
+                "statusDescription": "The record was deleted successfully."}
+
+    def _is_updated(self, params):
+        return params.get('domain-name') in self.zones
+
+
+@contextlib.contextmanager
+def serve_in_subprocess(**kwargs):
+    """
+    Run the mocked API in a separate process, so it does not affect the
+    measurements of the calling process. Statistics are available from the
+    ``/_stats`` endpoint.
+
+    :returns: The endpoint of the mocked API.
+    """
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(child, kwargs),
+                                      daemon=True)
+    process.start()
+    try:
+        yield parent.recv()
+    finally:
+        process.terminate()
+        process.join()
+
+
+def _serve(connection, kwargs):
+    api = MockClouDNSAPI(**kwargs).start()
+    connection.send(api.endpoint)
+    api._thread.join()
+
+
+_ENDPOINTS = {
+    '/dns/get-zone-info.json': MockClouDNSAPI._get_zone_info,
+    '/dns/get-pages-count.json': MockClouDNSAPI._get_pages_count,
+    '/dns/list-zones.json': MockClouDNSAPI._list_zones,
+    '/dns/records.json': MockClouDNSAPI._list_records,
+    '/dns/add-record.json': MockClouDNSAPI._add_record,
+    '/dns/delete-record.json': MockClouDNSAPI._delete_record,
+    '/dns/is-updated.json': MockClouDNSAPI._is_updated,
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        if self.command == 'POST':
+            length = int(self.headers.get('Content-Length') or 0)
+            params.update(parse_qsl(self.rfile.read(length).decode()))
+
+        status, payload = self.server.api.handle(url.path, params)
+        body = json.dumps(payload).encode()
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_GET
+
+    def log_message(self, *args):
+        pass
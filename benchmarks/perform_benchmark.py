@@ -0,0 +1,85 @@
+"""
+Measures the time needed to create and delete TXT records for many domains
+against a mocked ClouDNS API with a configurable latency.
+
+    poetry run python benchmarks/perform_benchmark.py --domains 100
+"""
+import argparse
+import collections
+import itertools
+import time
+from unittest import mock
+
+from certbot_dns_cloudns._internal import client
+from certbot_dns_cloudns._internal import transport
+from certbot_dns_cloudns._internal.client import ClouDNSClient
+
+ZONE = "example.com"
+
+
+class Credentials:
+    def conf(self, key):
+        return {"auth-id": "1234", "auth-password": "secret"}.get(key)
+
+
+def mocked_api(latency):
+    # Every record has its own id, as records are deleted by their id
+    ids = collections.defaultdict(itertools.count(1).__next__)
+
+    def api_request(api_method, **kwargs):
+        time.sleep(latency)
+        if api_method is transport.ZONE_GET:
+            if kwargs["domain_name"] != ZONE:
+                raise client.ApiErrorResponse(
+                    {"status_code": 200, "error": "Missing domain-name"}
+                )
+            return {"name": ZONE}
+        if api_method is transport.RECORD_CREATE:
+            record_id = ids[kwargs["host"], kwargs["record"]]
+            return {"status": "Success", "data": {"id": record_id}}
+        if api_method is transport.RECORD_LIST:
+            record_id = ids[kwargs["host"], "token"]
+            return {str(record_id): {"record": "token"}}
+        return {}
+    return api_request
+
+
+def run(domains, latency, max_workers):
+    records = [
+        (f"host{i}.{ZONE}", f"_acme-challenge.host{i}.{ZONE}", "token")
+        for i in range(domains)
+    ]
+    cloudns = ClouDNSClient(Credentials(), max_workers=max_workers)
+
+    with mock.patch.object(ClouDNSClient, "_api_request",
+                           side_effect=mocked_api(latency)) as api_request:
+        start = time.perf_counter()
+        cloudns.add_txt_records(records, 60)
+        perform = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cloudns.del_txt_records(records)
+        cleanup = time.perf_counter() - start
+
+    return perform, cleanup, api_request.call_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--domains", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="Simulated API latency in seconds.")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=[1, 10, client.DEFAULT_MAX_WORKERS * 5])
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'perform [s]':>12} {'cleanup [s]':>12} "
+          f"{'API calls':>10}")
+    for max_workers in args.workers:
+        perform, cleanup, calls = run(args.domains, args.latency, max_workers)
+        print(f"{max_workers:>8} {perform:>12.3f} {cleanup:>12.3f} "
+              f"{calls:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+End-to-end benchmark of the authenticator's perform and cleanup phases
+against a local mock of the ClouDNS API and a local stub DNS server.
+
+For each scenario (number of SANs on the certificate, number of zones in the
+account), reports the wall-clock time of perform and cleanup, the number of
+API calls per certificate and the peak memory allocated by the plugin.
+
+    poetry run python benchmarks/suite.py
+    poetry run python benchmarks/suite.py --full --output results.json
+    poetry run python benchmarks/suite.py --baseline results.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import types
+import urllib.request
+from unittest import mock
+
+import dns.resolver
+from acme import challenges
+from acme import messages
+from certbot import achallenges
+from certbot.plugins.dns_test_common import KEY
+from certbot.tests import acme_util
+from mock_api import serve_in_subprocess
+
+from certbot_dns_cloudns._internal import resolve
+from certbot_dns_cloudns._internal.authenticator import Authenticator
+from certbot_dns_cloudns._internal.client import BatchError
+from certbot_dns_cloudns._internal.tests.dns_stub import StubDNSServer
+
+QUICK_SANS = (1, 10, 100)
+QUICK_ZONES = (10, 1000)
+FULL_SANS = (1, 10, 100, 1000)
+FULL_ZONES = (10, 100, 1000, 10000)
+
+# Every n-th validation name is delegated to a shared challenge zone
+DELEGATION_INTERVAL = 4
+
+
+def zone_names(count):
+    return [f"zone{i}.example" for i in range(count)]
+
+
+def domain_names(sans, zones):
+    return [f"host{i}.zone{i % zones}.example" for i in range(sans)]
+
+
+def challenge_target(domain):
+    # Certbot 4 replaced the `domain` of annotated challenges by `identifier`
+    if "identifier" in achallenges.KeyAuthorizationAnnotatedChallenge.__slots__:
+        return {"identifier": messages.Identifier(
+            typ=messages.IDENTIFIER_FQDN, value=domain
+        )}
+    return {"domain": domain}
+
+
+def challenges_for(domains):
+    return [
+        achallenges.KeyAuthorizationAnnotatedChallenge(
+            challb=acme_util.chall_to_challb(
+                challenges.DNS01(token=os.urandom(16)),
+                messages.STATUS_PENDING
+            ),
+            account_key=KEY,
+            **challenge_target(domain)
+        )
+        for domain in domains
+    ]
+
+
+def write_credentials(directory, endpoint):
+    path = os.path.join(directory, "cloudns.ini")
+    with open(path, "w") as credentials:
+        credentials.write(f"cloudns_auth_id=1234\n"
+                          f"cloudns_auth_password=secret\n"
+                          f"cloudns_api_endpoint={endpoint}\n"
+                          f"cloudns_rate_limit=0\n")
+    os.chmod(path, 0o600)
+    return path
+
+
+def make_authenticator(directory, credentials, domains, args):
+    config = types.SimpleNamespace(
+        work_dir=directory,
+        domains=domains,
+        cloudns_credentials=credentials,
+        cloudns_nameserver=None,
+        cloudns_query_timeout=None,
+        cloudns_propagation_seconds=0 if args.propagation_mode == "sleep"
+        else 60,
+        cloudns_propagation_mode=args.propagation_mode,
+        cloudns_max_workers=args.workers,
+        cloudns_zone_lookup=args.zone_lookup,
+        cloudns_zone_cache_ttl=0,
+        cloudns_metrics_file=None,
+        cloudns_metrics_format="json",
+        cloudns_daemon_socket=None,
+        cloudns_prewarm=args.prewarm,
+    )
+    return Authenticator(config, "cloudns")
+
+
+def api_stats(endpoint):
+    with urllib.request.urlopen(endpoint + "/_stats") as response:
+        return json.load(response)
+
+
+def run_scenario(sans, zones, dns_server, args):
+    domains = domain_names(sans, zones)
+    for i, domain in enumerate(domains):
+        if i % DELEGATION_INTERVAL == 0:
+            dns_server.set(f"_acme-challenge.{domain}", "CNAME",
+                           "_acme-challenge.zone0.example.")
+    achalls = challenges_for(domains)
+
+    with tempfile.TemporaryDirectory() as directory, serve_in_subprocess(
+            zones=zone_names(zones), latency=args.latency,
+            throttle_rate=args.throttle_rate, error_rate=args.error_rate,
+    ) as endpoint:
+        credentials = write_credentials(directory, endpoint)
+        auth = make_authenticator(directory, credentials, domains, args)
+        resolve._aliases.clear()
+
+        tracemalloc.start()
+        with mock.patch("certbot.display.util.notify"):
+            start = time.perf_counter()
+            auth.prepare()
+            prepare = time.perf_counter() - start
+
+            # Creating records is not retried after server errors, so
+            # injected errors fail some of the domains
+            failed = {}
+            start = time.perf_counter()
+            try:
+                auth.perform(achalls)
+            except BatchError as e:
+                failed = e.failures
+            perform = time.perf_counter() - start
+
+            start = time.perf_counter()
+            auth.cleanup([achall for achall, domain in zip(achalls, domains)
+                          if domain not in failed])
+            cleanup = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        stats = api_stats(endpoint)
+        auth._get_client().close()
+
+    return {
+        "sans": sans,
+        "zones": zones,
+        "prepare_seconds": prepare,
+        "perform_seconds": perform,
+        "cleanup_seconds": cleanup,
+        "api_calls": sum(stats["calls"].values()),
+        "failed_domains": sorted(failed),
+        "leftover_records": stats["records"],
+        "peak_memory_bytes": peak,
+    }
+
+
+def print_results(results, baseline):
+    reference = {(result["sans"], result["zones"]): result
+                 for result in baseline or []}
+
+    print(f"{'SANs':>5} {'zones':>6} {'prepare [s]':>12} {'perform [s]':>12} "
+          f"{'cleanup [s]':>12} {'API calls':>10} {'failed':>7} "
+          f"{'leftover':>9} {'peak [KiB]':>11} {'vs. baseline':>13}")
+    for result in results:
+        previous = reference.get((result["sans"], result["zones"]))
+        total = result["perform_seconds"] + result["cleanup_seconds"]
+        comparison = ""
+        if previous:
+            reference_total = (previous["perform_seconds"]
+                               + previous["cleanup_seconds"])
+            comparison = f"{total / reference_total:.2f}x"
+        print(f"{result['sans']:>5} {result['zones']:>6} "
+              f"{result.get('prepare_seconds', 0):>12.3f} "
+              f"{result['perform_seconds']:>12.3f} "
+              f"{result['cleanup_seconds']:>12.3f} "
+              f"{result['api_calls']:>10} "
+              f"{len(result.get('failed_domains', ())):>7} "
+              f"{result['leftover_records']:>9} "
+              f"{result['peak_memory_bytes'] / 1024:>11.0f} "
+              f"{comparison:>13}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip(),
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--full", action="store_true",
+                        help="Run 1 to 1000 SANs against 10 to 10000 zones.")
+    parser.add_argument("--sans", type=int, nargs="+")
+    parser.add_argument("--zones", type=int, nargs="+")
+    parser.add_argument("--latency", type=float, default=0.005,
+                        help="Simulated API latency in seconds.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="Share of API requests answered with HTTP 429.")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Share of API requests answered with HTTP 500.")
+    parser.add_argument("--workers", type=int, default=10)
+    parser.add_argument("--zone-lookup", default="probe",
+                        choices=("probe", "inventory"))
+    parser.add_argument("--propagation-mode", default="sleep",
+                        choices=("sleep", "api"),
+                        help="Skip the propagation wait, or ask the mock API "
+                             "whether the zones are updated.")
+    parser.add_argument("--prewarm", action="store_true",
+                        help="Find the zones while preparing the plugin, "
+                             "before the challenges are performed.")
+    parser.add_argument("--output", help="Write the results to a JSON file.")
+    parser.add_argument("--baseline",
+                        help="Compare with results written by --output.")
+    args = parser.parse_args()
+
+    sans = args.sans or (FULL_SANS if args.full else QUICK_SANS)
+    zones = args.zones or (FULL_ZONES if args.full else QUICK_ZONES)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+
+    results = []
+    with StubDNSServer() as dns_server:
+        resolver = dns.resolver.Resolver(configure=False)
+        resolver.nameservers = [dns_server.address]
+        resolver.port = dns_server.port
+        with mock.patch.object(resolve, "_get_resolver",
+                               return_value=resolver):
+            for zone_count in zones:
+                for san_count in sans:
+                    results.append(run_scenario(san_count, zone_count,
+                                                dns_server, args))
+
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"arguments": vars(args), "results": results}, output,
+                      indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Compares probing candidate zone names with listing all zones of the account
+when finding the zones of many record names, against a mocked ClouDNS API
+with a configurable latency.
+
+    poetry run python benchmarks/zone_lookup_benchmark.py --zones 5000
+"""
+import argparse
+import random
+import time
+from unittest import mock
+
+from certbot_dns_cloudns._internal import client
+from certbot_dns_cloudns._internal import transport
+from certbot_dns_cloudns._internal.client import ClouDNSClient
+
+
+class Credentials:
+    def conf(self, key):
+        return {"auth-id": "1234", "auth-password": "secret"}.get(key)
+
+
+def mocked_api(zones, latency):
+    zone_set = set(zones)
+
+    def api_request(api_method, **kwargs):
+        time.sleep(latency)
+        if api_method is transport.ZONE_GET:
+            if kwargs["domain_name"] not in zone_set:
+                raise client.ApiErrorResponse(
+                    {"status_code": 200, "error": "Missing domain-name"}
+                )
+            return {"name": kwargs["domain_name"]}
+        if api_method is transport.ZONE_PAGE_COUNT:
+            return -(-len(zones) // kwargs["rows_per_page"])
+        if api_method is transport.ZONE_LIST:
+            start = (kwargs["page"] - 1) * kwargs["rows_per_page"]
+            return [{"name": zone}
+                    for zone in zones[start:start + kwargs["rows_per_page"]]]
+        raise AssertionError(f"Unexpected API call {api_method}")
+    return api_request
+
+
+def run(zone_lookup, zones, record_names, latency, max_workers):
+    cloudns = ClouDNSClient(Credentials(), max_workers=max_workers,
+                            zone_lookup=zone_lookup)
+
+    with mock.patch.object(ClouDNSClient, "_api_request",
+                           side_effect=mocked_api(zones, latency)) as api:
+        start = time.perf_counter()
+        for record_name in record_names:
+            cloudns.find_zone_and_host(record_name)
+        return time.perf_counter() - start, api.call_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--zones", type=int, default=1000)
+    parser.add_argument("--domains", type=int, default=200)
+    parser.add_argument("--depth", type=int, default=3,
+                        help="Number of labels below the zone apex.")
+    parser.add_argument("--latency", type=float, default=0.005,
+                        help="Simulated API latency in seconds.")
+    parser.add_argument("--workers", type=int,
+                        default=client.DEFAULT_MAX_WORKERS)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    zones = [f"zone{i}.example" for i in range(args.zones)]
+    record_names = [
+        "_acme-challenge." + ".".join(
+            f"l{level}" for level in range(args.depth - 1)
+        ) + f".{rng.choice(zones)}"
+        for _ in range(args.domains)
+    ]
+
+    print(f"{args.zones} zones, {args.domains} record names, "
+          f"{args.latency * 1000:.1f} ms latency")
+    print(f"{'strategy':>10} {'time [s]':>10} {'API calls':>10}")
+    for zone_lookup in client.ZONE_LOOKUP_MODES:
+        elapsed, calls = run(zone_lookup, zones, record_names, args.latency,
+                             args.workers)
+        print(f"{zone_lookup:>10} {elapsed:>10.3f} {calls:>10}")
+
+
+if __name__ == "__main__":
+    main()
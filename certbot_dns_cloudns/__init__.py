@@ -12,11 +12,65 @@ Named Arguments
                                       to propagate before asking the ACME
                                       server to verify the DNS record.
                                       `(Default: 60)`
+``--dns-cloudns-propagation-mode``    How to wait for DNS to propagate:
+                                      ``sleep`` waits for the full
+                                      propagation seconds, ``poll`` queries
+                                      the zone's authoritative nameservers
+                                      until all TXT records are visible,
+                                      ``api`` asks ClouDNS until it reports
+                                      the zones as updated on all of its
+                                      nameservers. Both wait at most the
+                                      propagation seconds.
+                                      `(Default: sleep)`
 ``--dns-cloudns-nameserver``          Nameserver used to resolve CNAME
                                       aliases. (See the
                                       `Challenge Delegation`_ section
-                                      below.)
+                                      below.) Several nameservers can be
+                                      separated by commas; queries are sent
+                                      to all of them in parallel, the first
+                                      answer is used and nameservers which
+                                      keep failing are skipped for a while.
                                       `(Default: System default)`
+``--dns-cloudns-query-timeout``       The number of seconds after which a
+                                      DNS query to a nameserver is
+                                      abandoned.
+                                      `(Default: dnspython default; 5 when
+                                      polling for propagation)`
+``--dns-cloudns-max-workers``         The maximum number of concurrent
+                                      ClouDNS API operations when creating
+                                      or deleting records.
+                                      `(Default: 10)`
+``--dns-cloudns-metrics-file``        Write the number of calls, errors and
+                                      latencies of the plugin's operations
+                                      (API requests, alias resolution, zone
+                                      lookups, propagation wait) to this file
+                                      at the end of the run.
+``--dns-cloudns-metrics-format``      The format of the metrics file:
+                                      ``json`` or ``prometheus`` (text
+                                      format, e.g. for the node_exporter
+                                      textfile collector).
+                                      `(Default: json)`
+``--dns-cloudns-zone-lookup``         How to find the zone of a record:
+                                      ``probe`` looks up each candidate zone
+                                      name, ``inventory`` lists all zones of
+                                      the account once, which is faster for
+                                      many domains and deep subdomains.
+                                      `(Default: probe)`
+``--dns-cloudns-zone-cache-ttl``      The number of seconds zone lookups are
+                                      cached in Certbot's work directory
+                                      across runs. ``0`` disables the cache.
+                                      `(Default: 86400)`
+``--dns-cloudns-prewarm``             Resolve the CNAME aliases and find
+                                      the zones of the requested domains
+                                      before the ACME order is placed, so
+                                      lookup failures are reported early and
+                                      only the records are created once the
+                                      challenges are issued.
+``--dns-cloudns-daemon-socket``       Send the records to a running
+                                      daemon listening on this Unix socket
+                                      instead of using the ClouDNS API
+                                      directly. (See the `Daemon Mode`_
+                                      section below.)
 ===================================== =====================================
 
 Credentials
@@ -35,6 +89,42 @@ credentials.
    # API password
    dns_cloudns_auth_password=password1
 
+   # Optional settings for the connection to the ClouDNS API:
+   # Base URL of the API (default: https://api.cloudns.net)
+   # dns_cloudns_api_endpoint=https://api.cloudns.net
+   # Maximum number of connections kept alive (default: 10)
+   # dns_cloudns_pool_size=10
+   # Timeout of each request in seconds (default: 45)
+   # dns_cloudns_timeout=45
+   # Number of retries of throttled or transiently failing requests,
+   # with exponential backoff (default: 3)
+   # dns_cloudns_retries=3
+   # Maximum number of requests per second, 0 to disable (default: 20)
+   # dns_cloudns_rate_limit=20
+   # Number of requests which may be sent at once before the rate limit
+   # applies (default: same as the rate limit)
+   # dns_cloudns_rate_burst=20
+
+Zones spread over several ClouDNS accounts or sub-accounts can be managed in
+a single run by listing the accounts and prefixing their settings with the
+account name. Each record is routed to the account listing the longest
+matching zone in its ``zones`` setting, or otherwise to the first account in
+which its zone is found. The records of different accounts are created and
+deleted in parallel. Settings other than the user ID and password fall back
+to the unprefixed value.
+
+.. code-block:: ini
+
+   dns_cloudns_accounts=main, shop
+
+   dns_cloudns_main_auth_id=1234
+   dns_cloudns_main_auth_password=password1
+
+   dns_cloudns_shop_sub_auth_user=shop
+   dns_cloudns_shop_auth_password=password2
+   # Optional: the zones of the account, to avoid looking them up
+   dns_cloudns_shop_zones=shop.example.com, example.net
+
 The path to this file can be provided interactively or using the
 ``--dns-cloudns-credentials`` command-line argument. Certbot records the
 path to this file for use during renewal, but does not store the file's
@@ -83,7 +173,83 @@ DNS server. In some setups, especially corporate networks, the challenged
 domain might be resolved by a local server instead, hiding configured CNAME and
 TXT records from Certbot. In these cases setting the
 ``--dns-cloudns-nameserver`` option to any public nameserver (e.g. ``1.1.1.1``)
-should resolve the issue.
+should resolve the issue. Listing several public nameservers (e.g.
+``1.1.1.1,8.8.8.8,9.9.9.9``) keeps the lookups fast when one of them is slow
+or unreachable.
+
+Daemon Mode
+-----------
+Hosts renewing many certificates can run a long-lived daemon which manages
+the challenge records on behalf of all Certbot runs. The daemon reads the
+credentials once and keeps its connections to the ClouDNS API, the zones
+it has found and the resolved CNAME aliases across runs.
+
+.. code-block:: bash
+
+   certbot-dns-cloudns daemon \
+     --credentials ~/.secrets/certbot/cloudns.ini \
+     --socket /run/certbot-dns-cloudns.sock
+
+Certbot runs then pass the socket instead of the credentials:
+
+.. code-block:: bash
+
+   certbot certonly \
+     --authenticator dns-cloudns \
+     --dns-cloudns-daemon-socket /run/certbot-dns-cloudns.sock \
+     -d example.com
+
+The socket is only accessible by the user running the daemon, since anyone
+able to connect to it can create and delete records of the account.
+
+Other ACME Clients
+------------------
+``certbot-dns-cloudns add`` and ``certbot-dns-cloudns delete`` create and
+delete the challenge records of many domains in one process, sharing the
+zone lookups, resolved aliases and API connections between them. They read a
+domain and validation per line from ``--input`` (or stdin), and print a JSON
+object per record with its outcome. ``add --wait SECONDS`` waits until
+ClouDNS reports the zones as updated.
+
+.. code-block:: bash
+
+   certbot-dns-cloudns add --credentials ~/.secrets/certbot/cloudns.ini <<EOF
+   example.com $TOKEN1
+   *.example.com $TOKEN2
+   EOF
+
+Without ``--input``, the ``CERTBOT_DOMAIN`` and ``CERTBOT_VALIDATION``
+variables are used if set, so the commands also work as Certbot's
+``--manual-auth-hook`` and ``--manual-cleanup-hook``.
+
+Stale Records
+-------------
+The records created by the plugin are recorded in a journal in Certbot's work
+directory until they are deleted. If a run is interrupted, the next run
+deletes the records it left behind by their ID.
+
+Challenge records of other crashed or interrupted runs (e.g. using the
+daemon) are left behind in the zones. ``certbot-dns-cloudns sweep`` lists the
+TXT records of all zones of the account (or of each ``--zone``) and deletes
+the ``_acme-challenge`` records that are stale. As ClouDNS does not report
+when records were created, each sweep records in a state file when it first
+saw each record, and records are deleted once an earlier sweep has seen them
+at least ``--min-age`` seconds (default: one hour) ago. Use ``--dry-run`` to
+only report them.
+
+.. code-block:: bash
+
+   certbot-dns-cloudns sweep \
+     --credentials ~/.secrets/certbot/cloudns.ini \
+     --dry-run
+
+Profiling
+---------
+Setting the ``CERTBOT_DNS_CLOUDNS_PROFILE`` environment variable to a
+directory writes a cProfile dump of the plugin's import, ``prepare``,
+credentials setup, ``perform`` and ``cleanup`` phases to it (readable with
+``python -m pstats``), and appends the duration of each phase to
+``timings.jsonl`` in the directory.
 
 Examples
 --------
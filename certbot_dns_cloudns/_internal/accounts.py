@@ -0,0 +1,341 @@
+"""Routing of records to the ClouDNS accounts their zones belong to."""
+import concurrent.futures
+import logging
+import re
+
+from certbot import errors
+
+from certbot_dns_cloudns._internal.client import BatchError
+from certbot_dns_cloudns._internal.client import ClouDNSClient
+from certbot_dns_cloudns._internal.client import DEFAULT_MAX_WORKERS
+from certbot_dns_cloudns._internal.zones import ZoneIndex
+
+logger = logging.getLogger(__name__)
+
+USER_ID_KEYS = ('auth-id', 'sub-auth-id', 'sub-auth-user')
+AUTH_KEYS = USER_ID_KEYS + ('auth-password',)
+
+ACCOUNT_NAME = re.compile(r'^[a-z0-9_]+$')
+
+
+def account_names(credentials):
+    """
+    Get the names of the accounts listed in the credentials.
+
+    :returns: The account names, or an empty list if the credentials are
+        those of a single account.
+    :rtype: list
+    """
+    return [name for name in re.split(r'[\s,]+',
+                                      credentials.conf('accounts') or '')
+            if name]
+
+
+class AccountCredentials:
+    """
+    The credentials of one of several accounts, whose settings are prefixed
+    with the account name.
+
+    Settings other than the auth params fall back to the unprefixed value.
+    """
+
+    def __init__(self, credentials, account):
+        self.credentials = credentials
+        self.account = account
+
+    def conf(self, key):
+        value = self.credentials.conf(f"{self.account}-{key}")
+        if value is None and key not in AUTH_KEYS:
+            value = self.credentials.conf(key)
+        return value
+
+    def mapper(self, key):
+        return self.credentials.mapper(f"{self.account}-{key}")
+
+
+def validate_accounts(credentials):
+    """
+    Validate the settings of each account listed in the credentials.
+
+    :raises certbot.errors.PluginError: if the settings are invalid.
+    """
+    names = account_names(credentials)
+    problems = []
+    for name in names:
+        if not ACCOUNT_NAME.match(name):
+            problems.append(f"Invalid account name {name!r}; use lowercase "
+                            f"letters, digits and underscores.")
+            continue
+
+        account = AccountCredentials(credentials, name)
+        user_count = sum(int(account.conf(key) is not None)
+                         for key in USER_ID_KEYS)
+        if user_count != 1:
+            problems.append(
+                f"Expected exactly one of "
+                f"{', '.join(map(account.mapper, USER_ID_KEYS))}; "
+                f"found {user_count}."
+            )
+        if account.conf('auth-password') is None:
+            problems.append(f"Property {account.mapper('auth-password')} "
+                            f"not found (should be API password).")
+
+    if len(set(names)) != len(names):
+        problems.append("Accounts are listed more than once.")
+
+    if problems:
+        raise errors.PluginError(
+            f"Invalid accounts in credentials configuration file "
+            f"{credentials.confobj.filename}:\n" +
+            "\n".join(f" * {problem}" for problem in problems)
+        )
+
+
+def make_client(credentials, **kwargs):
+    """
+    Create a client for the accounts in the credentials.
+
+    :returns: A `.MultiAccountClient` if several accounts are listed,
+        otherwise a `.ClouDNSClient`.
+    """
+    names = account_names(credentials)
+    if not names:
+        return ClouDNSClient(credentials, **kwargs)
+
+    return MultiAccountClient(
+        {name: ClouDNSClient(AccountCredentials(credentials, name), **kwargs)
+         for name in names},
+        zones={name: AccountCredentials(credentials, name).conf('zones')
+               for name in names},
+        max_workers=kwargs.get('max_workers', DEFAULT_MAX_WORKERS)
+    )
+
+
+class MultiAccountClient:
+    """
+    Manages records in zones spread over several ClouDNS accounts.
+
+    Each record name is routed to the account with the longest zone suffix
+    listed in `zones`, or otherwise to the first account in which its zone is
+    found. Each account has its own `.ClouDNSClient`, and the records of
+    different accounts are processed in parallel.
+    """
+
+    def __init__(self, clients, zones=None, max_workers=DEFAULT_MAX_WORKERS):
+        self.clients = clients
+        self.max_workers = max_workers
+        self._zone_index = ZoneIndex()
+        self._zone_accounts = {}
+        self._routes = {}
+
+        for account, account_zones in (zones or {}).items():
+            for zone in re.split(r'[\s,]+', account_zones or ''):
+                if zone:
+                    zone = zone.lower().rstrip('.')
+                    self._zone_index.add(zone)
+                    self._zone_accounts[zone] = account
+
+    def add_txt_records(self, records, record_ttl):
+        """
+        Add several TXT records, in parallel for all accounts.
+
+        :param list records: Tuples of the domain to be verified, the record
+            name and the record content.
+        :param int record_ttl: The record TTL (in seconds).
+        :raises .BatchError: if an error occurs for any of the domains.
+        """
+        groups, failures = self._group_by_account(records)
+        failures.update(self._run_per_account(
+            lambda client, account_records: client.add_txt_records(
+                account_records, record_ttl
+            ),
+            groups
+        ))
+        if failures:
+            raise BatchError(failures)
+
+    def del_txt_records(self, records):
+        """
+        Delete several TXT records, in parallel for all accounts.
+
+        Failures are logged and returned, but not raised.
+
+        :param list records: Tuples of the domain to be verified, the record
+            name and the record content.
+        :returns: The exceptions raised, keyed by domain.
+        :rtype: dict
+        """
+        def delete(client, account_records):
+            failures = client.del_txt_records(account_records)
+            if failures:
+                raise BatchError(failures)
+
+        groups, failures = self._group_by_account(records)
+        failures.update(self._run_per_account(delete, groups))
+        return failures
+
+    def prepare(self, record_names):
+        """
+        Find the accounts and zones of records ahead of adding them.
+
+        :param list record_names: The record names.
+        :raises .BatchError: if no zone is found for any of the record names,
+            keyed by record name.
+        """
+        groups, failures = self._group_by_account(
+            (record_name, record_name, None)
+            for record_name in dict.fromkeys(record_names)
+        )
+        failures.update(self._run_per_account(
+            lambda client, records: client.prepare(
+                [record_name for _, record_name, _ in records]
+            ),
+            groups
+        ))
+        if failures:
+            raise BatchError(failures)
+
+    def delete_journaled_records(self):
+        """
+        Delete the records left behind by previous runs, in parallel for all
+        accounts.
+        """
+        self._run_per_account(
+            lambda client, _: client.delete_journaled_records(),
+            {account: [] for account in self.clients}
+        )
+
+    def wait_for_updates(self, record_names, timeout):
+        """
+        Wait until ClouDNS reports the zones of the given records as updated,
+        in parallel for all accounts.
+
+        :param list record_names: The record names.
+        :param float timeout: The maximum number of seconds to wait.
+        :returns: Whether all zones were updated before the timeout.
+        :rtype: bool
+        :raises certbot.errors.PluginError: if a zone is not found.
+        """
+        groups = {}
+        for record_name in record_names:
+            groups.setdefault(self.find_account(record_name),
+                              []).append(record_name)
+        if not groups:
+            return True
+
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=len(groups)
+        ) as executor:
+            return all(list(executor.map(
+                lambda account: self.clients[account].wait_for_updates(
+                    groups[account], timeout
+                ),
+                groups
+            )))
+
+    def find_account(self, record_name):
+        """
+        Find the account managing the zone of a record.
+
+        :param str record_name: The record name.
+        :returns: The account name.
+        :rtype: str
+        :raises certbot.errors.PluginError: if no account manages the zone.
+        """
+        if record_name in self._routes:
+            return self._routes[record_name]
+
+        zone = self._zone_index.find(record_name)
+        if zone is not None:
+            account = self._zone_accounts[zone]
+        else:
+            account = self._probe_accounts(record_name)
+
+        logger.debug(f"Using account {account} for {record_name}.")
+        self._routes[record_name] = account
+        return account
+
+    def _probe_accounts(self, record_name):
+        problems = []
+        for account, client in self.clients.items():
+            try:
+                client.find_zone_and_host(record_name)
+            except errors.PluginError as e:
+                problems.append(f"{account}: {e}")
+            else:
+                return account
+
+        raise errors.PluginError(
+            f"Unable to find zone for {record_name} in any of the accounts:"
+            f"\n" + "\n".join(f" * {problem}" for problem in problems)
+        )
+
+    def _group_by_account(self, records):
+        """
+        Group records by the account managing their zone.
+
+        :returns: The records of each account, and the errors of records for
+            which no account was found, keyed by domain.
+        :rtype: tuple
+        """
+        records = list(records)
+        groups = {}
+        failures = {}
+        if not records:
+            return groups, failures
+
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(records))
+        ) as executor:
+            futures = {executor.submit(self.find_account, record[1]): record
+                       for record in records}
+            for future, record in futures.items():
+                try:
+                    groups.setdefault(future.result(), []).append(record)
+                except errors.PluginError as e:
+                    logger.debug('No account found for %s', record[0],
+                                 exc_info=e)
+                    failures[record[0]] = e
+        return groups, failures
+
+    def _run_per_account(self, operation, groups):
+        """
+        Run an operation for the records of each account in parallel.
+
+        :returns: The exceptions raised, keyed by domain.
+        :rtype: dict
+        """
+        if not groups:
+            return {}
+
+        failures = {}
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=len(groups)
+        ) as executor:
+            futures = {
+                executor.submit(operation, self.clients[account], records):
+                    records
+                for account, records in groups.items()
+            }
+            for future, records in futures.items():
+                error = future.exception()
+                if isinstance(error, BatchError):
+                    failures.update(error.failures)
+                elif error is not None:
+                    failures.update((record[0], error) for record in records)
+        return failures
+
+    @property
+    def request_stats(self):
+        """
+        Counts of the API requests of each account.
+
+        :rtype: dict
+        """
+        return {account: client.request_stats
+                for account, client in self.clients.items()}
+
+    def close(self):
+        """Close all pooled connections of all accounts."""
+        for client in self.clients.values():
+            client.close()
@@ -0,0 +1,146 @@
+"""Asyncio interface to the ClouDNS API and CNAME alias resolution."""
+import asyncio
+import logging
+
+from certbot_dns_cloudns._internal.client import BatchError
+from certbot_dns_cloudns._internal.client import DEFAULT_MAX_WORKERS
+from certbot_dns_cloudns._internal.resolve import resolve_alias_async
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncClouDNSClient:
+    """
+    Encapsulates all communication with the ClouDNS API for use within an
+    event loop.
+
+    API requests are sent by the wrapped `.ClouDNSClient`, whose transport is
+    blocking, on threads of the event loop's executor. At most `concurrency`
+    calls of the wrapped client run at any time. Batches are passed to the
+    wrapped client whole, so they are sent by its own pool of threads.
+    """
+
+    def __init__(self, client, concurrency=DEFAULT_MAX_WORKERS):
+        self.client = client
+        self.concurrency = concurrency
+        self._semaphore = None
+
+    async def find_zone_and_host(self, record_name):
+        """
+        Find the zone and host for a given record name.
+
+        :param str record_name: The record name.
+        :returns: The zone name and host name.
+        :raises certbot.errors.PluginError: if no zone is found.
+        """
+        return await self._run(self.client.find_zone_and_host, record_name)
+
+    async def add_txt_record(self, domain, record_name, record_content,
+                             record_ttl):
+        """
+        Add a TXT record using the supplied information.
+
+        :param str domain: The domain to be verified.
+        :param str record_name: The record name.
+        :param str record_content: The record content.
+        :param int record_ttl: The record TTL (in seconds).
+        :raises certbot.errors.PluginError: if an error occurs.
+        """
+        await self._run(self.client.add_txt_record, domain, record_name,
+                        record_content, record_ttl)
+
+    async def list_txt_records(self, record_name):
+        """
+        List the TXT records with the given name.
+
+        :param str record_name: The record name.
+        :returns: The records, keyed by their record_id.
+        :rtype: dict
+        :raises certbot.errors.PluginError: if an error occurs.
+        """
+        zone, host = await self.find_zone_and_host(record_name)
+        return await self._run(self.client.list_txt_records, zone, host)
+
+    async def del_txt_record(self, domain, record_name, record_content):
+        """
+        Delete a TXT record using the supplied information.
+
+        Failures are logged, but not raised.
+
+        :param str domain: The domain to be verified.
+        :param str record_name: The record name.
+        :param str record_content: The record content.
+        """
+        await self._run(self.client.del_txt_record, domain, record_name,
+                        record_content)
+
+    async def add_txt_records(self, records, record_ttl, nameserver=None):
+        """
+        Resolve the aliases of several TXT records concurrently and add them
+        as a single batch.
+
+        :param list records: Tuples of the domain to be verified, the
+            validation name and the record content.
+        :param int record_ttl: The record TTL (in seconds).
+        :param str nameserver: The nameserver used to resolve aliases.
+        :raises .BatchError: if an error occurs for any of the domains.
+        """
+        records, failures = await self._resolve_aliases(records, nameserver)
+        if records:
+            try:
+                await self._run(self.client.add_txt_records, records,
+                                record_ttl)
+            except BatchError as e:
+                failures.update(e.failures)
+        if failures:
+            raise BatchError(failures)
+
+    async def del_txt_records(self, records, nameserver=None):
+        """
+        Resolve the aliases of several TXT records concurrently and delete
+        them as a single batch.
+
+        Failures are logged, but not raised.
+
+        :param list records: Tuples of the domain to be verified, the
+            validation name and the record content.
+        :param str nameserver: The nameserver used to resolve aliases.
+        """
+        records, _ = await self._resolve_aliases(records, nameserver)
+        if records:
+            await self._run(self.client.del_txt_records, records)
+
+    async def _resolve_aliases(self, records, nameserver):
+        """
+        Replace the validation names of records by their CNAME targets.
+
+        :returns: The resolved records, and the exceptions raised while
+            resolving, keyed by domain.
+        :rtype: tuple
+        """
+        records = list(records)
+        results = await asyncio.gather(
+            *(resolve_alias_async(validation_name, nameserver)
+              for _, validation_name, _ in records),
+            return_exceptions=True
+        )
+
+        resolved = []
+        failures = {}
+        for (domain, _, record_content), result in zip(records, results):
+            if isinstance(result, Exception):
+                logger.debug('Resolving the alias for %s failed', domain,
+                             exc_info=result)
+                failures[domain] = result
+            else:
+                resolved.append((domain, result, record_content))
+        return resolved, failures
+
+    async def _run(self, function, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, function, *args
+            )
@@ -1,19 +1,106 @@
 """DNS Authenticator using CLouDNS API."""
+import concurrent.futures
 import functools
 import logging
+import time
 
 import zope.interface
+from acme import challenges
 from certbot import errors
 from certbot import interfaces
+from certbot.compat import os
+from certbot.display import util as display_util
 from certbot.plugins import dns_common
 
-from certbot_dns_cloudns._internal.client import ClouDNSClient
-from certbot_dns_cloudns._internal.resolve import resolve_alias
+from certbot_dns_cloudns._internal.profiling import Phase
+from certbot_dns_cloudns._internal.profiling import profiled
+
+# Certbot imports the plugin on startup, so importing the plugin's modules is
+# profiled as a phase of its own. The phase also ends if the import fails.
+with Phase('import'):
+    from certbot_dns_cloudns._internal import metrics
+    from certbot_dns_cloudns._internal.accounts import account_names
+    from certbot_dns_cloudns._internal.accounts import make_client
+    from certbot_dns_cloudns._internal.accounts import validate_accounts
+    from certbot_dns_cloudns._internal.cache import DEFAULT_ZONE_CACHE_TTL
+    from certbot_dns_cloudns._internal.cache import ZoneCache
+    from certbot_dns_cloudns._internal.client import DEFAULT_MAX_WORKERS
+    from certbot_dns_cloudns._internal.client import ZONE_LOOKUP_MODES
+    from certbot_dns_cloudns._internal.client import ZONE_LOOKUP_PROBE
+    from certbot_dns_cloudns._internal.journal import RecordJournal
+
+# dnspython, and the modules using it, are only imported on first use, since
+# certbot imports all plugins on startup
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_NETWORK_TIMEOUT = 45
 
+PROPAGATION_MODES = ('sleep', 'poll', 'api')
+
+ZONE_CACHE_FILE = 'cloudns-zones.json'
+JOURNAL_FILE = 'cloudns-records.jsonl'
+
+
+def challenge_domain(achall):
+    """
+    Get the domain of an annotated challenge.
+
+    Certbot 4 replaced the `domain` attribute of annotated challenges with
+    `identifier`, which older versions do not have.
+
+    :param certbot.achallenges.AnnotatedChallenge achall: The challenge.
+    :rtype: str
+    """
+    identifier = getattr(achall, 'identifier', None)
+    if identifier is not None:
+        return identifier.value
+    return achall.domain
+
+
+def validation_domain_name(domain):
+    """
+    Get the name of the TXT record validating a domain.
+
+    :param str domain: The domain, which may be a wildcard.
+    :rtype: str
+    """
+    return challenges.DNS01().validation_domain_name(
+        domain[2:] if domain.startswith('*.') else domain
+    )
+
+
+def validate_credentials(credentials):
+    """
+    Validate the properties of a credentials configuration file.
+
+    :param certbot.plugins.dns_common.CredentialsConfiguration credentials:
+        The credentials.
+    :raises certbot.errors.PluginError: if a property is missing or
+        unexpected.
+    """
+    if account_names(credentials):
+        validate_accounts(credentials)
+    else:
+        credentials.require({'auth-password': 'API password'})
+        _validate_user_ids(credentials)
+
+
+def _validate_user_ids(credentials):
+    required_keys = ('auth-id', 'sub-auth-id', 'sub-auth-user')
+    user_count = sum(int(credentials.conf(key) is not None)
+                     for key in required_keys)
+
+    if user_count != 1:
+        raise errors.PluginError(
+            f"{'Missing' if user_count == 0 else 'Unexpected'} "
+            f"{'property' if user_count <= 2 else 'properties'} in "
+            f"credentials configuration file "
+            f"{credentials.confobj.filename}:\n * Expected exactly one of "
+            f"{', '.join(map(credentials.mapper, required_keys))}; "
+            f"found {user_count}."
+        )
+
 
 @zope.interface.implementer(interfaces.IAuthenticator)
 @zope.interface.provider(interfaces.IPluginFactory)
@@ -36,39 +123,157 @@ class Authenticator(dns_common.DNSAuthenticator):
             add, default_propagation_seconds=60
         )
         add('credentials', help='ClouDNS credentials INI file.')
-        add('nameserver', help='The nameserver used to resolve CNAME aliases.')
+        add('nameserver',
+            help='The nameserver used to resolve CNAME aliases. Several '
+                 'nameservers can be separated by commas; each query is then '
+                 'sent to all of them in parallel and the first answer is '
+                 'used, skipping nameservers which keep failing for a while.')
+        add('query-timeout', type=float,
+            help='The number of seconds after which a DNS query to a '
+                 'nameserver is abandoned. (default: dnspython default; 5 '
+                 'when polling for propagation)')
+        add('max-workers', type=int, default=DEFAULT_MAX_WORKERS,
+            help='The maximum number of concurrent ClouDNS API operations.')
+        add('zone-lookup', default=ZONE_LOOKUP_PROBE,
+            choices=ZONE_LOOKUP_MODES,
+            help='How to find the zone of a record: "probe" looks up each '
+                 'candidate zone name, "inventory" lists all zones of the '
+                 'account once and matches record names locally.')
+        add('zone-cache-ttl', type=int, default=DEFAULT_ZONE_CACHE_TTL,
+            help='The number of seconds zone lookups are cached in the work '
+                 'directory across runs. Set to 0 to disable the cache.')
+        add('metrics-file',
+            help='Write the number of calls, errors and latencies of the '
+                 'plugin\'s operations to this file at the end of the run.')
+        add('metrics-format', default=metrics.FORMAT_JSON,
+            choices=metrics.FORMATS,
+            help='The format of the metrics file: a JSON summary, or the '
+                 'Prometheus text format (e.g. for the node_exporter textfile '
+                 'collector).')
+        add('propagation-mode', default='sleep', choices=PROPAGATION_MODES,
+            help='How to wait for DNS to propagate: "sleep" waits for the '
+                 'full propagation seconds, "poll" queries the authoritative '
+                 'nameservers until all records are visible, "api" asks '
+                 'ClouDNS until it reports the zones as updated on all of its '
+                 'nameservers. Both use the propagation seconds as an upper '
+                 'bound.')
+        add('prewarm', action='store_true', default=False,
+            help='Resolve the CNAME aliases and find the zones of the '
+                 'requested domains while Certbot prepares the plugin, before '
+                 'the ACME order is placed, so that only the records need to '
+                 'be created once the challenges are issued. Failures are '
+                 'reported before the order is placed.')
+        add('daemon-socket',
+            help='Send the records to a running "certbot-dns-cloudns daemon" '
+                 'listening on this Unix socket, instead of using the '
+                 'ClouDNS API directly. No credentials are read in this '
+                 'mode.')
 
     @staticmethod
     def more_info():
         return ('This plugin configures a DNS TXT record to respond to a '
                 'dns-01 challenge using the ClouDNS API.')
 
+    @profiled('prepare')
+    def prepare(self):
+        if self.conf('prewarm') and self.config.domains:
+            self._prewarm(self.config.domains)
+
+    def _prewarm(self, domains):
+        """
+        Resolve the aliases and find the zones of the validation names of the
+        given domains concurrently.
+
+        :param list domains: The requested domains.
+        :raises certbot.errors.PluginError: if any of the lookups fails.
+        """
+        records = [(domain, validation_domain_name(domain), None)
+                   for domain in dict.fromkeys(domains)]
+
+        if self.conf('daemon-socket'):
+            self._get_daemon_client().prepare(records)
+            return
+
+        self._setup_credentials()
+        self._get_client().delete_journaled_records()
+        self._get_client().prepare(
+            set(self._resolve_aliases(records).values())
+        )
+
+    @profiled('setup_credentials')
     def _setup_credentials(self):
         self.credentials = self._configure_credentials(
             'credentials',
             'ClouDNS credentials INI file',
-            {
-                'auth-password': 'API password',
-            },
-            self._validate_user_ids
+            None,
+            validate_credentials
         )
 
-    @staticmethod
-    def _validate_user_ids(credentials):
-        required_keys = ('auth-id', 'sub-auth-id', 'sub-auth-user')
-        user_count = sum(int(credentials.conf(key) is not None)
-                         for key in required_keys)
-
-        if user_count != 1:
-            raise errors.PluginError(
-                f"{'Missing' if user_count == 0 else 'Unexpected'} "
-                f"{'property' if user_count <= 2 else 'properties'} in "
-                f"credentials configuration file "
-                f"{credentials.confobj.filename}:\n * Expected exactly one of "
-                f"{', '.join(map(credentials.mapper, required_keys))}; "
-                f"found {user_count}."
+    @profiled('perform')
+    def perform(self, achalls):
+        records = self._challenge_records(achalls)
+
+        if self.conf('daemon-socket'):
+            self._attempt_cleanup = True
+            nameservers = self._start_nameserver_discovery(records)
+            self._get_daemon_client().add_txt_records(records, self.ttl)
+        else:
+            self._setup_credentials()
+
+            self._attempt_cleanup = True
+
+            self._get_client().delete_journaled_records()
+            aliases = self._resolve_aliases(records)
+            nameservers = self._start_nameserver_discovery(records)
+            self._get_client().add_txt_records(
+                [(domain, aliases[validation_name], validation)
+                 for domain, validation_name, validation in records],
+                self.ttl
             )
 
+        self._wait_for_propagation(records, nameservers)
+
+        return [achall.response(achall.account_key) for achall in achalls]
+
+    @profiled('cleanup')
+    def cleanup(self, achalls):
+        try:
+            if self._attempt_cleanup and self.conf('daemon-socket'):
+                self._get_daemon_client().del_txt_records(
+                    self._challenge_records(achalls)
+                )
+            elif self._attempt_cleanup:
+                records = self._challenge_records(achalls)
+                aliases = self._resolve_aliases(records)
+                self._get_client().del_txt_records(
+                    [(domain, aliases[validation_name], validation)
+                     for domain, validation_name, validation in records]
+                )
+                logger.debug("ClouDNS API requests: %s",
+                             self._get_client().request_stats)
+        finally:
+            self._write_metrics()
+
+    def _write_metrics(self):
+        path = self.conf('metrics-file')
+        if not path:
+            return
+
+        try:
+            metrics.REGISTRY.write(path, self.conf('metrics-format'))
+        except OSError as e:
+            logger.warning(f"Unable to write metrics to {path}", exc_info=e)
+
+    @staticmethod
+    def _challenge_records(achalls):
+        records = []
+        for achall in achalls:
+            domain = challenge_domain(achall)
+            records.append((domain,
+                            achall.validation_domain_name(domain),
+                            achall.validation(achall.account_key)))
+        return records
+
     def _perform(self, _domain, validation_name, validation):
         self._get_client().add_txt_record(
             _domain, self._resolve_alias(validation_name), validation, self.ttl
@@ -79,10 +284,143 @@ class Authenticator(dns_common.DNSAuthenticator):
             _domain, self._resolve_alias(validation_name), validation
         )
 
+    def _start_nameserver_discovery(self, records):
+        """
+        In poll mode, look up the authoritative nameservers of the records in
+        the background, while the records are being created.
+
+        :returns: A future of the nameservers keyed by record name, or None.
+        :rtype: concurrent.futures.Future
+        """
+        if self.conf('propagation-mode') != 'poll':
+            return None
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        try:
+            return executor.submit(self._find_nameservers, records)
+        finally:
+            executor.shutdown(wait=False)
+
+    def _find_nameservers(self, records):
+        from certbot_dns_cloudns._internal import propagation
+
+        return propagation.find_nameservers(
+            self._resolve_aliases(records).values(),
+            nameserver=self._get_nameserver(),
+            max_workers=self.conf('max-workers')
+        )
+
+    @metrics.timed('propagation_wait')
+    def _wait_for_propagation(self, records, nameservers=None):
+        timeout = self.conf('propagation-seconds')
+        mode = self.conf('propagation-mode')
+
+        if mode != 'sleep':
+            display_util.notify(f"Waiting up to {timeout} seconds for DNS "
+                                f"changes to propagate")
+            start = time.monotonic()
+            try:
+                if mode == 'api':
+                    propagated = self._wait_for_zone_updates(records, timeout)
+                else:
+                    propagated = self._poll_propagation(records, timeout,
+                                                        nameservers)
+                if propagated:
+                    logger.debug("DNS changes propagated after %.1f seconds",
+                                 time.monotonic() - start)
+                elif mode == 'api':
+                    logger.warning("ClouDNS has not reported the zones as "
+                                   "updated on all nameservers within %d "
+                                   "seconds", timeout)
+                else:
+                    logger.warning("DNS changes have not been observed on "
+                                   "all authoritative nameservers within %d "
+                                   "seconds", timeout)
+                return
+            except Exception as e:  # pylint: disable=broad-except
+                logger.warning("Unable to check DNS propagation; falling back "
+                               "to sleeping", exc_info=e)
+                timeout = max(0, timeout - (time.monotonic() - start))
+
+        display_util.notify(f"Waiting {timeout:.0f} seconds for DNS changes "
+                            f"to propagate")
+        time.sleep(timeout)
+
+    def _poll_propagation(self, records, timeout, nameservers=None):
+        from certbot_dns_cloudns._internal import propagation
+
+        if nameservers is not None:
+            nameservers = nameservers.result()
+        else:
+            nameservers = self._find_nameservers(records)
+
+        aliases = self._resolve_aliases(records)
+        expected = {}
+        for _, validation_name, validation in records:
+            record_name = aliases[validation_name]
+            if record_name not in expected:
+                expected[record_name] = (nameservers[record_name], set())
+            expected[record_name][1].add(validation)
+
+        return propagation.wait_for_txt_records(
+            expected, timeout,
+            query_timeout=(self.conf('query-timeout') or
+                           propagation.DEFAULT_QUERY_TIMEOUT),
+            max_workers=self.conf('max-workers')
+        )
+
+    def _wait_for_zone_updates(self, records, timeout):
+        if self.conf('daemon-socket'):
+            return self._get_daemon_client().wait_for_updates(records,
+                                                              timeout)
+
+        return self._get_client().wait_for_updates(
+            set(self._resolve_aliases(records).values()), timeout
+        )
+
     def _resolve_alias(self, validation_name):
+        from certbot_dns_cloudns._internal.resolve import resolve_alias
+
         return resolve_alias(validation_name,
-                             nameserver=self.conf('nameserver'))
+                             nameserver=self._get_nameserver())
+
+    def _resolve_aliases(self, records):
+        from certbot_dns_cloudns._internal.resolve import resolve_aliases
+
+        return resolve_aliases(
+            [validation_name for _, validation_name, _ in records],
+            nameserver=self._get_nameserver(),
+            max_workers=self.conf('max-workers')
+        )
+
+    def _get_nameserver(self):
+        """
+        Get the configured nameservers, applying the configured query timeout
+        to the resolvers.
+        """
+        from certbot_dns_cloudns._internal import resolve
+
+        resolve.configure(query_timeout=self.conf('query-timeout'))
+        return self.conf('nameserver')
+
+    def _get_daemon_client(self):
+        from certbot_dns_cloudns._internal.daemon import DaemonClient
+
+        return DaemonClient(self.conf('daemon-socket'))
 
     @functools.lru_cache(maxsize=None)
     def _get_client(self):
-        return ClouDNSClient(self.credentials)
+        zone_cache = None
+        if self.conf('zone-cache-ttl') > 0:
+            zone_cache = ZoneCache(
+                os.path.join(self.config.work_dir, ZONE_CACHE_FILE),
+                self.conf('zone-cache-ttl')
+            )
+
+        return make_client(self.credentials,
+                           max_workers=self.conf('max-workers'),
+                           zone_cache=zone_cache,
+                           zone_lookup=self.conf('zone-lookup'),
+                           journal=RecordJournal(os.path.join(
+                               self.config.work_dir, JOURNAL_FILE
+                           )))
@@ -0,0 +1,206 @@
+"""Caches used to avoid repeating lookups across and within runs."""
+import collections
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ZONE_CACHE_TTL = 86400
+DEFAULT_TTL_CACHE_SIZE = 1024
+
+
+class JsonFile:
+    """
+    State shared by concurrent processes through a JSON file.
+
+    The file is replaced atomically and updates are serialized using a lock
+    file. Unreadable files are treated as empty.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _read(self):
+        try:
+            with open(self.path) as state_file:
+                return json.load(state_file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.debug(f"Ignoring unreadable file {self.path}", exc_info=e)
+            return {}
+
+    @contextlib.contextmanager
+    def _update(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        with open(self.path + '.lock', 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            data = self._read()
+            yield data
+            self._prune(data)
+
+            with tempfile.NamedTemporaryFile(
+                    'w', dir=directory, delete=False,
+                    prefix=os.path.basename(self.path) + '.'
+            ) as temp_file:
+                json.dump(data, temp_file)
+            os.replace(temp_file.name, self.path)
+
+    @staticmethod
+    def _prune(data):
+        """Remove obsolete entries before the data is written."""
+
+
+class ZoneCache(JsonFile):
+    """
+    Persistent cache of the zone and host names found for record names.
+
+    Entries are stored in a JSON file, grouped by ClouDNS account, and expire
+    after `ttl` seconds. The file is read once and changes are buffered until
+    `flush`, which merges them into the file under its lock, so it can be
+    shared by concurrent processes.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_ZONE_CACHE_TTL):
+        super().__init__(path)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = None
+        self._pending = {}
+        self._invalidated = set()
+
+    def get(self, account, domain):
+        """
+        Get the cached zone and host for a domain.
+
+        :param str account: The account the zone belongs to.
+        :param str domain: The domain name.
+        :returns: The zone name and host name, or `None` if not cached.
+        :rtype: tuple
+        """
+        with self._lock:
+            entry = self._load().get(account, {}).get(domain)
+        if entry is None or entry['expires'] <= time.time():
+            return None
+        return entry['zone'], entry['host']
+
+    def set(self, account, domain, zone, host):
+        """Store the zone and host found for a domain, until `flush`."""
+        entry = {
+            'zone': zone,
+            'host': host,
+            'expires': time.time() + self.ttl,
+        }
+        with self._lock:
+            self._load().setdefault(account, {})[domain] = entry
+            self._pending[(account, domain)] = entry
+
+    def invalidate_zone(self, account, zone):
+        """Remove all entries pointing to the given zone, until `flush`."""
+        with self._lock:
+            self._remove_zone(self._load(), account, zone)
+            self._invalidated.add((account, zone))
+            for key in [key for key, entry in self._pending.items()
+                        if key[0] == account and entry['zone'] == zone]:
+                del self._pending[key]
+
+    def flush(self):
+        """Merge the buffered changes into the file with a single write."""
+        with self._lock:
+            if not self._pending and not self._invalidated:
+                return
+
+            with self._update() as data:
+                for account, zone in self._invalidated:
+                    self._remove_zone(data, account, zone)
+                for (account, domain), entry in self._pending.items():
+                    data.setdefault(account, {})[domain] = entry
+            self._entries = data
+            self._pending = {}
+            self._invalidated = set()
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    @staticmethod
+    def _remove_zone(data, account, zone):
+        entries = data.get(account, {})
+        for domain in [domain for domain, entry in entries.items()
+                       if entry['zone'] == zone]:
+            logger.debug(f"Removing cached zone {zone} for {domain}")
+            del entries[domain]
+
+    @staticmethod
+    def _prune(data):
+        now = time.time()
+        for account in list(data):
+            data[account] = {domain: entry
+                             for domain, entry in data[account].items()
+                             if entry['expires'] > now}
+            if not data[account]:
+                del data[account]
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory cache whose entries expire after individual TTLs.
+
+    Once more than `maxsize` entries are stored, the least recently used
+    entries are evicted.
+    """
+
+    def __init__(self, maxsize=DEFAULT_TTL_CACHE_SIZE, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Get the value cached for a key.
+
+        :returns: The cached value, or `default` if the key is not cached or
+            has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[1] <= self.clock():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl):
+        """Cache a value for `ttl` seconds."""
+        with self._lock:
+            self._entries[key] = (value, self.clock() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
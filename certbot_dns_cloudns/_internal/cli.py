@@ -0,0 +1,347 @@
+"""Command line tools complementing the certbot plugin."""
+import argparse
+import json
+import logging
+import signal
+import sys
+
+from certbot import errors
+from certbot.compat import os
+from certbot.plugins import dns_common
+
+from certbot_dns_cloudns._internal import resolve
+from certbot_dns_cloudns._internal.accounts import make_client
+from certbot_dns_cloudns._internal.accounts import MultiAccountClient
+from certbot_dns_cloudns._internal.authenticator import Authenticator
+from certbot_dns_cloudns._internal.authenticator import validate_credentials
+from certbot_dns_cloudns._internal.authenticator import validation_domain_name
+from certbot_dns_cloudns._internal.client import BatchError
+from certbot_dns_cloudns._internal.client import DEFAULT_MAX_WORKERS
+from certbot_dns_cloudns._internal.client import ZONE_LOOKUP_MODES
+from certbot_dns_cloudns._internal.client import ZONE_LOOKUP_PROBE
+from certbot_dns_cloudns._internal.daemon import ChallengeDaemon
+from certbot_dns_cloudns._internal.resolve import resolve_aliases
+from certbot_dns_cloudns._internal.sweep import DEFAULT_MIN_AGE
+from certbot_dns_cloudns._internal.sweep import DEFAULT_STATE_FILE
+from certbot_dns_cloudns._internal.sweep import SightingLog
+from certbot_dns_cloudns._internal.sweep import sweep
+
+logger = logging.getLogger(__name__)
+
+# The prefix of the keys in the credentials INI file used with certbot
+CREDENTIALS_PREFIX = 'dns_cloudns_'
+
+
+def load_credentials(path):
+    """
+    Load and validate a credentials INI file, as used with certbot.
+
+    :param str path: The path of the file.
+    :rtype: certbot.plugins.dns_common.CredentialsConfiguration
+    :raises certbot.errors.PluginError: if the file is invalid.
+    """
+    dns_common.validate_file_permissions(path)
+    credentials = dns_common.CredentialsConfiguration(
+        path, lambda key: CREDENTIALS_PREFIX + key.replace('-', '_')
+    )
+    validate_credentials(credentials)
+    return credentials
+
+
+def client_from_args(args):
+    """Create a client using the credentials and options of a command."""
+    return make_client(load_credentials(args.credentials),
+                       max_workers=args.max_workers,
+                       zone_lookup=args.zone_lookup)
+
+
+def run_daemon(args):
+    resolve.configure(query_timeout=args.query_timeout)
+    daemon = ChallengeDaemon(client_from_args(args), args.socket,
+                             nameserver=args.nameserver)
+
+    # Leave serve_forever through an exception, so the socket is removed
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def read_records(lines):
+    """
+    Parse the challenges of several domains, one domain and validation per
+    line, separated by whitespace. Blank lines and comments are ignored.
+
+    :param iterable lines: The lines.
+    :returns: Tuples of the domain and validation.
+    :rtype: list
+    :raises certbot.errors.PluginError: if a line is invalid.
+    """
+    records = []
+    for number, line in enumerate(lines, 1):
+        fields = line.split()
+        if not fields or fields[0].startswith('#'):
+            continue
+        if len(fields) != 2:
+            raise errors.PluginError(
+                f"Line {number}: expected a domain and a validation, found "
+                f"{line.strip()!r}"
+            )
+        records.append((fields[0], fields[1]))
+    return records
+
+
+def run_add(args):
+    def add(client, records):
+        try:
+            client.add_txt_records(records, args.ttl)
+        except BatchError as e:
+            failures = e.failures
+        else:
+            failures = {}
+
+        record_names = {record_name for domain, record_name, _ in records
+                        if domain not in failures}
+        if args.wait and record_names and \
+                not client.wait_for_updates(record_names, args.wait):
+            logger.warning(f"ClouDNS has not reported the zones as updated "
+                           f"within {args.wait:.0f} seconds.")
+        return failures
+
+    return _run_records(args, add)
+
+
+def run_delete(args):
+    return _run_records(args, lambda client, records: client.del_txt_records(
+        records
+    ))
+
+
+def _run_records(args, change):
+    """
+    Create or delete the challenge records given to a command, printing a
+    JSON object with the outcome of each record.
+
+    :param callable change: Creates or deletes records using a client,
+        returning the exceptions raised keyed by domain.
+    :returns: The exit status.
+    :rtype: int
+    """
+    records = [(domain, validation_domain_name(domain), validation)
+               for domain, validation in _input_records(args)]
+    resolve.configure(query_timeout=args.query_timeout)
+
+    client = client_from_args(args)
+    try:
+        aliases = resolve_aliases(
+            [validation_name for _, validation_name, _ in records],
+            args.nameserver, max_workers=args.max_workers
+        )
+        records = [(domain, aliases[validation_name], validation)
+                   for domain, validation_name, validation in records]
+        failures = change(client, records) if records else {}
+    except Exception as e:  # pylint: disable=broad-except
+        logger.debug("Unable to change records", exc_info=e)
+        failures = {domain: e for domain, _, _ in records}
+    finally:
+        client.close()
+
+    for domain, record_name, validation in records:
+        result = {'domain': domain, 'record_name': record_name,
+                  'validation': validation, 'ok': domain not in failures}
+        if domain in failures:
+            result['error'] = str(failures[domain]) or \
+                type(failures[domain]).__name__
+        print(json.dumps(result))
+    return 1 if failures else 0
+
+
+def _input_records(args):
+    """
+    Read the records given to a command from its input file, or from the
+    environment of a certbot manual hook if there is none.
+
+    :raises certbot.errors.PluginError: if the hook environment has no
+        validation.
+    """
+    if args.input is None and 'CERTBOT_DOMAIN' in os.environ:
+        if 'CERTBOT_VALIDATION' not in os.environ:
+            raise errors.PluginError("CERTBOT_DOMAIN is set, but "
+                                     "CERTBOT_VALIDATION is missing")
+        return [(os.environ['CERTBOT_DOMAIN'],
+                 os.environ['CERTBOT_VALIDATION'])]
+    if args.input in (None, '-'):
+        return read_records(sys.stdin)
+    with open(args.input) as input_file:
+        return read_records(input_file)
+
+
+def run_sweep(args):
+    client = client_from_args(args)
+    sightings = SightingLog(args.state)
+    challenge_hosts = args.challenge_host or []
+    stale_count = failure_count = 0
+    try:
+        for account_client, zones in _sweep_targets(client, args.zone):
+            records, failures = sweep(account_client, sightings,
+                                      account_client.account, zones=zones,
+                                      min_age=args.min_age,
+                                      dry_run=args.dry_run,
+                                      challenge_hosts=challenge_hosts)
+            for record in sorted(records):
+                if record.age < args.min_age:
+                    status = 'kept'
+                elif args.dry_run:
+                    status = 'stale'
+                elif (record.zone, record.record_id) in failures:
+                    status = (f"failed: "
+                              f"{failures[(record.zone, record.record_id)]}")
+                else:
+                    status = 'deleted'
+                stale_count += record.age >= args.min_age
+                print(f"{record.zone}\t{record.host}\t{record.record_id}\t"
+                      f"{record.age:.0f}s\t{status}")
+            failure_count += len(failures)
+    finally:
+        client.close()
+
+    logger.info(f"{stale_count} stale challenge records "
+                f"{'found' if args.dry_run else 'swept'}, {failure_count} "
+                f"could not be deleted.")
+    return 1 if failure_count else 0
+
+
+def _sweep_targets(client, zones):
+    """
+    Get the client and the zones to sweep of each account.
+
+    :returns: Tuples of a `.ClouDNSClient` and its zones, or None for all
+        zones of the account.
+    :rtype: list
+    """
+    if not isinstance(client, MultiAccountClient):
+        return [(client, zones)]
+    if not zones:
+        return [(account_client, None)
+                for account_client in client.clients.values()]
+
+    groups = {}
+    for zone in zones:
+        groups.setdefault(client.find_account(zone), []).append(zone)
+    return [(client.clients[account], account_zones)
+            for account, account_zones in groups.items()]
+
+
+def _add_client_arguments(parser):
+    parser.add_argument('--credentials', required=True,
+                        help='ClouDNS credentials INI file.')
+    parser.add_argument('--nameserver',
+                        help='The nameserver used to resolve CNAME aliases. '
+                             'Queries are raced between several nameservers '
+                             'separated by commas.')
+    parser.add_argument('--query-timeout', type=float,
+                        help='The number of seconds after which a DNS query '
+                             'to a nameserver is abandoned.')
+    parser.add_argument('--max-workers', type=int,
+                        default=DEFAULT_MAX_WORKERS,
+                        help='The maximum number of concurrent ClouDNS API '
+                             'operations.')
+    parser.add_argument('--zone-lookup', default=ZONE_LOOKUP_PROBE,
+                        choices=ZONE_LOOKUP_MODES,
+                        help='How to find the zone of a record.')
+
+
+def _add_records_arguments(parser):
+    _add_client_arguments(parser)
+    parser.add_argument('--input',
+                        help='The file to read a domain and validation per '
+                             'line from, or - for stdin. Defaults to the '
+                             'CERTBOT_DOMAIN and CERTBOT_VALIDATION variables '
+                             'of certbot\'s manual hooks if set, otherwise '
+                             'stdin.')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='certbot-dns-cloudns',
+        description='Tools for managing ACME challenge records on ClouDNS.'
+    )
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='Log debug messages.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    daemon_parser = commands.add_parser(
+        'daemon',
+        help='Manage challenge records on behalf of certbot runs using '
+             '--dns-cloudns-daemon-socket.'
+    )
+    _add_client_arguments(daemon_parser)
+    daemon_parser.add_argument('--socket', required=True,
+                               help='The Unix socket to listen on.')
+    daemon_parser.set_defaults(func=run_daemon)
+
+    add_parser = commands.add_parser(
+        'add',
+        help='Create the challenge records of several domains at once.'
+    )
+    _add_records_arguments(add_parser)
+    add_parser.add_argument('--ttl', type=int, default=Authenticator.ttl,
+                            help='The TTL of the records.')
+    add_parser.add_argument('--wait', type=float, default=0,
+                            help='Wait up to this number of seconds until '
+                                 'ClouDNS reports the zones as updated on '
+                                 'all of its nameservers.')
+    add_parser.set_defaults(func=run_add)
+
+    delete_parser = commands.add_parser(
+        'delete',
+        help='Delete the challenge records of several domains at once.'
+    )
+    _add_records_arguments(delete_parser)
+    delete_parser.set_defaults(func=run_delete)
+
+    sweep_parser = commands.add_parser(
+        'sweep',
+        help='Delete challenge records left behind by interrupted runs. '
+             'Records are deleted once an earlier sweep has seen them at '
+             'least --min-age seconds ago.'
+    )
+    _add_client_arguments(sweep_parser)
+    sweep_parser.add_argument('--zone', action='append',
+                              help='A zone to sweep (repeatable). All zones '
+                                   'of the accounts are swept by default.')
+    sweep_parser.add_argument('--min-age', type=int, default=DEFAULT_MIN_AGE,
+                              help='The number of seconds since a record was '
+                                   'first seen after which it is deleted.')
+    sweep_parser.add_argument('--state', default=DEFAULT_STATE_FILE,
+                              help='The file recording when records were '
+                                   'first seen.')
+    sweep_parser.add_argument('--challenge-host', action='append',
+                              help='A glob pattern of host names, relative '
+                                   'to their zone, of further challenge '
+                                   'records, e.g. the targets of delegated '
+                                   'validation names (repeatable).')
+    sweep_parser.add_argument('--dry-run', action='store_true',
+                              help='Only report the stale records.')
+    sweep_parser.set_defaults(func=run_sweep)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+    )
+
+    try:
+        return args.func(args) or 0
+    except errors.Error as e:
+        logger.error(str(e))
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())  # pragma: no cover
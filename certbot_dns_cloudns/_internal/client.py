@@ -1,37 +1,44 @@
-import contextlib
-import functools
+import collections
+import concurrent.futures
+import itertools
 import logging
+import random
+import re
 import threading
+import time
 
-import cloudns_api
-import cloudns_api.parameters
-import cloudns_api.record
-import cloudns_api.validation
 from certbot import errors
 from certbot.plugins import dns_common
 
+from certbot_dns_cloudns._internal import metrics
+from certbot_dns_cloudns._internal import transport
+from certbot_dns_cloudns._internal.transport import DEFAULT_API_ENDPOINT
+from certbot_dns_cloudns._internal.transport import DEFAULT_POOL_SIZE
+from certbot_dns_cloudns._internal.transport import DEFAULT_TIMEOUT
+from certbot_dns_cloudns._internal.zones import ZoneIndex
+
 logger = logging.getLogger(__name__)
 
-# We're monkey-patching the cloudns library to set auth params programmatically
-_auth_params = threading.local()
-cloudns_api.api.get_auth_params = \
-    cloudns_api.parameters.get_auth_params = \
-    cloudns_api.record.get_auth_params = lambda: _auth_params.__dict__
+DEFAULT_MAX_WORKERS = 10
+DEFAULT_RETRIES = 3
+DEFAULT_RATE_LIMIT = 20
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 30
+
+THROTTLED_ERROR = re.compile(r'too many requests|rate limit', re.IGNORECASE)
 
+MISSING_ZONE_ERROR = 'Missing domain-name'
+MISSING_RECORD_ERROR = re.compile(r'^Invalid record-id param\.?$')
 
-@contextlib.contextmanager
-def auth_params(credentials):
-    """Context manager to setup and clean up auth params"""
-    config_keys = ('auth-id', 'sub-auth-id', 'sub-auth-user', 'auth-password')
-    params = dict((key, credentials.conf(key))
-                  for key in config_keys
-                  if credentials.conf(key) is not None)
+ZONE_NAME = re.compile(
+    r'^((?=[a-z0-9-]{1,63}\.)(xn--)?[a-z0-9]+(-[a-z0-9]+)*\.)+[a-z]{2,63}$'
+)
 
-    _auth_params.__dict__.update(params)
-    try:
-        yield params
-    finally:
-        _auth_params.__dict__.clear()
+ZONE_LOOKUP_PROBE = 'probe'
+ZONE_LOOKUP_INVENTORY = 'inventory'
+ZONE_LOOKUP_MODES = (ZONE_LOOKUP_PROBE, ZONE_LOOKUP_INVENTORY)
+ZONE_LIST_PAGE_SIZE = 100
+RECORD_LIST_PAGE_SIZE = 100
 
 
 class ApiErrorResponse(errors.PluginError):
@@ -42,13 +49,209 @@ class ApiErrorResponse(errors.PluginError):
         )
 
 
+class RequestScheduler:
+    """
+    Limits the rate of ClouDNS API requests and retries throttled or
+    transiently failing requests.
+
+    Requests are admitted by a token bucket refilled at `rate` tokens per
+    second, holding at most `burst` tokens. Retries wait for a random
+    duration of up to `backoff` seconds, doubling with every attempt
+    (exponential backoff with full jitter).
+    """
+
+    THROTTLED = 'throttled'
+    TRANSIENT = 'transient'
+
+    def __init__(self, rate=DEFAULT_RATE_LIMIT, burst=None,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = collections.Counter()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def run(self, send, classify, retry_transient=True):
+        """
+        Send a request, retrying it as long as it is classified as retryable.
+
+        :param callable send: Sends the request and returns the response.
+        :param callable classify: Returns `THROTTLED` or `TRANSIENT` for
+            responses which should be retried, `None` otherwise.
+        :param bool retry_transient: Whether transient failures are retried,
+            or only throttled requests, which were not processed.
+        :returns: The last response.
+        """
+        attempt = 0
+        while True:
+            self._acquire()
+            with self._lock:
+                self.stats['requests'] += 1
+            response = send()
+
+            failure = classify(response)
+            if failure is None:
+                return response
+
+            with self._lock:
+                self.stats[failure] += 1
+            if attempt >= self.retries or (
+                    failure == self.TRANSIENT and not retry_transient
+            ):
+                return response
+
+            delay = random.uniform(
+                0, min(MAX_BACKOFF, self.backoff * 2 ** attempt)
+            )
+            logger.debug(f"ClouDNS API request {failure}; retrying in "
+                         f"{delay:.2f} seconds.")
+            with self._lock:
+                self.stats['retried'] += 1
+            time.sleep(delay)
+            attempt += 1
+
+    def _acquire(self):
+        if not self.rate:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0
+
+        if delay:
+            with self._lock:
+                self.stats['delayed'] += 1
+            time.sleep(delay)
+
+
+class BatchError(errors.PluginError):
+    def __init__(self, failures):
+        self.failures = failures
+        super().__init__(
+            "Errors occurred for the following domains:\n" + "\n".join(
+                f" * {domain}: {error}" for domain, error in failures.items()
+            )
+        )
+
+
 class ClouDNSClient:
     """
     Encapsulates all communication with the ClouDNS API.
     """
 
-    def __init__(self, credentials):
+    def __init__(self, credentials, max_workers=DEFAULT_MAX_WORKERS,
+                 zone_cache=None, zone_lookup=ZONE_LOOKUP_PROBE, journal=None):
         self.credentials = credentials
+        self.max_workers = max_workers
+        self.zone_cache = zone_cache
+        self.zone_lookup = zone_lookup
+        self.journal = journal
+        self.transport = transport.Transport(
+            endpoint=credentials.conf('api-endpoint') or DEFAULT_API_ENDPOINT,
+            timeout=self._conf_number('timeout', float, DEFAULT_TIMEOUT),
+            pool_size=self._conf_number('pool-size', int, DEFAULT_POOL_SIZE),
+        )
+        self.scheduler = RequestScheduler(
+            rate=self._conf_number('rate-limit', float, DEFAULT_RATE_LIMIT),
+            burst=self._conf_number('rate-burst', float, None),
+            retries=self._conf_number('retries', int, DEFAULT_RETRIES),
+        )
+        self._auth = transport.auth_params(credentials)
+        self._zones = {}
+        self._record_ids = {}
+        self._zone_index = None
+        self._zone_index_lock = threading.Lock()
+
+    def add_txt_records(self, records, record_ttl):
+        """
+        Add several TXT records concurrently.
+
+        Records with the same name and content (e.g. for a domain and its
+        wildcard, or for domains delegating to a shared validation name) are
+        only created once, and the zone of each distinct record name is only
+        looked up once.
+
+        :param list records: Tuples of the domain to be verified, the record
+            name and the record content.
+        :param int record_ttl: The record TTL (in seconds).
+        :raises .BatchError: if an error occurs for any of the domains.
+        """
+        groups = self._group_records(records)
+        zone_failures = self._find_zones(name for name, _ in groups)
+
+        try:
+            failures = self._run_concurrently(
+                lambda key, domain: self._create_txt_record(
+                    domain, key[0], key[1], record_ttl
+                ),
+                [(key, domains[0]) for key, domains in groups.items()
+                 if key[0] not in zone_failures]
+            )
+        finally:
+            self._flush()
+
+        failures = {
+            domain: failures.get(key) or zone_failures.get(key[0])
+            for key, domains in groups.items() for domain in domains
+            if key in failures or key[0] in zone_failures
+        }
+        if failures:
+            raise BatchError(failures)
+
+    def del_txt_records(self, records):
+        """
+        Delete several TXT records concurrently.
+
+        The records of each distinct record name are found using a single
+        listing, unless they were created by this client. Failures are
+        logged and returned, but not raised.
+
+        :param list records: Tuples of the domain to be verified, the record
+            name and the record content.
+        :returns: The exceptions raised, keyed by domain.
+        :rtype: dict
+        """
+        groups = self._group_records(records)
+        contents = {}
+        for record_name, record_content in groups:
+            contents.setdefault(record_name, []).append(record_content)
+        name_failures = self._find_zones(contents)
+
+        found = {}
+        name_failures.update(self._run_concurrently(
+            lambda record_name: found.update(
+                (record_id, (zone, (record_name, record_content)))
+                for record_id, zone, record_content
+                in self._find_txt_record_ids(record_name,
+                                             contents[record_name])
+            ),
+            [(record_name,) for record_name in contents
+             if record_name not in name_failures]
+        ))
+
+        try:
+            delete_failures = self._run_concurrently(
+                self._delete_txt_record,
+                [(record_id, zone) for record_id, (zone, _) in found.items()]
+            )
+        finally:
+            self._flush()
+
+        failures = {found[record_id][1]: error
+                    for record_id, error in delete_failures.items()}
+        return {
+            domain: name_failures.get(key[0]) or failures.get(key)
+            for key, domains in groups.items() for domain in domains
+            if key[0] in name_failures or key in failures
+        }
 
     def add_txt_record(self, domain, record_name, record_content, record_ttl):
         """
@@ -60,20 +263,29 @@ class ClouDNSClient:
         :param int record_ttl: The record TTL (in seconds).
         :raises certbot.errors.PluginError: if an error occurs.
         """
-
-        zone, host = self._find_zone_and_host(record_name)
-
-        logger.debug(
-            'Attempting to add record %s to zone %s (to validate %s).',
-            host, zone, domain
-        )
-
-        self._api_request(cloudns_api.record.create,
-                          domain_name=zone,
-                          host=host,
-                          record_type='TXT',
-                          record=record_content,
-                          ttl=record_ttl)
+        try:
+            self._create_txt_record(domain, record_name, record_content,
+                                    record_ttl)
+        finally:
+            self._flush()
+
+    def _create_txt_record(self, domain, record_name, record_content,
+                           record_ttl):
+        def create(zone, host):
+            logger.debug(
+                'Attempting to add record %s to zone %s (to validate %s).',
+                host, zone, domain
+            )
+
+            payload = self._api_request(transport.RECORD_CREATE,
+                                        domain_name=zone,
+                                        host=host,
+                                        record_type='TXT',
+                                        record=record_content,
+                                        ttl=record_ttl)
+            self._remember_record_id(zone, host, record_content, payload)
+
+        self._with_zone(record_name, create)
 
     def del_txt_record(self, domain, record_name, record_content):
         """
@@ -89,33 +301,393 @@ class ClouDNSClient:
         :param str record_name: The record name.
         :param str record_content: The record content.
         """
+        self.del_txt_records([(domain, record_name, record_content)])
+
+    def prepare(self, record_names):
+        """
+        Look up the zones of records concurrently ahead of adding them, so
+        only the records need to be created later.
 
+        :param list record_names: The record names.
+        :raises .BatchError: if no zone is found for any of the record names,
+            keyed by record name.
+        """
         try:
-            zone, host = self._find_zone_and_host(record_name)
-        except errors.PluginError as e:
-            logger.debug('Encountered error finding zone_id during deletion',
-                         exc_info=e)
+            failures = self._find_zones(record_names)
+        finally:
+            self._flush()
+        if failures:
+            raise BatchError(failures)
+
+    def wait_for_updates(self, record_names, timeout):
+        """
+        Wait until ClouDNS reports the zones of the given records as updated
+        on all of their nameservers.
+
+        :param list record_names: The record names.
+        :param float timeout: The maximum number of seconds to wait.
+        :returns: Whether all zones were updated before the timeout.
+        :rtype: bool
+        :raises certbot.errors.PluginError: if a zone is not found.
+        """
+        from certbot_dns_cloudns._internal import propagation
+
+        zones = {self.find_zone_and_host(record_name)[0]
+                 for record_name in record_names}
+        return propagation.wait_for_zone_updates(
+            self.is_zone_updated, zones, timeout, max_workers=self.max_workers
+        )
+
+    def is_zone_updated(self, zone):
+        """
+        Check whether all changes of a zone have reached all of its
+        nameservers.
+
+        :param str zone: The zone name.
+        :rtype: bool
+        :raises certbot.errors.PluginError: if an error occurs.
+        """
+        return self._api_request(transport.ZONE_IS_UPDATED,
+                                 domain_name=zone) is True
+
+    def iter_zones(self):
+        """
+        Iterate over the names of all zones of the account, listing the pages
+        of zones concurrently.
+
+        :rtype: iterator
+        :raises certbot.errors.PluginError: if an error occurs.
+        """
+        page_count = int(self._api_request(
+            transport.ZONE_PAGE_COUNT,
+            rows_per_page=ZONE_LIST_PAGE_SIZE
+        ))
+        logger.debug(f"Listing {page_count} pages of zones.")
+
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, min(self.max_workers, page_count))
+        ) as executor:
+            pages = executor.map(
+                lambda page: self._api_request(
+                    transport.ZONE_LIST, page=page,
+                    rows_per_page=ZONE_LIST_PAGE_SIZE
+                ),
+                range(1, page_count + 1)
+            )
+            for page in pages:
+                for zone in page:
+                    yield zone['name']
+
+    def iter_zone_txt_records(self, zones, predicate=None):
+        """
+        Iterate over the TXT records of several zones.
+
+        At most `max_workers` zones are listed concurrently, and the zones are
+        consumed as listings complete, so `zones` may itself be an iterator.
+        Zones which cannot be listed are logged and skipped.
+
+        :param iterable zones: The zone names.
+        :param callable predicate: Called with each record; only the records
+            for which it returns true are kept.
+        :returns: Tuples of a zone name and its records, keyed by record_id,
+            in the order the listings complete.
+        :rtype: iterator
+        """
+        def list_records(zone):
+            return {record_id: record
+                    for record_id, record in self._iter_txt_records(zone)
+                    if predicate is None or predicate(record)}
+
+        zones = iter(zones)
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers
+        ) as executor:
+            futures = {executor.submit(list_records, zone): zone
+                       for zone in itertools.islice(zones, self.max_workers)}
+            while futures:
+                done, _ = concurrent.futures.wait(
+                    futures, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    zone = futures.pop(future)
+                    for next_zone in itertools.islice(zones, 1):
+                        futures[executor.submit(list_records,
+                                                next_zone)] = next_zone
+                    try:
+                        yield zone, future.result()
+                    except errors.PluginError as e:
+                        logger.warning(f"Unable to list the TXT records of "
+                                       f"zone {zone}", exc_info=e)
+
+    def delete_records(self, records):
+        """
+        Delete several records by their record_id, concurrently.
+
+        :param list records: Tuples of the zone name and the record_id.
+        :returns: The exceptions raised, keyed by the zone name and
+            record_id.
+        :rtype: dict
+        """
+        try:
+            return self._run_concurrently(
+                lambda _, zone, record_id: self._delete_record(zone,
+                                                               record_id),
+                [((zone, record_id), zone, record_id)
+                 for zone, record_id in records]
+            )
+        finally:
+            self._flush()
+
+    def delete_journaled_records(self):
+        """
+        Delete the records which were created, but not deleted, by previous
+        runs, as recorded in the journal.
+
+        The records are deleted by their record_id, without looking up their
+        zones or listing records. Records which ClouDNS reports as no longer
+        existing, by an invalid record_id or a missing zone, are removed from
+        the journal. Other failures are logged and retried by the next run.
+        """
+        if self.journal is None:
+            return
+        records = self.journal.records(self.account)
+        if not records:
             return
 
-        record_id = self._find_txt_record_id(zone, host, record_content)
-        if record_id:
-            try:
-                self._api_request(cloudns_api.record.delete,
-                                  domain_name=zone,
-                                  record_id=record_id)
-                logger.debug('Successfully deleted TXT record.')
-            except errors.PluginError as e:
-                logger.warning(
-                    'Encountered CloudFlareAPIError deleting TXT record',
-                    exc_info=e
+        logger.info(f"Deleting {len(records)} TXT records left behind by a "
+                    f"previous run.")
+        failures = self.delete_records(
+            [(zone, record_id) for zone, _, _, record_id in records]
+        )
+        for (zone, record_id), error in failures.items():
+            if isinstance(error, ApiErrorResponse) and (
+                    self._is_missing_record(error.response)
+                    or self._is_missing_zone(error.response)
+            ):
+                logger.debug(f"Record {record_id} in zone {zone} no longer "
+                             f"exists: {error}")
+                self.journal.remove(self.account, zone, record_id)
+            else:
+                logger.warning(f"Unable to delete TXT record {record_id} in "
+                               f"zone {zone} left behind by a previous run",
+                               exc_info=error)
+        self._flush()
+
+    @staticmethod
+    def _group_records(records):
+        """
+        Group records by their name and content.
+
+        :returns: The domains of each record, keyed by record name and
+            content, in the order they were first seen.
+        :rtype: dict
+        """
+        groups = {}
+        for domain, record_name, record_content in records:
+            groups.setdefault((record_name, record_content), []).append(domain)
+        return groups
+
+    def _find_zones(self, record_names):
+        """
+        Look up the zones of distinct record names concurrently, so they are
+        cached for subsequent operations.
+
+        :returns: The exceptions raised, keyed by record name.
+        :rtype: dict
+        """
+        return self._run_concurrently(
+            self.find_zone_and_host,
+            [(record_name,) for record_name in dict.fromkeys(record_names)]
+        )
+
+    def _find_txt_record_ids(self, record_name, record_contents):
+        """
+        Find the TXT records with the given name and contents, listing the
+        records at most once.
+
+        The listing stops at the first page which contains the last of the
+        records.
+
+        :param str record_name: The record name.
+        :param list record_contents: The record contents.
+        :returns: Tuples of the record_id, zone and content of each record
+            found.
+        :rtype: list
+        """
+        record_contents = set(record_contents)
+
+        def find_records(zone, host):
+            record_ids = {}
+            for record_content in record_contents:
+                record_id = self._record_ids.pop(
+                    (zone, host, record_content), None
                 )
+                if record_id is not None:
+                    record_ids[record_content] = record_id
+
+            if len(record_ids) < len(record_contents):
+                for record_id, record in self._iter_txt_records(zone, host):
+                    if record['record'] in record_contents:
+                        record_ids.setdefault(record['record'], record_id)
+                        if len(record_ids) == len(record_contents):
+                            break
+
+            if len(record_ids) < len(record_contents):
+                logger.debug('TXT record not found; no cleanup needed.')
+            return [(record_id, zone, record_content)
+                    for record_content, record_id in record_ids.items()]
+
+        return self._with_zone(record_name, find_records)
+
+    def _delete_txt_record(self, record_id, zone):
+        try:
+            self._delete_record(zone, record_id)
+            logger.debug('Successfully deleted TXT record.')
+        except errors.PluginError as e:
+            logger.warning(
+                'Encountered CloudFlareAPIError deleting TXT record',
+                exc_info=e
+            )
+            raise
+
+    def _delete_record(self, zone, record_id):
+        self._api_request(transport.RECORD_DELETE,
+                          domain_name=zone,
+                          record_id=record_id)
+        if self.journal is not None:
+            self.journal.remove(self.account, zone, record_id)
+
+    def _flush(self):
+        """Write the buffered changes of the record journal and zone cache."""
+        if self.journal is not None:
+            try:
+                self.journal.flush()
+            except OSError as e:
+                logger.warning(f"Unable to write record journal "
+                               f"{self.journal.path}", exc_info=e)
+        if self.zone_cache:
+            try:
+                self.zone_cache.flush()
+            except OSError as e:
+                logger.warning(f"Unable to write zone cache "
+                               f"{self.zone_cache.path}", exc_info=e)
+
+    def _with_zone(self, record_name, operation):
+        """
+        Run an operation on the zone containing the given record name.
+
+        If the operation fails because the zone no longer exists, the zone is
+        removed from all caches and the operation is retried once using a
+        fresh lookup.
+
+        :param str record_name: The record name.
+        :param callable operation: Called with the zone and host names.
+        :returns: The result of the operation.
+        """
+        zone, host = self.find_zone_and_host(record_name)
+        try:
+            return operation(zone, host)
+        except ApiErrorResponse as e:
+            if not self._is_missing_zone(e.response):
+                raise
+            logger.debug(f"Zone {zone} no longer exists; looking up zone "
+                         f"for {record_name} again.")
+            self._invalidate_zone(zone)
+
+        zone, host = self.find_zone_and_host(record_name)
+        return operation(zone, host)
+
+    @metrics.timed('find_zone')
+    def find_zone_and_host(self, domain):
+        """
+        Find the zone and host for a given domain, using cached results of
+        previous lookups where possible.
+
+        :param str domain: The domain for which to find the zone_id.
+        :returns: The zone name and host name, if found.
+        :raises certbot.errors.PluginError: if no zone_id is found.
+        """
+        if domain in self._zones:
+            return self._zones[domain]
+
+        result = None
+        if self.zone_cache:
+            result = self.zone_cache.get(self.account, domain)
+
+        if result:
+            logger.debug(f"Using cached zone {result[0]} for {domain}.")
         else:
-            logger.debug('TXT record not found; no cleanup needed.')
+            if self.zone_lookup == ZONE_LOOKUP_INVENTORY:
+                result = self._find_zone_in_inventory(domain)
+            else:
+                result = self._lookup_zone_and_host(domain)
+            if self.zone_cache:
+                self.zone_cache.set(self.account, domain, *result)
+
+        self._zones[domain] = result
+        return result
+
+    def _invalidate_zone(self, zone):
+        for domain, (cached_zone, _) in list(self._zones.items()):
+            if cached_zone == zone:
+                self._zones.pop(domain, None)
+        with self._zone_index_lock:
+            self._zone_index = None
+        if self.zone_cache:
+            self.zone_cache.invalidate_zone(self.account, zone)
+
+    def _find_zone_in_inventory(self, domain):
+        """
+        Find the zone and host for a given domain in the list of all zones of
+        the account.
+
+        :param str domain: The domain for which to find the zone.
+        :returns: The zone name and host name, if found.
+        :raises certbot.errors.PluginError: if no zone is found.
+        """
+        zone_name = self._get_zone_index().find(domain)
+        if zone_name is None:
+            raise errors.PluginError(
+                f"Unable to find zone for {domain} in the zones of the "
+                f"supplied ClouDNS account.\n Please confirm that the domain "
+                f"name has been entered correctly and is already associated "
+                f"with the supplied ClouDNS account."
+            )
+
+        logger.debug(f"Found zone {zone_name} for {domain}.")
+        return zone_name, domain[:-len(zone_name) - 1]
+
+    def _get_zone_index(self):
+        """
+        Get the index of all zones of the account, listing them on first use.
+
+        :rtype: .ZoneIndex
+        """
+        with self._zone_index_lock:
+            if self._zone_index is None:
+                index = ZoneIndex()
+                for zone in self.iter_zones():
+                    index.add(zone)
+
+                logger.debug(f"Found {len(index)} zones.")
+                self._zone_index = index
+            return self._zone_index
+
+    @property
+    def account(self):
+        """
+        The user the client authenticates as, identifying the account in the
+        zone cache, record journal and sighting log.
 
-    @functools.lru_cache(maxsize=None)
-    def _find_zone_and_host(self, domain):
+        :rtype: str
+        """
+        return next(f"{key}={self.credentials.conf(key)}"
+                    for key in ('auth-id', 'sub-auth-id', 'sub-auth-user')
+                    if self.credentials.conf(key) is not None)
+
+    def _lookup_zone_and_host(self, domain):
         """
-        Find the zone and host for a given domain.
+        Find the zone and host for a given domain using the ClouDNS API.
 
         :param str domain: The domain for which to find the zone_id.
         :returns: The zone name and host name, if found.
@@ -124,21 +696,14 @@ class ClouDNSClient:
         zone_name_guesses = dns_common.base_domain_name_guesses(domain)
 
         for zone_name in zone_name_guesses:
-            try:
-                cloudns_api.validation.is_domain_name(zone_name)
-            except cloudns_api.validation.ValidationError:
+            if not ZONE_NAME.match(zone_name):
                 continue
 
             logger.debug(f"Looking up zone {zone_name}.")
             try:
-                self._api_request(cloudns_api.zone.get, domain_name=zone_name)
+                self._api_request(transport.ZONE_GET, domain_name=zone_name)
             except ApiErrorResponse as e:
-                response = e.response
-                if (
-                        isinstance(response, dict) and
-                        response.get('status_code') == 200 and
-                        response.get('error') == 'Missing domain-name'
-                ):
+                if self._is_missing_zone(e.response):
                     logger.debug(f"Zone {zone_name} not found")
                 else:
                     raise e
@@ -153,43 +718,160 @@ class ClouDNSClient:
             f"associated with the supplied ClouDNS account."
         )
 
-    def _find_txt_record_id(self, zone, record_name, record_content):
+    def _remember_record_id(self, zone, host, record_content, payload):
+        """
+        Remember the record_id of a created record, so it can be deleted
+        without listing the records first.
         """
-        Find the record_id for a TXT record with the given name and content.
+        data = payload.get('data') if isinstance(payload, dict) else None
+        record_id = data.get('id') if isinstance(data, dict) else None
+        if record_id is None:
+            logger.debug('No record_id in response to record creation.')
+        else:
+            self._record_ids[(zone, host, record_content)] = str(record_id)
+            if self.journal is not None:
+                self.journal.add(self.account, zone, host, record_content,
+                                 record_id)
 
-        :param str zone: The zone which contains the record.
-        :param str record_name: The record name.
-        :param str record_content: The record content.
-        :returns: The record_id, if found.
-        :rtype: str
+    def list_txt_records(self, zone, record_name=None):
         """
-        records = self._api_request(cloudns_api.record.list,
-                                    domain_name=zone, host=record_name,
-                                    record_type='TXT')
+        List the TXT records with the given name.
 
-        for record_id, record in records.items():
-            if record['record'] == record_content:
-                return record_id
+        :param str zone: The zone which contains the records.
+        :param str record_name: The record name, or None to list all TXT
+            records of the zone.
+        :returns: The records, keyed by their record_id.
+        :rtype: dict
+        """
+        return dict(self._iter_txt_records(zone, record_name))
 
-        logger.debug('Unable to find TXT record.')
-        return None
+    def _iter_txt_records(self, zone, record_name=None):
+        """
+        Iterate over the TXT records with the given name.
 
-    def _api_request(self, api_method, *args, **kwargs):
-        with auth_params(self.credentials):
-            try:
-                response = api_method(*args, **kwargs)
-            except Exception as e:
-                raise errors.PluginError(
-                    'Error communicating with the ClouDNS API'
-                ) from e
+        The records are requested one page of `RECORD_LIST_PAGE_SIZE` records
+        at a time, as they are consumed, so only a single page is held in
+        memory and no further pages are requested once iteration stops.
 
-        response_content = response.json()
-        logger.debug("ClouDNS API response: %s", response_content)
+        :param str zone: The zone which contains the records.
+        :param str record_name: The record name, or None to iterate over all
+            TXT records of the zone.
+        :returns: Tuples of the record_id and the record.
+        :rtype: iterator
+        """
+        for page in itertools.count(1):
+            records = self._api_request(transport.RECORD_LIST,
+                                        domain_name=zone, host=record_name,
+                                        record_type='TXT', page=page,
+                                        rows_per_page=RECORD_LIST_PAGE_SIZE)
+            records = records or {}
+            yield from records.items()
+            if len(records) < RECORD_LIST_PAGE_SIZE:
+                return
+
+    def _run_concurrently(self, operation, records):
+        """
+        Run an operation for each record using a bounded pool of threads.
 
-        if self._is_successful(response):
-            return response_content.get('payload')
-        else:
-            raise ApiErrorResponse(response_content)
+        :returns: The exceptions raised, keyed by the domain of the record.
+        :rtype: dict
+        """
+        records = list(records)
+        if not records:
+            return {}
+
+        failures = {}
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(records))
+        ) as executor:
+            futures = {executor.submit(operation, *record): record[0]
+                       for record in records}
+            for future in concurrent.futures.as_completed(futures):
+                error = future.exception()
+                if error is not None:
+                    logger.debug('Operation for %s failed', futures[future],
+                                 exc_info=error)
+                    failures[futures[future]] = error
+
+        return failures
+
+    def _conf_number(self, key, number_type, default):
+        value = self.credentials.conf(key)
+        if value is None:
+            return default
+
+        try:
+            return number_type(value)
+        except ValueError:
+            raise errors.PluginError(
+                f"Invalid value for {key} in credentials configuration "
+                f"file: {value}"
+            )
+
+    def close(self):
+        """
+        Write the buffered changes and close all pooled connections of this
+        client.
+        """
+        self._flush()
+        self.transport.close()
+
+    @property
+    def request_stats(self):
+        """
+        Counts of the API requests sent, throttled, failed transiently,
+        retried and delayed by the rate limit.
+
+        :rtype: dict
+        """
+        return dict(self.scheduler.stats)
+
+    def _api_request(self, api_method, **kwargs):
+        def send():
+            return self.transport.request(api_method, self._auth, **kwargs)
+
+        with metrics.REGISTRY.timer('api.' + api_method.name):
+            # Creating a record is not idempotent, so it is only retried if
+            # the API did not process the request at all
+            response = self.scheduler.run(
+                send, self._classify_failure,
+                retry_transient=api_method is not transport.RECORD_CREATE
+            )
+
+            response_content = response.json()
+            logger.debug("ClouDNS API response: %s", response_content)
+
+            if self._is_successful(response):
+                return response_content.get('payload')
+            else:
+                raise ApiErrorResponse(response_content)
+
+    @staticmethod
+    def _classify_failure(response):
+        if response.status_code == 429 or THROTTLED_ERROR.search(
+                str(response.error or '')
+        ):
+            return RequestScheduler.THROTTLED
+        if response.status_code is not None and response.status_code >= 500:
+            return RequestScheduler.TRANSIENT
+        return None
+
+    @staticmethod
+    def _is_missing_zone(response):
+        return (
+                isinstance(response, dict) and
+                response.get('status_code') == 200 and
+                response.get('error') == MISSING_ZONE_ERROR
+        )
+
+    @staticmethod
+    def _is_missing_record(response):
+        return (
+                isinstance(response, dict) and
+                response.get('status_code') == 200 and
+                MISSING_RECORD_ERROR.match(response.get('error') or '')
+                is not None
+        )
 
     @staticmethod
     def _is_successful(response):
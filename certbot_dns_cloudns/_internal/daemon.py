@@ -0,0 +1,281 @@
+"""
+Long-running process managing challenge records on behalf of short-lived
+certbot runs.
+
+The daemon keeps a single `.ClouDNSClient`, with its connection pool and zone
+lookups, and the alias cache warm across runs. Certbot runs connect to its
+Unix socket and send one JSON request per connection, terminated by a
+newline. The daemon answers with a single JSON response line.
+"""
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+
+from certbot import errors
+
+from certbot_dns_cloudns._internal import metrics
+from certbot_dns_cloudns._internal.client import BatchError
+from certbot_dns_cloudns._internal.resolve import resolve_aliases
+
+logger = logging.getLogger(__name__)
+
+ACTION_ADD = 'add'
+ACTION_PREPARE = 'prepare'
+ACTION_DELETE = 'delete'
+ACTION_STATS = 'stats'
+ACTION_WAIT = 'wait'
+
+DEFAULT_TTL = 60
+DEFAULT_CLIENT_TIMEOUT = 600
+MAX_REQUEST_SIZE = 1024 * 1024
+
+
+class ChallengeDaemon:
+    """
+    Serves requests to add and delete challenge records on a Unix socket.
+
+    Validation names are resolved to their CNAME targets by the daemon, so
+    the alias cache is shared by all runs.
+    """
+
+    def __init__(self, client, socket_path, nameserver=None):
+        self.client = client
+        self.socket_path = socket_path
+        self.nameserver = nameserver
+        self._server = None
+
+    def serve_forever(self):
+        """
+        Listen on the socket and handle requests until shut down.
+
+        :raises certbot.errors.PluginError: if the socket path is taken by
+            another file or a running daemon.
+        """
+        self._remove_stale_socket()
+
+        # Anyone able to connect can modify the account's records
+        umask = os.umask(0o177)
+        try:
+            self._server = _Server(self.socket_path, _Handler)
+        finally:
+            os.umask(umask)
+        self._server.daemon = self
+
+        logger.info(f"Listening on {self.socket_path}")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            os.unlink(self.socket_path)
+            self.client.close()
+
+    def _remove_stale_socket(self):
+        try:
+            mode = os.lstat(self.socket_path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise errors.PluginError(f"{self.socket_path} exists and is not a "
+                                     f"socket")
+
+        # A socket nobody listens on is left behind by a daemon which did not
+        # shut down cleanly
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                logger.debug(f"Removing stale socket {self.socket_path}")
+                os.unlink(self.socket_path)
+                return
+        raise errors.PluginError(f"Another daemon is already listening on "
+                                 f"{self.socket_path}")
+
+    def shutdown(self):
+        """Stop serving requests. Must be called from another thread."""
+        if self._server is not None:
+            self._server.shutdown()
+
+    def handle(self, request):
+        """
+        Handle a single request.
+
+        :param dict request: The `action`, the `records` as lists of the
+            domain to be verified, the validation name and the record content
+            and, when adding records, their `ttl` or, when waiting for the
+            zones to be updated, the `timeout`.
+        :returns: The response.
+        :rtype: dict
+        """
+        action = request.get('action')
+        if action == ACTION_STATS:
+            return {'ok': True,
+                    'requests': self.client.request_stats,
+                    'operations': metrics.REGISTRY.summary()}
+        if action not in (ACTION_ADD, ACTION_DELETE, ACTION_PREPARE,
+                          ACTION_WAIT):
+            return {'ok': False, 'error': f"Unknown action: {action}"}
+
+        try:
+            records = [tuple(record) for record in request['records']]
+            aliases = resolve_aliases(
+                [validation_name for _, validation_name, _ in records],
+                nameserver=self.nameserver,
+                max_workers=self.client.max_workers
+            )
+            records = [(domain, aliases[validation_name], validation)
+                       for domain, validation_name, validation in records]
+
+            if action == ACTION_ADD:
+                self.client.add_txt_records(
+                    records, int(request.get('ttl', DEFAULT_TTL))
+                )
+            elif action == ACTION_PREPARE:
+                self.client.prepare(
+                    {record_name for _, record_name, _ in records}
+                )
+            elif action == ACTION_WAIT:
+                return {'ok': True, 'updated': self.client.wait_for_updates(
+                    {record_name for _, record_name, _ in records},
+                    float(request['timeout'])
+                )}
+            else:
+                failures = self.client.del_txt_records(records)
+                if failures:
+                    raise BatchError(failures)
+        except BatchError as e:
+            return {'ok': False, 'error': str(e),
+                    'failures': {domain: str(error)
+                                 for domain, error in e.failures.items()}}
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning(f"Unable to handle {action} request", exc_info=e)
+            return {'ok': False, 'error': str(e) or type(e).__name__}
+
+        return {'ok': True}
+
+
+class DaemonClient:
+    """
+    Sends the records of a certbot run to a `.ChallengeDaemon`.
+    """
+
+    def __init__(self, socket_path, timeout=DEFAULT_CLIENT_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def add_txt_records(self, records, record_ttl):
+        """
+        Add several TXT records.
+
+        :param list records: Tuples of the domain to be verified, the
+            validation name and the record content.
+        :param int record_ttl: The record TTL (in seconds).
+        :raises .BatchError: if an error occurs for any of the domains.
+        :raises certbot.errors.PluginError: if the daemon is unavailable.
+        """
+        self._request({'action': ACTION_ADD, 'records': records,
+                       'ttl': record_ttl})
+
+    def del_txt_records(self, records):
+        """
+        Delete several TXT records.
+
+        Failures are logged and returned, but not raised. If the daemon is
+        unavailable, the deletion failed for all domains.
+
+        :param list records: Tuples of the domain to be verified, the
+            validation name and the record content.
+        :returns: The exceptions raised, keyed by domain.
+        :rtype: dict
+        """
+        try:
+            self._request({'action': ACTION_DELETE, 'records': records})
+        except BatchError as e:
+            logger.warning('Unable to delete TXT records', exc_info=e)
+            return e.failures
+        except errors.PluginError as e:
+            logger.warning('Unable to delete TXT records', exc_info=e)
+            return {domain: e for domain, _, _ in records}
+        return {}
+
+    def prepare(self, records):
+        """
+        Resolve the aliases and find the zones of records ahead of adding
+        them.
+
+        :param list records: Tuples of the domain to be verified, the
+            validation name and the record content.
+        :raises .BatchError: if no zone is found for any of the records.
+        :raises certbot.errors.PluginError: if the daemon is unavailable.
+        """
+        self._request({'action': ACTION_PREPARE, 'records': records})
+
+    def wait_for_updates(self, records, timeout):
+        """
+        Wait until ClouDNS reports the zones of the records as updated on all
+        of their nameservers.
+
+        :param list records: Tuples of the domain to be verified, the
+            validation name and the record content.
+        :param float timeout: The maximum number of seconds to wait.
+        :returns: Whether all zones were updated before the timeout.
+        :rtype: bool
+        :raises certbot.errors.PluginError: if an error occurs.
+        """
+        response = self._request({'action': ACTION_WAIT, 'records': records,
+                                  'timeout': timeout},
+                                 timeout=max(self.timeout, timeout + 60))
+        return response['updated']
+
+    def stats(self):
+        """
+        Get the statistics of the daemon's API requests and operations.
+
+        :rtype: dict
+        """
+        return self._request({'action': ACTION_STATS})
+
+    def _request(self, request, timeout=None):
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout or self.timeout)
+                sock.connect(self.socket_path)
+                sock.sendall(json.dumps(request).encode() + b'\n')
+                with sock.makefile('rb') as response_file:
+                    response = json.loads(response_file.readline())
+        except (OSError, ValueError) as e:
+            raise errors.PluginError(
+                f"Error communicating with the ClouDNS daemon at "
+                f"{self.socket_path}: {e}"
+            ) from e
+
+        if response.get('failures'):
+            raise BatchError({domain: errors.PluginError(error)
+                              for domain, error
+                              in response['failures'].items()})
+        if not response.get('ok'):
+            raise errors.PluginError(
+                f"ClouDNS daemon error: {response.get('error')}"
+            )
+        return response
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline(MAX_REQUEST_SIZE)
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('Request must be an object')
+        except ValueError as e:
+            response = {'ok': False, 'error': f"Invalid request: {e}"}
+        else:
+            response = self.server.daemon.handle(request)
+
+        self.wfile.write(json.dumps(response).encode() + b'\n')
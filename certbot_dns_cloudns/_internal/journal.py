@@ -0,0 +1,128 @@
+"""Journal of created records, for deleting the leftovers of crashed runs."""
+import json
+import logging
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+OP_ADD = 'add'
+OP_DELETE = 'delete'
+
+
+class RecordJournal:
+    """
+    Append-only log of the records created and not deleted yet, so the
+    records left behind by an interrupted run can be deleted by the next run
+    without listing them.
+
+    Entries are buffered and written by `flush`, with a single fsync for all
+    entries buffered since the previous flush. Once all records have been
+    deleted, the file is removed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = []
+        self._records = None
+
+    def add(self, account, zone, host, content, record_id):
+        """Record that a record was created."""
+        entry = {'op': OP_ADD, 'account': account, 'zone': zone,
+                 'host': host, 'content': content, 'id': str(record_id)}
+        with self._lock:
+            self._load()
+            self._records[(account, zone, entry['id'])] = entry
+            self._pending.append(entry)
+
+    def remove(self, account, zone, record_id):
+        """Record that a record was deleted."""
+        key = (account, zone, str(record_id))
+        with self._lock:
+            self._load()
+            if self._records.pop(key, None) is not None:
+                self._pending.append({'op': OP_DELETE, 'account': account,
+                                      'zone': zone, 'id': key[2]})
+
+    def records(self, account):
+        """
+        Get the records of an account which have not been deleted.
+
+        :param str account: The account.
+        :returns: Tuples of the zone name, host name, record content and
+            record_id.
+        :rtype: list
+        """
+        with self._lock:
+            self._load()
+            return [(entry['zone'], entry['host'], entry['content'],
+                     entry['id'])
+                    for (entry_account, _, _), entry in self._records.items()
+                    if entry_account == account]
+
+    def flush(self):
+        """Write the buffered entries to the file and sync it to disk."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+
+            if not self._records:
+                try:
+                    os.unlink(self.path)
+                except FileNotFoundError:
+                    pass
+                return
+
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)),
+                        exist_ok=True)
+            with open(self.path, 'a') as journal_file:
+                journal_file.writelines(json.dumps(entry) + '\n'
+                                        for entry in pending)
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+
+    def _load(self):
+        if self._records is not None:
+            return
+
+        self._records = {}
+        corrupt = False
+        try:
+            with open(self.path) as journal_file:
+                for line in journal_file:
+                    try:
+                        entry = json.loads(line)
+                        key = (entry['account'], entry['zone'], entry['id'])
+                        if entry['op'] == OP_ADD:
+                            self._records[key] = entry
+                        else:
+                            self._records.pop(key, None)
+                    except (ValueError, KeyError, TypeError):
+                        corrupt = True
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning(f"Unable to read record journal {self.path}",
+                           exc_info=e)
+            return
+
+        if corrupt:
+            # A write was interrupted, so the file is rewritten before
+            # appending to it
+            logger.debug(f"Rewriting damaged record journal {self.path}")
+            self._rewrite()
+
+    def _rewrite(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile(
+                'w', dir=directory, delete=False,
+                prefix=os.path.basename(self.path) + '.'
+        ) as temp_file:
+            temp_file.writelines(json.dumps(entry) + '\n'
+                                 for entry in self._records.values())
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_file.name, self.path)
@@ -0,0 +1,128 @@
+"""Instrumentation of the plugin's operations."""
+import contextlib
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+
+FORMAT_JSON = 'json'
+FORMAT_PROMETHEUS = 'prometheus'
+FORMATS = (FORMAT_JSON, FORMAT_PROMETHEUS)
+
+PROMETHEUS_PREFIX = 'certbot_dns_cloudns_operation'
+
+
+class Metrics:
+    """
+    Records the number of calls, the number of errors and the latency of
+    each operation.
+    """
+
+    def __init__(self):
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def timer(self, operation):
+        """Context manager recording the duration of an operation."""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.record(operation, time.perf_counter() - start, error=True)
+            raise
+        else:
+            self.record(operation, time.perf_counter() - start)
+
+    def record(self, operation, seconds, error=False):
+        """Record a single call of an operation."""
+        with self._lock:
+            stats = self._operations.setdefault(operation, {
+                'calls': 0,
+                'errors': 0,
+                'seconds_total': 0.0,
+                'seconds_max': 0.0,
+            })
+            stats['calls'] += 1
+            stats['errors'] += int(error)
+            stats['seconds_total'] += seconds
+            stats['seconds_max'] = max(stats['seconds_max'], seconds)
+
+    def reset(self):
+        """Discard all recorded calls."""
+        with self._lock:
+            self._operations.clear()
+
+    def summary(self):
+        """
+        Get the recorded statistics.
+
+        :returns: The calls, errors, total and maximum duration (in seconds)
+            of each operation, keyed by operation name.
+        :rtype: dict
+        """
+        with self._lock:
+            return {operation: dict(stats)
+                    for operation, stats in sorted(self._operations.items())}
+
+    def to_json(self):
+        """Format the statistics as a JSON document."""
+        return json.dumps({'operations': self.summary()}, indent=2)
+
+    def to_prometheus(self):
+        """Format the statistics in the Prometheus text exposition format."""
+        summary = self.summary()
+        lines = []
+        for name, key, metric_type, help_text in (
+                ('calls_total', 'calls', 'counter',
+                 'Number of calls of the operation.'),
+                ('errors_total', 'errors', 'counter',
+                 'Number of calls of the operation which failed.'),
+                ('duration_seconds_total', 'seconds_total', 'counter',
+                 'Total time spent in the operation.'),
+                ('duration_seconds_max', 'seconds_max', 'gauge',
+                 'Longest duration of a single call of the operation.'),
+        ):
+            metric = f'{PROMETHEUS_PREFIX}_{name}'
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} {metric_type}')
+            lines.extend(
+                f'{metric}{{operation="{operation}"}} {stats[key]}'
+                for operation, stats in summary.items()
+            )
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path, output_format=FORMAT_JSON):
+        """
+        Write the statistics to a file.
+
+        The file is replaced atomically, so it can be picked up by the
+        node_exporter textfile collector at any time.
+        """
+        content = (self.to_prometheus() if output_format == FORMAT_PROMETHEUS
+                   else self.to_json())
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile(
+                'w', dir=directory, delete=False,
+                prefix=os.path.basename(path) + '.'
+        ) as temp_file:
+            temp_file.write(content)
+        os.chmod(temp_file.name, 0o644)
+        os.replace(temp_file.name, path)
+
+
+# The metrics of all operations in this process
+REGISTRY = Metrics()
+
+
+def timed(operation):
+    """Decorator recording the duration of each call in `REGISTRY`."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with REGISTRY.timer(operation):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,108 @@
+"""
+Opt-in profiling of the plugin's phases.
+
+If the `PROFILE_ENV` environment variable is set to a directory, a cProfile
+dump of each phase (e.g. ``perform-1234-2.prof``, readable with
+``python -m pstats``) is written to it, and the duration of each phase is
+appended to ``timings.jsonl``.
+
+Only one phase is profiled at a time, and only in the thread running it, so
+phases running within another phase or in other threads are only timed, and
+the work of worker threads shows up as waiting in the profile.
+"""
+import functools
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENV = 'CERTBOT_DNS_CLOUDNS_PROFILE'
+TIMINGS_FILE = 'timings.jsonl'
+
+# Held while a phase is being profiled, as only one profiler can be active
+_profiler_lock = threading.Lock()
+_sequence = itertools.count(1)
+
+
+class Phase:
+    """
+    A phase of the plugin, profiled between `start` and `stop` if profiling
+    is enabled. Can also be used as a context manager.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._directory = None
+        self._profiler = None
+        self._start = None
+
+    def start(self):
+        self._directory = os.environ.get(PROFILE_ENV)
+        if not self._directory:
+            return self
+
+        if _profiler_lock.acquire(blocking=False):
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+            except ValueError:
+                # Another profiler is active, e.g. when run under cProfile
+                self._profiler = None
+                _profiler_lock.release()
+        self._start = time.perf_counter()
+        return self
+
+    def stop(self):
+        if self._start is None:
+            return
+
+        seconds = time.perf_counter() - self._start
+        self._start = None
+        profiler, self._profiler = self._profiler, None
+        if profiler is not None:
+            profiler.disable()
+            _profiler_lock.release()
+
+        try:
+            self._write(seconds, profiler)
+        except OSError as e:
+            logger.warning(f"Unable to write profile of {self.name} to "
+                           f"{self._directory}", exc_info=e)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _write(self, seconds, profiler):
+        os.makedirs(self._directory, exist_ok=True)
+        entry = {'phase': self.name, 'pid': os.getpid(),
+                 'time': time.time(), 'seconds': round(seconds, 6)}
+        if profiler is not None:
+            entry['profile'] = os.path.join(
+                self._directory,
+                f"{self.name}-{os.getpid()}-{next(_sequence)}.prof"
+            )
+            profiler.dump_stats(entry['profile'])
+
+        with open(os.path.join(self._directory, TIMINGS_FILE), 'a') as file:
+            file.write(json.dumps(entry) + '\n')
+        logger.debug(f"Phase {self.name} took {seconds:.3f} seconds")
+
+
+def profiled(name):
+    """Decorator profiling each call as a `.Phase`."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with Phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
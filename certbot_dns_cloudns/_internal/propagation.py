@@ -0,0 +1,252 @@
+"""Active polling for the propagation of TXT records."""
+import concurrent.futures
+import logging
+import socket
+import time
+
+import dns.exception
+import dns.flags
+import dns.message
+import dns.name
+import dns.query
+import dns.rdatatype
+import dns.resolver
+from certbot import errors
+
+from certbot_dns_cloudns._internal.resolve import _get_resolver
+from certbot_dns_cloudns._internal.resolve import DEFAULT_MAX_WORKERS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INITIAL_INTERVAL = 1.0
+DEFAULT_MAX_INTERVAL = 10.0
+DEFAULT_BACKOFF_FACTOR = 1.5
+DEFAULT_QUERY_TIMEOUT = 5.0
+
+
+def find_authoritative_nameservers(record_name, nameserver=None):
+    """
+    Find the addresses of the authoritative nameservers for a record name.
+
+    :param str record_name: The record name.
+    :param str nameserver: The nameserver used for the lookups, if any.
+    :returns: The IP addresses of all nameservers of the enclosing zone which
+        this host has a route to.
+    :rtype: list
+    :raises certbot.errors.PluginError: if no reachable nameserver address
+        was found.
+    """
+    resolver = _get_resolver(nameserver)
+    zone = dns.resolver.zone_for_name(record_name, resolver=resolver)
+
+    addresses = set()
+    for ns_record in resolver.resolve(zone, 'NS'):
+        for rdtype in ('A', 'AAAA'):
+            try:
+                answer = resolver.resolve(ns_record.target, rdtype)
+            except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+                continue
+            addresses.update(record.address for record in answer)
+
+    # IPv4-only hosts can never get an answer from the IPv6 addresses, which
+    # would make every poll run into the timeout
+    unreachable = {address for address in addresses
+                   if not _is_routable(address)}
+    if unreachable:
+        logger.debug(f"Skipping unreachable nameservers for {zone}: "
+                     f"{', '.join(sorted(unreachable))}")
+        addresses -= unreachable
+    if not addresses:
+        raise errors.PluginError(f"Unable to find a reachable authoritative "
+                                 f"nameserver for {zone}")
+
+    logger.debug(f"Authoritative nameservers for {zone}: "
+                 f"{', '.join(sorted(addresses))}")
+    return sorted(addresses)
+
+
+def _is_routable(address, port=53):
+    # Connecting a UDP socket only looks up the route, no packets are sent
+    family = socket.AF_INET6 if ':' in address else socket.AF_INET
+    try:
+        with socket.socket(family, socket.SOCK_DGRAM) as sock:
+            sock.connect((address, port))
+    except OSError:
+        return False
+    return True
+
+
+def find_nameservers(record_names, nameserver=None,
+                     max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Find the authoritative nameservers of several record names concurrently.
+
+    :param list record_names: The record names.
+    :param str nameserver: The nameserver used for the lookups, if any.
+    :returns: The IP addresses of the nameservers, keyed by record name.
+    :rtype: dict
+    """
+    record_names = list(dict.fromkeys(record_names))
+    if not record_names:
+        return {}
+
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(max_workers, len(record_names))
+    ) as executor:
+        return dict(zip(record_names, executor.map(
+            lambda record_name: find_authoritative_nameservers(record_name,
+                                                               nameserver),
+            record_names
+        )))
+
+
+def wait_for_zone_updates(is_updated, zones, timeout,
+                          initial_interval=DEFAULT_INITIAL_INTERVAL,
+                          max_interval=DEFAULT_MAX_INTERVAL,
+                          backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                          max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Poll until all zones are reported as updated, checking the pending zones
+    concurrently in every round.
+
+    :param callable is_updated: Returns whether a zone has been updated.
+        Exceptions are treated as the zone not being updated yet.
+    :param set zones: The zones to wait for.
+    :param float timeout: The maximum number of seconds to wait.
+    :returns: Whether all zones were updated before the timeout.
+    :rtype: bool
+    """
+    def check(zone):
+        try:
+            return is_updated(zone)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.debug(f"Checking whether {zone} is updated failed: {e}")
+            return False
+
+    pending = set(zones)
+    deadline = time.monotonic() + timeout
+    interval = initial_interval
+
+    while pending:
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(max_workers, len(pending))
+        ) as executor:
+            zones = sorted(pending)
+            for zone, updated in zip(zones, executor.map(check, zones)):
+                if updated:
+                    logger.debug(f"Zone {zone} is updated")
+                    pending.discard(zone)
+
+        remaining = deadline - time.monotonic()
+        if pending and remaining <= 0:
+            logger.debug(f"Zones not updated: {', '.join(sorted(pending))}")
+            return False
+        if pending:
+            time.sleep(min(interval, remaining))
+            interval = min(interval * backoff_factor, max_interval)
+
+    return True
+
+
+def wait_for_txt_records(records, timeout, port=53,
+                         initial_interval=DEFAULT_INITIAL_INTERVAL,
+                         max_interval=DEFAULT_MAX_INTERVAL,
+                         backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                         query_timeout=DEFAULT_QUERY_TIMEOUT,
+                         max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Poll nameservers until all expected TXT record values are visible.
+
+    The nameservers are queried concurrently in every round, and no query
+    runs past the deadline. The poll interval starts at `initial_interval`
+    and is multiplied by `backoff_factor` after every round, up to
+    `max_interval`.
+
+    :param dict records: Mapping of record names to tuples of nameserver
+        addresses to query and the TXT values expected on each of them.
+    :param float timeout: The maximum number of seconds to wait.
+    :param int port: The port the nameservers are listening on.
+    :returns: Whether all records were visible before the timeout.
+    :rtype: bool
+    :raises certbot.errors.PluginError: if there are no records, or no
+        nameserver or expected value for a record name.
+    """
+    _check_expected_records(records)
+    pending = {
+        (record_name, address): set(values)
+        for record_name, (addresses, values) in records.items()
+        for address in addresses
+    }
+    deadline = time.monotonic() + timeout
+    interval = initial_interval
+
+    def query(key):
+        record_name, address = key
+        # Queries waiting for a worker only get the time left
+        remaining = min(query_timeout, deadline - time.monotonic())
+        if remaining <= 0:
+            return set()
+        return _query_txt(record_name, address, port, remaining)
+
+    while True:
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(max_workers, len(pending))
+        ) as executor:
+            keys = list(pending)
+            for key, found in zip(keys, executor.map(query, keys)):
+                if pending[key] <= found:
+                    record_name, address = key
+                    logger.debug(f"TXT records for {record_name} visible on "
+                                 f"{address}")
+                    del pending[key]
+
+        if not pending:
+            return True
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logger.debug("TXT records not yet visible: " + ', '.join(
+                f"{record_name} @ {address}"
+                for record_name, address in pending
+            ))
+            return False
+
+        time.sleep(min(interval, remaining))
+        interval = min(interval * backoff_factor, max_interval)
+
+
+def _check_expected_records(records):
+    # Without anything to check, polling would succeed immediately
+    if not records:
+        raise errors.PluginError("No TXT records to wait for")
+    for record_name, (addresses, values) in records.items():
+        if not addresses:
+            raise errors.PluginError(f"No nameservers to query for "
+                                     f"{record_name}")
+        if not values:
+            raise errors.PluginError(f"No TXT values expected for "
+                                     f"{record_name}")
+
+
+def _query_txt(record_name, address, port, timeout):
+    query = dns.message.make_query(dns.name.from_text(record_name),
+                                   dns.rdatatype.TXT)
+    # The TCP retry of a truncated answer shares the timeout
+    deadline = time.monotonic() + timeout
+    try:
+        response = dns.query.udp(query, address, timeout=timeout, port=port)
+        if response.flags & dns.flags.TC:
+            response = dns.query.tcp(
+                query, address, port=port,
+                timeout=max(0, deadline - time.monotonic())
+            )
+    except (dns.exception.DNSException, OSError) as e:
+        logger.debug(f"Querying {address} for {record_name} failed: {e}")
+        return set()
+
+    return {
+        b''.join(record.strings).decode()
+        for rrset in response.answer
+        if rrset.rdtype == dns.rdatatype.TXT
+        for record in rrset
+    }
@@ -1,14 +1,68 @@
+import asyncio
+import collections
+import concurrent.futures
 import functools
 import logging
+import re
+import threading
+import time
 
+import dns.asyncresolver
+import dns.exception
+import dns.rdatatype
 import dns.resolver
 import dns.name
 from certbot import errors
 
+from certbot_dns_cloudns._internal import metrics
+from certbot_dns_cloudns._internal.cache import TTLCache
+
 logger = logging.getLogger(__name__)
 
+DEFAULT_MAX_WORKERS = 10
+DEFAULT_NEGATIVE_TTL = 60
+MAX_ALIAS_CHAIN_LENGTH = 16
+UNHEALTHY_AFTER_FAILURES = 3
+UNHEALTHY_SECONDS = 60
 
-@functools.lru_cache(maxsize=None)
+# Errors which are answers of a nameserver, rather than failures
+_NEGATIVE_ANSWERS = (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer)
+
+# Targets of CNAME records (or None if there are none), keyed by the
+# nameserver used for the lookup and the record name
+_aliases = TTLCache()
+_UNKNOWN = object()
+# Seconds after which a query to a nameserver is abandoned, or None for the
+# dnspython defaults
+_query_timeout = None
+
+
+def configure(query_timeout=None):
+    """
+    Configure the resolvers used for all lookups.
+
+    :param float query_timeout: The number of seconds after which a query to
+        a nameserver is abandoned, or None for the dnspython defaults.
+    """
+    global _query_timeout
+    if query_timeout != _query_timeout:
+        _query_timeout = query_timeout
+        _get_resolver.cache_clear()
+        _get_async_resolver.cache_clear()
+
+
+def parse_nameservers(nameserver):
+    """
+    Split a list of nameservers separated by commas or whitespace.
+
+    :param str nameserver: The nameservers, or None.
+    :rtype: list
+    """
+    return [address for address in re.split(r'[\s,]+', nameserver or '')
+            if address]
+
+
+@metrics.timed('resolve_alias')
 def resolve_alias(domain_name, nameserver):
     """
     Performs recursive CNAME lookups for a given domain name.
@@ -16,34 +70,324 @@ def resolve_alias(domain_name, nameserver):
     resolver = _get_resolver(nameserver)
     name = dns.name.from_text(domain_name)
 
-    while True:
-        try:
-            records = resolver.resolve(name, 'CNAME')
-            if len(records) > 1:
-                raise errors.PluginError(
-                    f"Name {name} has multiple CNAME records set: "
-                    f"{', '.join(record.target for record in records)}"
-                )
-            elif len(records) == 1:
-                resolved_name = records[0].target
-                logger.debug(f"{name} points to {resolved_name}")
-                name = resolved_name
+    for _ in range(MAX_ALIAS_CHAIN_LENGTH):
+        target = _aliases.get((nameserver, name), _UNKNOWN)
+        if target is _UNKNOWN:
+            try:
+                answer = resolver.resolve(name, 'CNAME')
+            except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN) as e:
+                target = _cache_no_alias(nameserver, name, e)
+            else:
+                target = _cache_alias(nameserver, name, answer)
+
+        if target is None:
+            return name.to_text(omit_final_dot=True)
+        name = target
+
+    raise _chain_too_long(domain_name)
+
+
+async def resolve_alias_async(domain_name, nameserver):
+    """
+    Performs recursive CNAME lookups for a given domain name without
+    blocking the event loop.
+    """
+    resolver = _get_async_resolver(nameserver)
+    name = dns.name.from_text(domain_name)
+
+    for _ in range(MAX_ALIAS_CHAIN_LENGTH):
+        target = _aliases.get((nameserver, name), _UNKNOWN)
+        if target is _UNKNOWN:
+            try:
+                answer = await resolver.resolve(name, 'CNAME')
+            except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN) as e:
+                target = _cache_no_alias(nameserver, name, e)
             else:
-                break
-        except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
-            logger.debug(f"No CNAME record found for {name}")
-            break
+                target = _cache_alias(nameserver, name, answer)
+
+        if target is None:
+            return name.to_text(omit_final_dot=True)
+        name = target
+
+    raise _chain_too_long(domain_name)
+
+
+def resolve_aliases(domain_names, nameserver, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Performs recursive CNAME lookups for several domain names concurrently.
+
+    :param list domain_names: The domain names to resolve.
+    :param str nameserver: The nameservers to use, if any.
+    :param int max_workers: The maximum number of concurrent lookups.
+    :returns: The resolved names, keyed by the domain names.
+    :rtype: dict
+    :raises certbot.errors.PluginError: if any of the lookups fails.
+    """
+    domain_names = list(dict.fromkeys(domain_names))
+    if not domain_names:
+        return {}
+
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(max_workers, len(domain_names))
+    ) as executor:
+        return dict(zip(domain_names, executor.map(
+            lambda domain_name: resolve_alias(domain_name, nameserver),
+            domain_names
+        )))
+
+
+def _cache_alias(nameserver, name, answer):
+    target = _cname_target(name, answer)
+    _aliases.set((nameserver, name), target, answer.rrset.ttl)
+    return target
+
+
+def _cache_no_alias(nameserver, name, error):
+    logger.debug(f"No CNAME record found for {name}")
+    _aliases.set((nameserver, name), None, _negative_ttl(error))
+    return None
+
+
+def _negative_ttl(error):
+    """
+    Determine how long a negative answer may be cached (RFC 2308), i.e. the
+    minimum of the SOA record's TTL and its MINIMUM field.
+    """
+    try:
+        if isinstance(error, dns.resolver.NXDOMAIN):
+            responses = error.responses().values()
+        else:
+            responses = [error.response()]
+    except (AttributeError, KeyError):
+        return DEFAULT_NEGATIVE_TTL
+
+    for response in responses:
+        for rrset in response.authority:
+            if rrset.rdtype == dns.rdatatype.SOA:
+                return min(rrset.ttl, rrset[0].minimum)
+
+    return DEFAULT_NEGATIVE_TTL
+
 
-    return name.to_text(omit_final_dot=True)
+def _chain_too_long(domain_name):
+    return errors.PluginError(
+        f"CNAME chain for {domain_name} exceeds {MAX_ALIAS_CHAIN_LENGTH} "
+        f"records."
+    )
+
+
+def _cname_target(name, records):
+    if len(records) > 1:
+        raise errors.PluginError(
+            f"Name {name} has multiple CNAME records set: "
+            f"{', '.join(str(record.target) for record in records)}"
+        )
+    elif len(records) == 1:
+        resolved_name = records[0].target
+        logger.debug(f"{name} points to {resolved_name}")
+        return resolved_name
+    return None
+
+
+class NameserverHealth:
+    """
+    Tracks the consecutive failures of nameservers.
+
+    A nameserver which failed `threshold` times in a row is skipped for
+    `duration` seconds, after which it is tried again. A single failure of a
+    nameserver tried again makes it skipped for another `duration` seconds.
+    """
+
+    def __init__(self, threshold=UNHEALTHY_AFTER_FAILURES,
+                 duration=UNHEALTHY_SECONDS, clock=time.monotonic):
+        self.threshold = threshold
+        self.duration = duration
+        self.clock = clock
+        self._failures = collections.Counter()
+        self._unhealthy_until = {}
+        self._lock = threading.Lock()
+
+    def select(self, nameservers):
+        """
+        Get the healthy nameservers among some nameservers.
+
+        :param list nameservers: The nameserver addresses.
+        :returns: The healthy nameservers, or all of them if none is healthy.
+        :rtype: list
+        """
+        now = self.clock()
+        with self._lock:
+            healthy = [address for address in nameservers
+                       if self._unhealthy_until.get(address, now) <= now]
+        return healthy or list(nameservers)
+
+    def record(self, nameserver, ok):
+        """
+        Record the outcome of a query.
+
+        :param str nameserver: The nameserver address.
+        :param bool ok: Whether the nameserver answered.
+        """
+        with self._lock:
+            if ok:
+                self._failures.pop(nameserver, None)
+                self._unhealthy_until.pop(nameserver, None)
+                return
+
+            self._failures[nameserver] += 1
+            if self._failures[nameserver] >= self.threshold:
+                logger.debug(f"Nameserver {nameserver} failed "
+                             f"{self._failures[nameserver]} times in a row; "
+                             f"skipping it for {self.duration} seconds")
+                self._unhealthy_until[nameserver] = \
+                    self.clock() + self.duration
+
+
+# Health of all nameservers, shared by all resolver pools
+_health = NameserverHealth()
+
+
+class ResolverPool:
+    """
+    Sends each query to several nameservers in parallel and uses the first
+    answer.
+
+    Negative answers (NXDOMAIN or no records of the type) are answers too, so
+    they are returned as soon as they arrive. Only nameservers which are
+    healthy are queried, and any of them failing counts towards them being
+    unhealthy. Each nameserver has its own dnspython resolver, which retries
+    truncated answers over TCP.
+    """
+
+    def __init__(self, nameservers, timeout=None, health=None, port=53,
+                 max_workers=DEFAULT_MAX_WORKERS):
+        self.nameservers = list(nameservers)
+        self.health = health or _health
+        self._resolvers = {
+            address: _configure_resolver(dns.resolver.Resolver, [address],
+                                         timeout, port)
+            for address in self.nameservers
+        }
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers * len(self.nameservers),
+            thread_name_prefix='resolver'
+        )
+
+    def resolve(self, *args, **kwargs):
+        """
+        Race a query to the healthy nameservers.
+
+        Takes the arguments of `dns.resolver.Resolver.resolve`.
+
+        :raises dns.exception.DNSException: if the first answer is negative,
+            or the error of the last nameserver if all of them failed.
+        """
+        futures = [self._executor.submit(self._query, address, args, kwargs)
+                   for address in self.health.select(self.nameservers)]
+
+        error = None
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                return future.result()
+            except _NEGATIVE_ANSWERS:
+                raise
+            except dns.exception.DNSException as e:
+                error = e
+        raise error
+
+    def _query(self, address, args, kwargs):
+        try:
+            answer = self._resolvers[address].resolve(*args, **kwargs)
+        except _NEGATIVE_ANSWERS:
+            self.health.record(address, True)
+            raise
+        except dns.exception.DNSException as e:
+            logger.debug(f"Query to nameserver {address} failed: {e}")
+            self.health.record(address, False)
+            raise
+        self.health.record(address, True)
+        return answer
+
+
+class AsyncResolverPool:
+    """
+    Like `.ResolverPool`, without blocking the event loop. The queries still
+    pending once the first answer arrives are cancelled.
+    """
+
+    def __init__(self, nameservers, timeout=None, health=None, port=53):
+        self.nameservers = list(nameservers)
+        self.health = health or _health
+        self._resolvers = {
+            address: _configure_resolver(dns.asyncresolver.Resolver,
+                                         [address], timeout, port)
+            for address in self.nameservers
+        }
+
+    async def resolve(self, *args, **kwargs):
+        """Race a query to the healthy nameservers, see `.ResolverPool`."""
+        tasks = [asyncio.ensure_future(self._query(address, args, kwargs))
+                 for address in self.health.select(self.nameservers)]
+
+        error = None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    return await next_done
+                except _NEGATIVE_ANSWERS:
+                    raise
+                except dns.exception.DNSException as e:
+                    error = e
+        finally:
+            for task in tasks:
+                task.cancel()
+        raise error
+
+    async def _query(self, address, args, kwargs):
+        try:
+            answer = await self._resolvers[address].resolve(*args, **kwargs)
+        except _NEGATIVE_ANSWERS:
+            self.health.record(address, True)
+            raise
+        except dns.exception.DNSException as e:
+            logger.debug(f"Query to nameserver {address} failed: {e}")
+            self.health.record(address, False)
+            raise
+        self.health.record(address, True)
+        return answer
 
 
 @functools.lru_cache(maxsize=None)
 def _get_resolver(nameserver):
-    if nameserver is None:
-        resolver = dns.resolver.Resolver()
+    nameservers = parse_nameservers(nameserver)
+    if len(nameservers) > 1:
+        logger.debug(f"Racing nameservers {', '.join(nameservers)}")
+        return ResolverPool(nameservers, _query_timeout)
+    return _configure_resolver(dns.resolver.Resolver, nameservers,
+                               _query_timeout)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_async_resolver(nameserver):
+    nameservers = parse_nameservers(nameserver)
+    if len(nameservers) > 1:
+        logger.debug(f"Racing nameservers {', '.join(nameservers)}")
+        return AsyncResolverPool(nameservers, _query_timeout)
+    return _configure_resolver(dns.asyncresolver.Resolver, nameservers,
+                               _query_timeout)
+
+
+def _configure_resolver(resolver_class, nameservers, timeout=None, port=53):
+    if not nameservers:
+        resolver = resolver_class()
     else:
-        resolver = dns.resolver.Resolver(configure=False)
-        resolver.nameservers.append(nameserver)
+        resolver = resolver_class(configure=False)
+        resolver.nameservers = list(nameservers)
+        resolver.port = port
+
+    if timeout is not None:
+        resolver.timeout = timeout
+        resolver.lifetime = timeout * len(resolver.nameservers)
 
     logger.debug(
         f"Using nameserver{'s' if len(resolver.nameservers) > 1 else ''} "
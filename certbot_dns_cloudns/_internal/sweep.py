@@ -0,0 +1,148 @@
+"""
+Removal of challenge records left behind by crashed or interrupted runs.
+
+The ClouDNS API does not report when records were created, so each sweep
+records when it first saw each challenge record, and only records first seen
+by an earlier sweep at least `min_age` seconds ago are deleted. This leaves
+the records of validations in progress alone.
+"""
+import collections
+import fnmatch
+import logging
+import time
+
+from certbot_dns_cloudns._internal.cache import JsonFile
+
+logger = logging.getLogger(__name__)
+
+CHALLENGE_LABEL = '_acme-challenge'
+DEFAULT_MIN_AGE = 3600
+DEFAULT_STATE_FILE = '/var/lib/letsencrypt/cloudns-sweep.json'
+
+ChallengeRecord = collections.namedtuple(
+    'ChallengeRecord', ('zone', 'record_id', 'host', 'content', 'age')
+)
+ChallengeRecord.__doc__ = """
+A challenge TXT record found by a sweep.
+
+`age` is the number of seconds since a sweep first saw the record.
+"""
+
+
+def is_challenge_host(host, patterns=()):
+    """
+    Check whether a host name is that of a challenge record.
+
+    :param str host: The host name, relative to its zone.
+    :param iterable patterns: Glob patterns of further host names of
+        challenge records, e.g. the targets of delegated validation names.
+    :rtype: bool
+    """
+    return host.split('.', 1)[0] == CHALLENGE_LABEL or any(
+        fnmatch.fnmatchcase(host, pattern) for pattern in patterns
+    )
+
+
+class SightingLog(JsonFile):
+    """
+    When each challenge record was first seen by a sweep.
+
+    Entries are stored in a JSON file, grouped by ClouDNS account and zone.
+    The entries of a zone are replaced by the records found in each sweep of
+    the zone, so deleted records are forgotten.
+    """
+
+    def record(self, account, zone_records, now=None):
+        """
+        Record the challenge records found in some zones.
+
+        :param str account: The account the zones belong to.
+        :param dict zone_records: The contents of the records found, keyed by
+            zone name and record_id.
+        :param float now: The current time.
+        :returns: When each record was first seen, keyed by a tuple of the
+            zone name and record_id.
+        :rtype: dict
+        """
+        now = time.time() if now is None else now
+        first_seen = {}
+        with self._update() as data:
+            entries = data.setdefault(account, {})
+            for zone, records in zone_records.items():
+                previous = entries.get(zone, {})
+                entries[zone] = {}
+                for record_id, content in records.items():
+                    entry = previous.get(record_id)
+                    if entry is None or entry['content'] != content:
+                        entry = {'content': content, 'first_seen': now}
+                    entries[zone][record_id] = entry
+                    first_seen[(zone, record_id)] = entry['first_seen']
+        return first_seen
+
+    @staticmethod
+    def _prune(data):
+        for account in list(data):
+            data[account] = {zone: entries
+                             for zone, entries in data[account].items()
+                             if entries}
+            if not data[account]:
+                del data[account]
+
+
+def sweep(client, sightings, account, zones=None, min_age=DEFAULT_MIN_AGE,
+          dry_run=False, challenge_hosts=()):
+    """
+    Find the challenge records of some zones and delete the stale ones.
+
+    The TXT records of the zones are streamed from the API, listing several
+    zones concurrently, and the stale records are deleted concurrently.
+
+    :param .ClouDNSClient client: The client of the account.
+    :param .SightingLog sightings: When the records were first seen.
+    :param str account: The account the zones belong to.
+    :param iterable zones: The zones to sweep, or None to sweep all zones of
+        the account.
+    :param float min_age: The number of seconds since a record was first seen
+        after which it is stale.
+    :param bool dry_run: Only report the stale records, without deleting
+        them.
+    :param iterable challenge_hosts: Glob patterns of host names, relative
+        to their zone, of challenge records besides the `_acme-challenge`
+        ones, e.g. the targets of delegated validation names.
+    :returns: All challenge records found, and the exceptions raised for
+        records which could not be deleted, keyed by zone name and record_id.
+    :rtype: tuple
+    """
+    if zones is None:
+        zones = client.iter_zones()
+
+    found = {}
+    hosts = {}
+    for zone, records in client.iter_zone_txt_records(
+            zones, lambda record: is_challenge_host(record.get('host', ''),
+                                                    challenge_hosts)
+    ):
+        found[zone] = {}
+        for record_id, record in records.items():
+            found[zone][record_id] = record['record']
+            hosts[(zone, record_id)] = record['host']
+
+    now = time.time()
+    first_seen = sightings.record(account, found, now)
+    challenge_records = [
+        ChallengeRecord(zone, record_id, hosts[(zone, record_id)], content,
+                        now - first_seen[(zone, record_id)])
+        for zone, records in found.items()
+        for record_id, content in records.items()
+    ]
+
+    stale = [record for record in challenge_records if record.age >= min_age]
+    logger.debug(f"Found {len(challenge_records)} challenge records in "
+                 f"{len(found)} zones, {len(stale)} of them stale.")
+
+    failures = {}
+    if stale and not dry_run:
+        failures = client.delete_records(
+            [(record.zone, record.record_id) for record in stale]
+        )
+    return challenge_records, failures
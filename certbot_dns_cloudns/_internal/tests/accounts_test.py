@@ -0,0 +1,187 @@
+"""Tests for certbot_dns_cloudns._internal.accounts."""
+
+import sys
+import time
+from unittest import mock
+
+import pytest
+
+from certbot import errors
+from certbot.plugins import dns_common
+from certbot.plugins import dns_test_common
+
+from certbot_dns_cloudns._internal import accounts
+from certbot_dns_cloudns._internal.client import BatchError
+from certbot_dns_cloudns._internal.client import ClouDNSClient
+
+
+def load(tmp_path, values):
+    path = str(tmp_path / "cloudns.ini")
+    dns_test_common.write(values, path)
+    return dns_common.CredentialsConfiguration(
+        path, lambda key: "dns_cloudns_" + key.replace("-", "_")
+    )
+
+
+@pytest.fixture
+def credentials(tmp_path):
+    return load(tmp_path, {
+        "dns_cloudns_accounts": "main, shop",
+        "dns_cloudns_timeout": "10",
+        "dns_cloudns_main_auth_id": "1234",
+        "dns_cloudns_main_auth_password": "secret1",
+        "dns_cloudns_shop_sub_auth_user": "shop",
+        "dns_cloudns_shop_auth_password": "secret2",
+        "dns_cloudns_shop_timeout": "5",
+        "dns_cloudns_shop_zones": "shop.example.com example.net",
+    })
+
+
+def test_account_credentials(credentials):
+    shop = accounts.AccountCredentials(credentials, "shop")
+    main = accounts.AccountCredentials(credentials, "main")
+
+    assert accounts.account_names(credentials) == ["main", "shop"]
+    assert shop.conf("sub-auth-user") == "shop"
+    assert shop.conf("auth-id") is None
+    assert shop.conf("timeout") == "5"
+    assert main.conf("timeout") == "10"
+    assert main.mapper("auth-id") == "dns_cloudns_main_auth_id"
+
+
+def test_make_client(credentials):
+    client = accounts.make_client(credentials, max_workers=4)
+
+    assert set(client.clients) == {"main", "shop"}
+    assert client.clients["shop"].account == "sub-auth-user=shop"
+    assert client.clients["shop"].transport.timeout == 5
+    assert client.clients["main"].max_workers == 4
+    assert client.find_account("_acme-challenge.www.shop.example.com") == \
+        "shop"
+
+
+def test_make_client_for_single_account(tmp_path):
+    credentials = load(tmp_path, {"dns_cloudns_auth_id": "1234",
+                                  "dns_cloudns_auth_password": "secret"})
+
+    assert isinstance(accounts.make_client(credentials), ClouDNSClient)
+
+
+def test_validate_accounts(tmp_path):
+    credentials = load(tmp_path, {
+        "dns_cloudns_accounts": "main shop Other",
+        "dns_cloudns_auth_password": "shared",
+        "dns_cloudns_main_auth_id": "1234",
+        "dns_cloudns_main_sub_auth_id": "5678",
+        "dns_cloudns_main_auth_password": "secret",
+        "dns_cloudns_shop_auth_id": "1234",
+    })
+
+    with pytest.raises(errors.PluginError) as exc_info:
+        accounts.validate_accounts(credentials)
+
+    message = str(exc_info.value)
+    assert "dns_cloudns_main_auth_id, dns_cloudns_main_sub_auth_id" in message
+    assert "dns_cloudns_shop_auth_password not found" in message
+    assert "'Other'" in message
+
+
+def client_for(zones):
+    def find_zone_and_host(record_name):
+        for zone in zones:
+            if record_name.endswith("." + zone):
+                return zone, record_name[:-len(zone) - 1]
+        raise errors.PluginError(f"No zone for {record_name}")
+
+    client = mock.MagicMock()
+    client.find_zone_and_host.side_effect = find_zone_and_host
+    return client
+
+
+@pytest.fixture
+def clients():
+    return {"main": client_for(["example.com"]),
+            "shop": client_for(["example.net"])}
+
+
+RECORDS = [
+    ("example.com", "_acme-challenge.example.com", "token1"),
+    ("example.net", "_acme-challenge.example.net", "token2"),
+    ("www.example.net", "_acme-challenge.www.example.net", "token3"),
+]
+
+
+def test_routes_records_to_accounts(clients):
+    client = accounts.MultiAccountClient(clients)
+
+    client.add_txt_records(RECORDS, 60)
+    client.del_txt_records(RECORDS)
+
+    clients["main"].add_txt_records.assert_called_once_with(RECORDS[:1], 60)
+    clients["shop"].add_txt_records.assert_called_once_with(RECORDS[1:], 60)
+    clients["main"].del_txt_records.assert_called_once_with(RECORDS[:1])
+    clients["shop"].del_txt_records.assert_called_once_with(RECORDS[1:])
+    # Routes are remembered for cleanup
+    assert clients["shop"].find_zone_and_host.call_count == 2
+
+
+def test_routes_by_configured_zones(clients):
+    client = accounts.MultiAccountClient(
+        clients, zones={"main": "example.net", "shop": "www.example.net."}
+    )
+
+    assert client.find_account("_acme-challenge.www.example.net") == "shop"
+    assert client.find_account("_acme-challenge.example.net") == "main"
+    for account_client in clients.values():
+        account_client.find_zone_and_host.assert_not_called()
+
+
+def test_accounts_run_in_parallel(clients):
+    for account_client in clients.values():
+        account_client.add_txt_records.side_effect = \
+            lambda *args: time.sleep(0.2)
+
+    start = time.monotonic()
+    accounts.MultiAccountClient(clients).add_txt_records(RECORDS, 60)
+
+    assert time.monotonic() - start < 0.35
+
+
+def test_wait_for_updates_per_account(clients):
+    clients["main"].wait_for_updates.return_value = True
+    clients["shop"].wait_for_updates.return_value = False
+    names = [record_name for _, record_name, _ in RECORDS]
+
+    assert not accounts.MultiAccountClient(clients).wait_for_updates(names,
+                                                                     30)
+    clients["main"].wait_for_updates.assert_called_once_with(names[:1], 30)
+    clients["shop"].wait_for_updates.assert_called_once_with(names[1:], 30)
+
+
+def test_prepare_per_account(clients):
+    names = [record_name for _, record_name, _ in RECORDS] + \
+        ["_acme-challenge.example.org"]
+
+    with pytest.raises(BatchError) as exc_info:
+        accounts.MultiAccountClient(clients).prepare(names)
+
+    assert list(exc_info.value.failures) == ["_acme-challenge.example.org"]
+    clients["main"].prepare.assert_called_once_with(names[:1])
+    clients["shop"].prepare.assert_called_once_with(names[1:3])
+
+
+def test_failures_are_merged(clients):
+    clients["shop"].add_txt_records.side_effect = BatchError(
+        {"example.net": errors.PluginError("boom")}
+    )
+    records = RECORDS + [("example.org", "_acme-challenge.example.org", "t")]
+
+    with pytest.raises(BatchError) as exc_info:
+        accounts.MultiAccountClient(clients).add_txt_records(records, 60)
+
+    assert set(exc_info.value.failures) == {"example.net", "example.org"}
+    assert "main: No zone for" in str(exc_info.value.failures["example.org"])
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))  # pragma: no cover
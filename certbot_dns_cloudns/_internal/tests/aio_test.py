@@ -0,0 +1,126 @@
+"""Tests for certbot_dns_cloudns._internal.aio."""
+
+import asyncio
+import sys
+from unittest import mock
+
+import dns.asyncresolver
+import pytest
+
+from certbot import errors
+
+from certbot_dns_cloudns._internal import resolve
+from certbot_dns_cloudns._internal.aio import AsyncClouDNSClient
+from certbot_dns_cloudns._internal.client import BatchError
+from certbot_dns_cloudns._internal.tests.dns_stub import StubDNSServer
+
+DOMAIN = "example.com"
+
+
+@pytest.fixture
+def server():
+    resolve._aliases.clear()
+    with StubDNSServer() as server:
+        resolver = dns.asyncresolver.Resolver(configure=False)
+        resolver.nameservers = [server.address]
+        resolver.port = server.port
+        with mock.patch.object(resolve, "_get_async_resolver",
+                               return_value=resolver):
+            yield server
+
+
+@pytest.fixture
+def client():
+    client = mock.MagicMock()
+    client.find_zone_and_host.side_effect = \
+        lambda name: (DOMAIN, name[:-len(DOMAIN) - 1])
+    return client
+
+
+def test_resolve_alias_async(server):
+    server.set("_acme-challenge.example.com", "CNAME",
+               "_acme-challenge.example.org.")
+    server.set("_acme-challenge.example.org", "CNAME",
+               "challenges.example.net.")
+
+    assert asyncio.run(resolve.resolve_alias_async(
+        "_acme-challenge.example.com", None
+    )) == "challenges.example.net"
+    assert asyncio.run(resolve.resolve_alias_async(
+        "_acme-challenge.www.example.com", None
+    )) == "_acme-challenge.www.example.com"
+
+
+def test_add_txt_records(server, client):
+    server.set("_acme-challenge.www.example.com", "CNAME",
+               "_acme-challenge.example.com.")
+
+    asyncio.run(AsyncClouDNSClient(client).add_txt_records([
+        (DOMAIN, "_acme-challenge." + DOMAIN, "token1"),
+        ("www." + DOMAIN, "_acme-challenge.www." + DOMAIN, "token2"),
+    ], 60))
+
+    # The whole batch is handed to the client at once
+    client.add_txt_records.assert_called_once_with([
+        (DOMAIN, "_acme-challenge." + DOMAIN, "token1"),
+        ("www." + DOMAIN, "_acme-challenge." + DOMAIN, "token2"),
+    ], 60)
+    client.add_txt_record.assert_not_called()
+
+
+def test_add_txt_records_reports_failures_per_domain(server, client):
+    client.add_txt_records.side_effect = BatchError(
+        {"bad." + DOMAIN: errors.PluginError("boom")}
+    )
+
+    with pytest.raises(BatchError) as exc_info:
+        asyncio.run(AsyncClouDNSClient(client).add_txt_records([
+            ("good." + DOMAIN, "_acme-challenge.good." + DOMAIN, "token"),
+            ("bad." + DOMAIN, "_acme-challenge.bad." + DOMAIN, "token"),
+        ], 60))
+
+    assert list(exc_info.value.failures) == ["bad." + DOMAIN]
+
+
+def test_add_txt_records_reports_alias_failures(server, client):
+    async def resolve_alias_async(validation_name, nameserver):
+        if "bad" in validation_name:
+            raise errors.PluginError("SERVFAIL")
+        return validation_name
+
+    with mock.patch("certbot_dns_cloudns._internal.aio.resolve_alias_async",
+                    resolve_alias_async):
+        with pytest.raises(BatchError) as exc_info:
+            asyncio.run(AsyncClouDNSClient(client).add_txt_records([
+                ("good." + DOMAIN, "_acme-challenge.good." + DOMAIN, "token"),
+                ("bad." + DOMAIN, "_acme-challenge.bad." + DOMAIN, "token"),
+            ], 60))
+
+    assert list(exc_info.value.failures) == ["bad." + DOMAIN]
+    client.add_txt_records.assert_called_once_with(
+        [("good." + DOMAIN, "_acme-challenge.good." + DOMAIN, "token")], 60
+    )
+
+
+def test_list_and_delete(server, client):
+    client.list_txt_records.return_value = {"1": {"record": "token"}}
+    cloudns = AsyncClouDNSClient(client)
+
+    async def run():
+        records = await cloudns.list_txt_records("_acme-challenge." + DOMAIN)
+        await cloudns.del_txt_records(
+            [(DOMAIN, "_acme-challenge." + DOMAIN, "token")]
+        )
+        return records
+
+    assert asyncio.run(run()) == {"1": {"record": "token"}}
+    client.list_txt_records.assert_called_once_with(
+        DOMAIN, "_acme-challenge"
+    )
+    client.del_txt_records.assert_called_once_with(
+        [(DOMAIN, "_acme-challenge." + DOMAIN, "token")]
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))  # pragma: no cover
@@ -1,6 +1,7 @@
 """Tests for certbot_dns_cloudns._internal.authenticator."""
 
 import sys
+import threading
 from unittest import mock
 
 import pytest
@@ -11,6 +12,9 @@ from certbot.plugins import dns_test_common
 from certbot.plugins.dns_test_common import DOMAIN
 from certbot.tests import util as test_util
 
+# Loaded lazily by the authenticator, so it has to be imported to be patched
+from certbot_dns_cloudns._internal import propagation  # noqa: F401
+
 AUTH_ID = "1234"
 SUB_AUTH_ID = "5678"
 SUB_AUTH_USER = "tester"
@@ -38,6 +42,13 @@ class AuthenticatorTest(
             cloudns_credentials=path,
             cloudns_propagation_seconds=0,  # don't wait during tests
             cloudns_nameserver="1.1.1.1",  # nameserver is required for parsing
+            cloudns_query_timeout=None,
+            cloudns_max_workers=10,
+            cloudns_propagation_mode="sleep",
+            cloudns_zone_lookup="probe",
+            cloudns_zone_cache_ttl=0,
+            cloudns_metrics_file=None,
+            cloudns_daemon_socket=None,
         )
         self.auth = Authenticator(self.config, "cloudns")
         self.mock_client = mock.MagicMock()
@@ -50,19 +61,101 @@ class AuthenticatorTest(
         self.auth.perform([self.achall])
 
         expected = [
-            mock.call.add_txt_record(
-                DOMAIN, "_acme-challenge." + DOMAIN, mock.ANY, mock.ANY
+            mock.call.delete_journaled_records(),
+            mock.call.add_txt_records(
+                [(DOMAIN, "_acme-challenge." + DOMAIN, mock.ANY)], mock.ANY
             )
         ]
         assert expected == self.mock_client.mock_calls
 
+    @test_util.patch_display_util()
+    @mock.patch("certbot_dns_cloudns._internal.propagation")
+    def test_perform_poll_propagation(self, mock_propagation,
+                                      unused_mock_get_utility):
+        self.config.cloudns_propagation_mode = "poll"
+        self.config.cloudns_propagation_seconds = 30
+        self.config.cloudns_query_timeout = 2.5
+        mock_propagation.find_nameservers.return_value = {
+            "_acme-challenge." + DOMAIN: ["192.0.2.1"]
+        }
+        mock_propagation.wait_for_txt_records.return_value = True
+
+        with mock.patch("time.sleep") as mock_sleep:
+            self.auth.perform([self.achall])
+
+        mock_sleep.assert_not_called()
+        validation = self.achall.validation(self.achall.account_key)
+        mock_propagation.wait_for_txt_records.assert_called_once_with(
+            {"_acme-challenge." + DOMAIN: (["192.0.2.1"], {validation})}, 30,
+            query_timeout=2.5, max_workers=10
+        )
+
+    @test_util.patch_display_util()
+    @mock.patch("certbot_dns_cloudns._internal.propagation")
+    def test_perform_poll_propagation_fallback(self, mock_propagation,
+                                               unused_mock_get_utility):
+        self.config.cloudns_propagation_mode = "poll"
+        self.config.cloudns_propagation_seconds = 30
+        mock_propagation.find_nameservers.side_effect = \
+            errors.PluginError("no nameservers")
+
+        with mock.patch("time.sleep") as mock_sleep:
+            self.auth.perform([self.achall])
+
+        mock_sleep.assert_called_once()
+        assert 29 <= mock_sleep.call_args[0][0] <= 30
+
+    @test_util.patch_display_util()
+    @mock.patch("certbot_dns_cloudns._internal.propagation")
+    def test_nameservers_are_found_while_adding_records(
+            self, mock_propagation, unused_mock_get_utility):
+        self.config.cloudns_propagation_mode = "poll"
+        found = threading.Event()
+        mock_propagation.find_nameservers.side_effect = \
+            lambda names, **kwargs: found.set() or {
+                name: ["192.0.2.1"] for name in names
+            }
+        self.mock_client.add_txt_records.side_effect = \
+            lambda *args: found.wait(5)
+
+        self.auth.perform([self.achall])
+
+        assert found.is_set()
+        mock_propagation.wait_for_txt_records.assert_called_once()
+
+    @test_util.patch_display_util()
+    def test_perform_api_propagation(self, unused_mock_get_utility):
+        self.config.cloudns_propagation_mode = "api"
+        self.config.cloudns_propagation_seconds = 30
+        self.mock_client.wait_for_updates.return_value = True
+
+        with mock.patch("time.sleep") as mock_sleep:
+            self.auth.perform([self.achall])
+
+        mock_sleep.assert_not_called()
+        self.mock_client.wait_for_updates.assert_called_once_with(
+            {"_acme-challenge." + DOMAIN}, 30
+        )
+
+    @test_util.patch_display_util()
+    def test_perform_api_propagation_fallback(self, unused_mock_get_utility):
+        self.config.cloudns_propagation_mode = "api"
+        self.config.cloudns_propagation_seconds = 30
+        self.mock_client.wait_for_updates.side_effect = \
+            errors.PluginError("zone not found")
+
+        with mock.patch("time.sleep") as mock_sleep:
+            self.auth.perform([self.achall])
+
+        mock_sleep.assert_called_once()
+
     def test_cleanup(self):
         self.auth._attempt_cleanup = True
         self.auth.cleanup([self.achall])
 
         expected = [
-            mock.call.del_txt_record(
-                DOMAIN, "_acme-challenge." + DOMAIN, mock.ANY
+            mock.call.del_txt_records(
+                [(DOMAIN, "_acme-challenge." + DOMAIN, mock.ANY)]
             )
         ]
         assert expected == self.mock_client.mock_calls
@@ -79,8 +172,9 @@ class AuthenticatorTest(
         self.auth.perform([self.achall])
 
         expected = [
-            mock.call.add_txt_record(
-                DOMAIN, "_acme-challenge." + DOMAIN, mock.ANY, mock.ANY
+            mock.call.delete_journaled_records(),
+            mock.call.add_txt_records(
+                [(DOMAIN, "_acme-challenge." + DOMAIN, mock.ANY)], mock.ANY
             )
         ]
         assert expected == self.mock_client.mock_calls
@@ -97,12 +191,134 @@ class AuthenticatorTest(
         self.auth.perform([self.achall])
 
         expected = [
-            mock.call.add_txt_record(
-                DOMAIN, "_acme-challenge." + DOMAIN, mock.ANY, mock.ANY
+            mock.call.delete_journaled_records(),
+            mock.call.add_txt_records(
+                [(DOMAIN, "_acme-challenge." + DOMAIN, mock.ANY)], mock.ANY
             )
         ]
         assert expected == self.mock_client.mock_calls
 
+    @test_util.patch_display_util()
+    def test_multiple_accounts(self, unused_mock_get_utility):
+        dns_test_common.write(
+            {
+                "cloudns_accounts": "main shop",
+                "cloudns_main_auth_id": AUTH_ID,
+                "cloudns_main_auth_password": AUTH_PASSWORD,
+                "cloudns_shop_sub_auth_user": SUB_AUTH_USER,
+                "cloudns_shop_auth_password": AUTH_PASSWORD,
+            },
+            self.config.cloudns_credentials,
+        )
+        self.auth.perform([self.achall])
+        assert len(self.mock_client.add_txt_records.mock_calls) == 1
+
+        dns_test_common.write(
+            {
+                "cloudns_accounts": "main shop",
+                "cloudns_main_auth_id": AUTH_ID,
+                "cloudns_main_auth_password": AUTH_PASSWORD,
+            },
+            self.config.cloudns_credentials,
+        )
+        with pytest.raises(errors.PluginError):
+            self.auth.perform([self.achall])
+
+    def test_prepare_prewarms_aliases_and_zones(self):
+        self.config.cloudns_prewarm = True
+        self.config.domains = [DOMAIN, "*." + DOMAIN, "www." + DOMAIN]
+        self.auth._resolve_aliases = mock.MagicMock(
+            side_effect=lambda records: {
+                name: name.replace("www.", "") for _, name, _ in records
+            }
+        )
+
+        self.auth.prepare()
+
+        assert self.auth._resolve_aliases.call_args.args[0] == [
+            (DOMAIN, "_acme-challenge." + DOMAIN, None),
+            ("*." + DOMAIN, "_acme-challenge." + DOMAIN, None),
+            ("www." + DOMAIN, "_acme-challenge.www." + DOMAIN, None),
+        ]
+        assert self.mock_client.mock_calls == [
+            mock.call.delete_journaled_records(),
+            mock.call.prepare({"_acme-challenge." + DOMAIN}),
+        ]
+
+    def test_prepare_reports_failures(self):
+        from certbot_dns_cloudns._internal.client import BatchError
+
+        self.config.cloudns_prewarm = True
+        self.config.domains = [DOMAIN]
+        self.auth._resolve_aliases = mock.MagicMock(
+            side_effect=lambda records: {name: name for _, name, _ in records}
+        )
+        self.mock_client.prepare.side_effect = BatchError(
+            {"_acme-challenge." + DOMAIN: errors.PluginError("No zone")}
+        )
+
+        with pytest.raises(errors.PluginError):
+            self.auth.prepare()
+
+    def test_prepare_without_prewarm(self):
+        self.config.cloudns_prewarm = False
+        self.config.domains = [DOMAIN]
+
+        self.auth.prepare()
+
+        assert self.mock_client.mock_calls == []
+
+    def test_cleanup_writes_metrics(self):
+        from certbot_dns_cloudns._internal import metrics
+
+        self.config.cloudns_metrics_file = os.path.join(self.tempdir,
+                                                        "cloudns.prom")
+        self.config.cloudns_metrics_format = metrics.FORMAT_PROMETHEUS
+        self.auth._attempt_cleanup = True
+        self.auth.cleanup([self.achall])
+
+        with open(self.config.cloudns_metrics_file) as metrics_file:
+            content = metrics_file.read()
+        assert 'operation_calls_total{operation="resolve_alias"}' in content
+
+    def test_get_client_uses_zone_cache(self):
+        from certbot_dns_cloudns._internal.authenticator import Authenticator
+
+        self.config.work_dir = self.tempdir
+        self.config.cloudns_zone_cache_ttl = 3600
+        self.config.cloudns_max_workers = 5
+        self.auth._setup_credentials()
+        client = Authenticator._get_client.__wrapped__(self.auth)
+
+        assert client.max_workers == 5
+        assert client.zone_cache.ttl == 3600
+        assert client.zone_cache.path.startswith(self.tempdir)
+        assert client.journal.path.startswith(self.tempdir)
+
+        self.config.cloudns_zone_cache_ttl = 0
+        assert Authenticator._get_client.__wrapped__(self.auth).zone_cache \
+            is None
+
+    @test_util.patch_display_util()
+    def test_perform_and_cleanup_with_daemon(self, unused_mock_get_utility):
+        self.config.cloudns_daemon_socket = "/run/cloudns.sock"
+        os.remove(self.config.cloudns_credentials)
+        daemon_client = mock.MagicMock()
+        self.auth._get_daemon_client = mock.MagicMock(
+            return_value=daemon_client
+        )
+
+        self.auth.perform([self.achall])
+        self.auth.cleanup([self.achall])
+
+        records = [(DOMAIN, "_acme-challenge." + DOMAIN,
+                    self.achall.validation(self.achall.account_key))]
+        assert daemon_client.mock_calls == [
+            mock.call.add_txt_records(records, self.auth.ttl),
+            mock.call.del_txt_records(records),
+        ]
+        assert self.mock_client.mock_calls == []
+
     def test_no_creds(self):
         dns_test_common.write({}, self.config.cloudns_credentials)
         with pytest.raises(errors.PluginError):
@@ -123,5 +339,17 @@ class AuthenticatorTest(
             self.auth.perform([self.achall])
 
 
+def test_challenge_domain():
+    from certbot_dns_cloudns._internal.authenticator import challenge_domain
+
+    # Certbot < 4 only sets domain, newer versions set identifier too
+    old_style = mock.Mock(spec=["domain"], domain="example.com")
+    new_style = mock.Mock(spec=["identifier"])
+    new_style.identifier.value = "example.org"
+
+    assert challenge_domain(old_style) == "example.com"
+    assert challenge_domain(new_style) == "example.org"
+
+
 if __name__ == "__main__":
     sys.exit(pytest.main(sys.argv[1:] + [__file__]))  # pragma: no cover
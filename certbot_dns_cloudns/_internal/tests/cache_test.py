@@ -0,0 +1,136 @@
+"""Tests for certbot_dns_cloudns._internal.cache."""
+
+import multiprocessing
+import os
+import sys
+import time
+from unittest import mock
+
+import pytest
+
+from certbot_dns_cloudns._internal.cache import ZoneCache
+
+ACCOUNT = "auth-id=1234"
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "zones.json")
+
+
+def test_get_and_set(path):
+    cache = ZoneCache(path)
+    cache.set(ACCOUNT, "_acme-challenge.example.com", "example.com",
+              "_acme-challenge")
+    cache.flush()
+
+    cache = ZoneCache(path)
+    assert cache.get(ACCOUNT, "_acme-challenge.example.com") == \
+        ("example.com", "_acme-challenge")
+    assert cache.get(ACCOUNT, "_acme-challenge.example.org") is None
+    assert cache.get("auth-id=5678", "_acme-challenge.example.com") is None
+
+
+def test_expiry(path):
+    cache = ZoneCache(path, ttl=60)
+    cache.set(ACCOUNT, "_acme-challenge.example.com", "example.com",
+              "_acme-challenge")
+    cache.flush()
+
+    with mock.patch("time.time", return_value=time.time() + 61):
+        assert cache.get(ACCOUNT, "_acme-challenge.example.com") is None
+        cache.set(ACCOUNT, "_acme-challenge.example.org", "example.org",
+                  "_acme-challenge")
+        cache.flush()
+
+    with open(path) as cache_file:
+        assert "example.com" not in cache_file.read()
+
+
+def test_invalidate_zone(path):
+    cache = ZoneCache(path)
+    cache.set(ACCOUNT, "_acme-challenge.example.com", "example.com",
+              "_acme-challenge")
+    cache.set(ACCOUNT, "_acme-challenge.www.example.com", "example.com",
+              "_acme-challenge.www")
+    cache.set(ACCOUNT, "_acme-challenge.example.org", "example.org",
+              "_acme-challenge")
+
+    cache.invalidate_zone(ACCOUNT, "example.com")
+
+    assert cache.get(ACCOUNT, "_acme-challenge.example.com") is None
+    assert cache.get(ACCOUNT, "_acme-challenge.www.example.com") is None
+    assert cache.get(ACCOUNT, "_acme-challenge.example.org") is not None
+
+
+def test_corrupt_file_is_ignored(path):
+    with open(path, "w") as cache_file:
+        cache_file.write("{not json")
+
+    cache = ZoneCache(path)
+    assert cache.get(ACCOUNT, "example.com") is None
+    cache.set(ACCOUNT, "example.com", "example.com", "")
+    assert cache.get(ACCOUNT, "example.com") == ("example.com", "")
+
+
+def test_changes_are_written_once_per_flush(path):
+    cache = ZoneCache(path)
+    with mock.patch("os.replace", wraps=os.replace) as replace:
+        for i in range(10):
+            cache.set(ACCOUNT, f"host{i}.example.com", "example.com",
+                      f"host{i}")
+        assert not os.path.exists(path)
+        cache.flush()
+        cache.flush()
+
+    assert replace.call_count == 1
+    assert ZoneCache(path).get(ACCOUNT, "host9.example.com") == \
+        ("example.com", "host9")
+
+
+def test_flush_merges_changes_of_other_processes(path):
+    first = ZoneCache(path)
+    first.set(ACCOUNT, "www.example.com", "example.com", "www")
+    first.set(ACCOUNT, "www.example.org", "example.org", "www")
+    first.flush()
+
+    # Changes made by another process after the file was read
+    other = ZoneCache(path)
+    other.set(ACCOUNT, "mail.example.org", "example.org", "mail")
+    other.flush()
+
+    first.invalidate_zone(ACCOUNT, "example.com")
+    first.set(ACCOUNT, "www.example.net", "example.net", "www")
+    first.flush()
+
+    cache = ZoneCache(path)
+    assert cache.get(ACCOUNT, "www.example.com") is None
+    assert cache.get(ACCOUNT, "mail.example.org") == ("example.org", "mail")
+    assert cache.get(ACCOUNT, "www.example.net") == ("example.net", "www")
+
+
+def _fill(path, worker):
+    cache = ZoneCache(path)
+    for i in range(20):
+        cache.set(ACCOUNT, f"host{i}.worker{worker}.example.com",
+                  "example.com", f"host{i}.worker{worker}")
+        if i % 5 == 4:
+            cache.flush()
+
+
+def test_concurrent_processes(path):
+    processes = [multiprocessing.Process(target=_fill, args=(path, worker))
+                 for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    cache = ZoneCache(path)
+    for worker in range(4):
+        for i in range(20):
+            assert cache.get(ACCOUNT, f"host{i}.worker{worker}.example.com")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))  # pragma: no cover
@@ -0,0 +1,163 @@
+"""Tests for certbot_dns_cloudns._internal.cli."""
+
+import json
+import sys
+from unittest import mock
+
+import pytest
+
+from certbot import errors
+from certbot.compat import os
+from certbot.plugins import dns_test_common
+
+from certbot_dns_cloudns._internal import cli
+from certbot_dns_cloudns._internal.client import BatchError
+
+
+@pytest.fixture
+def credentials(tmp_path):
+    path = str(tmp_path / "cloudns.ini")
+    dns_test_common.write({"dns_cloudns_auth_id": "1234",
+                           "dns_cloudns_auth_password": "secret"}, path)
+    return path
+
+
+def test_load_credentials(credentials):
+    loaded = cli.load_credentials(credentials)
+
+    assert loaded.conf("auth-id") == "1234"
+    assert loaded.conf("auth-password") == "secret"
+
+
+def test_load_invalid_credentials(credentials):
+    dns_test_common.write({"dns_cloudns_auth_password": "secret"},
+                          credentials)
+
+    with pytest.raises(errors.PluginError):
+        cli.load_credentials(credentials)
+
+
+@mock.patch("certbot_dns_cloudns._internal.cli.ChallengeDaemon")
+def test_daemon(mock_daemon, credentials):
+    socket_path = os.path.join(os.path.dirname(credentials), "cloudns.sock")
+
+    assert cli.main(["daemon", "--credentials", credentials,
+                     "--socket", socket_path, "--max-workers", "4"]) == 0
+
+    client = mock_daemon.call_args.args[0]
+    assert client.max_workers == 4
+    assert mock_daemon.call_args.args[1] == socket_path
+    mock_daemon.return_value.serve_forever.assert_called_once_with()
+
+
+def test_daemon_with_invalid_credentials(tmp_path):
+    assert cli.main(["daemon", "--credentials", str(tmp_path / "missing"),
+                     "--socket", str(tmp_path / "cloudns.sock")]) == 1
+
+
+@mock.patch("certbot_dns_cloudns._internal.cli.sweep")
+def test_sweep(mock_sweep, credentials, capsys):
+    from certbot_dns_cloudns._internal.sweep import ChallengeRecord
+
+    state = os.path.join(os.path.dirname(credentials), "sweep.json")
+    mock_sweep.return_value = (
+        [ChallengeRecord("example.com", "1", "_acme-challenge", "t1", 7200),
+         ChallengeRecord("example.com", "2", "_acme-challenge", "t2", 10)],
+        {("example.com", "1"): errors.PluginError("boom")},
+    )
+
+    assert cli.main(["sweep", "--credentials", credentials, "--state", state,
+                     "--zone", "example.com", "--min-age", "3600",
+                     "--challenge-host", "*.acme"]) == 1
+
+    assert mock_sweep.call_args.args[1].path == state
+    assert mock_sweep.call_args.args[2] == "auth-id=1234"
+    assert mock_sweep.call_args.kwargs == {"zones": ["example.com"],
+                                           "min_age": 3600, "dry_run": False,
+                                           "challenge_hosts": ["*.acme"]}
+    lines = capsys.readouterr().out.splitlines()
+    assert lines == ["example.com\t_acme-challenge\t1\t7200s\tfailed: boom",
+                     "example.com\t_acme-challenge\t2\t10s\tkept"]
+
+
+def test_read_records():
+    assert cli.read_records(["# domain validation\n", "\n",
+                             "example.com token1\n",
+                             "*.example.com\ttoken2\n"]) == \
+        [("example.com", "token1"), ("*.example.com", "token2")]
+
+    with pytest.raises(errors.PluginError) as exc_info:
+        cli.read_records(["example.com token1", "example.org"])
+    assert "Line 2" in str(exc_info.value)
+
+
+@pytest.fixture
+def records_client():
+    client = mock.MagicMock()
+    aliases = {"_acme-challenge.example.com": "challenges.example.net"}
+    with mock.patch.object(cli, "client_from_args", return_value=client), \
+            mock.patch.object(cli, "resolve_aliases",
+                              side_effect=lambda names, *args, **kwargs: {
+                                  name: aliases.get(name, name)
+                                  for name in names
+                              }):
+        yield client
+
+
+def test_add(records_client, credentials, tmp_path, capsys):
+    input_path = tmp_path / "records.txt"
+    input_path.write_text("example.com token1\n*.example.org token2\n")
+    records_client.add_txt_records.side_effect = BatchError(
+        {"*.example.org": errors.PluginError("boom")}
+    )
+
+    assert cli.main(["add", "--credentials", credentials,
+                     "--input", str(input_path), "--wait", "30"]) == 1
+
+    records_client.add_txt_records.assert_called_once_with(
+        [("example.com", "challenges.example.net", "token1"),
+         ("*.example.org", "_acme-challenge.example.org", "token2")], 60
+    )
+    records_client.wait_for_updates.assert_called_once_with(
+        {"challenges.example.net"}, 30
+    )
+    results = [json.loads(line)
+               for line in capsys.readouterr().out.splitlines()]
+    assert results == [
+        {"domain": "example.com", "record_name": "challenges.example.net",
+         "validation": "token1", "ok": True},
+        {"domain": "*.example.org",
+         "record_name": "_acme-challenge.example.org",
+         "validation": "token2", "ok": False, "error": "boom"},
+    ]
+
+
+def test_delete_from_hook_environment(records_client, credentials,
+                                      monkeypatch, capsys):
+    monkeypatch.setenv("CERTBOT_DOMAIN", "example.com")
+    monkeypatch.setenv("CERTBOT_VALIDATION", "token1")
+    records_client.del_txt_records.return_value = {}
+
+    assert cli.main(["delete", "--credentials", credentials]) == 0
+
+    records_client.del_txt_records.assert_called_once_with(
+        [("example.com", "challenges.example.net", "token1")]
+    )
+    records_client.close.assert_called_once_with()
+    assert json.loads(capsys.readouterr().out)["ok"]
+
+
+@pytest.mark.parametrize("command", ["add", "delete"])
+def test_hook_environment_without_validation(records_client, credentials,
+                                             monkeypatch, command):
+    monkeypatch.setenv("CERTBOT_DOMAIN", "example.com")
+    monkeypatch.delenv("CERTBOT_VALIDATION", raising=False)
+
+    assert cli.main([command, "--credentials", credentials]) == 1
+
+    records_client.add_txt_records.assert_not_called()
+    records_client.del_txt_records.assert_not_called()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))  # pragma: no cover
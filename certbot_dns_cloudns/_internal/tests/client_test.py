@@ -0,0 +1,658 @@
+"""Tests for certbot_dns_cloudns._internal.client."""
+
+import os
+import sys
+import time
+from unittest import mock
+
+import pytest
+
+from certbot import errors
+
+from certbot_dns_cloudns._internal import client
+from certbot_dns_cloudns._internal import metrics
+from certbot_dns_cloudns._internal import transport
+from certbot_dns_cloudns._internal.cache import ZoneCache
+from certbot_dns_cloudns._internal.client import BatchError
+from certbot_dns_cloudns._internal.client import ClouDNSClient
+from certbot_dns_cloudns._internal.journal import RecordJournal
+
+DOMAIN = "example.com"
+ZONE_PAYLOAD = {"name": DOMAIN, "type": "master", "zone": "domain"}
+
+
+class Credentials:
+    def __init__(self, **values):
+        self.values = values
+
+    def conf(self, key):
+        return self.values.get(key.replace("-", "_"))
+
+
+@pytest.fixture
+def credentials():
+    return Credentials(auth_id="1234", auth_password="secret")
+
+
+def fake_api(api_method, **kwargs):
+    if (
+            api_method is transport.ZONE_GET
+            and kwargs["domain_name"] != DOMAIN
+    ):
+        raise client.ApiErrorResponse(
+            {"status_code": 200, "error": "Missing domain-name"}
+        )
+    if api_method is transport.ZONE_GET:
+        return ZONE_PAYLOAD
+    if api_method is transport.RECORD_CREATE:
+        return {"status": "Success", "data": {"id": 42}}
+    if api_method is transport.RECORD_LIST:
+        return {"7": {"host": kwargs["host"], "record": "token"}}
+    return {}
+
+
+@pytest.fixture
+def api_request():
+    with mock.patch.object(ClouDNSClient, "_api_request",
+                           side_effect=fake_api) as api_request:
+        yield api_request
+
+
+def test_add_txt_records(credentials, api_request):
+    cloudns = ClouDNSClient(credentials)
+
+    cloudns.add_txt_records([
+        (DOMAIN, "_acme-challenge." + DOMAIN, "token1"),
+        ("www." + DOMAIN, "_acme-challenge.www." + DOMAIN, "token2"),
+    ], 60)
+
+    created = sorted(
+        (call.kwargs["host"], call.kwargs["record"])
+        for call in api_request.mock_calls
+        if call.args[0] is transport.RECORD_CREATE
+    )
+    assert created == [("_acme-challenge", "token1"),
+                       ("_acme-challenge.www", "token2")]
+
+
+def test_add_txt_records_runs_concurrently(credentials, api_request):
+    cloudns = ClouDNSClient(credentials, max_workers=10)
+    cloudns.find_zone_and_host = mock.MagicMock(
+        side_effect=lambda name: (DOMAIN, name[:-len(DOMAIN) - 1])
+    )
+    api_request.side_effect = lambda *args, **kwargs: time.sleep(0.1)
+
+    start = time.monotonic()
+    cloudns.add_txt_records(
+        [(f"{i}.{DOMAIN}", f"_acme-challenge.{i}.{DOMAIN}", "token")
+         for i in range(10)],
+        60
+    )
+
+    assert time.monotonic() - start < 0.5
+    assert api_request.call_count == 10
+
+
+def test_add_txt_records_reports_failures_per_domain(credentials,
+                                                     api_request):
+    cloudns = ClouDNSClient(credentials)
+    cloudns.find_zone_and_host = mock.MagicMock(
+        side_effect=lambda name: (DOMAIN, name[:-len(DOMAIN) - 1])
+    )
+
+    def fail_for_bad(*args, **kwargs):
+        if kwargs["host"].endswith("bad"):
+            raise errors.PluginError("boom")
+    api_request.side_effect = fail_for_bad
+
+    with pytest.raises(BatchError) as exc_info:
+        cloudns.add_txt_records([
+            ("good." + DOMAIN, "_acme-challenge.good." + DOMAIN, "token"),
+            ("bad." + DOMAIN, "_acme-challenge.bad." + DOMAIN, "token"),
+        ], 60)
+
+    assert list(exc_info.value.failures) == ["bad." + DOMAIN]
+    assert "bad." + DOMAIN in str(exc_info.value)
+    assert api_request.call_count == 2
+
+
+def test_del_txt_records_ignores_failures(credentials, api_request):
+    cloudns = ClouDNSClient(credentials)
+    cloudns.find_zone_and_host = mock.MagicMock(
+        side_effect=errors.PluginError("no zone")
+    )
+
+    failures = cloudns.del_txt_records([
+        (DOMAIN, "_acme-challenge." + DOMAIN, "token"),
+    ])
+
+    api_request.assert_not_called()
+    assert list(failures) == [DOMAIN]
+
+
+def test_del_txt_records_returns_failures_per_domain(credentials,
+                                                     api_request):
+    cloudns = ClouDNSClient(credentials)
+
+    def fail_delete(api_method, **kwargs):
+        if api_method is transport.RECORD_DELETE:
+            raise errors.PluginError("boom")
+        return fake_api(api_method, **kwargs)
+    api_request.side_effect = fail_delete
+
+    failures = cloudns.del_txt_records([
+        (DOMAIN, "_acme-challenge." + DOMAIN, "token"),
+        ("*." + DOMAIN, "_acme-challenge." + DOMAIN, "token"),
+        ("www." + DOMAIN, "_acme-challenge." + DOMAIN, "missing"),
+    ])
+
+    assert sorted(failures) == ["*." + DOMAIN, DOMAIN]
+    assert str(failures[DOMAIN]) == "boom"
+
+
+def _methods(api_request):
+    return [call.args[0] for call in api_request.mock_calls]
+
+
+def test_del_txt_record_uses_created_record_id(credentials, api_request):
+    cloudns = ClouDNSClient(credentials)
+    record_name = "_acme-challenge." + DOMAIN
+
+    cloudns.add_txt_record(DOMAIN, record_name, "token", 60)
+    api_request.reset_mock()
+    cloudns.del_txt_record(DOMAIN, record_name, "token")
+
+    assert _methods(api_request) == [transport.RECORD_DELETE]
+    assert api_request.call_args.kwargs == \
+        {"domain_name": DOMAIN, "record_id": "42"}
+
+
+def test_del_txt_record_lists_unknown_records(credentials, api_request):
+    cloudns = ClouDNSClient(credentials)
+    record_name = "_acme-challenge." + DOMAIN
+
+    cloudns.add_txt_record(DOMAIN, record_name, "other", 60)
+    api_request.reset_mock()
+    cloudns.del_txt_record(DOMAIN, record_name, "token")
+
+    assert _methods(api_request) == [transport.RECORD_LIST,
+                                     transport.RECORD_DELETE]
+    assert api_request.call_args.kwargs == \
+        {"domain_name": DOMAIN, "record_id": "7"}
+
+
+def test_add_txt_records_coalesces_shared_names(credentials, api_request):
+    cloudns = ClouDNSClient(credentials)
+    record_name = "_acme-challenge." + DOMAIN
+
+    cloudns.add_txt_records(
+        [(DOMAIN, record_name, "token"), ("*." + DOMAIN, record_name, "token")]
+        + [(f"{i}.example.org", record_name, f"token{i}") for i in range(20)],
+        60
+    )
+
+    methods = _methods(api_request)
+    assert methods.count(transport.ZONE_GET) == 1
+    assert methods.count(transport.RECORD_CREATE) == 21
+
+
+def test_add_txt_records_reports_failures_for_coalesced_domains(
+        credentials, api_request):
+    cloudns = ClouDNSClient(credentials)
+    record_name = "_acme-challenge." + DOMAIN
+    api_request.side_effect = errors.PluginError("boom")
+
+    with pytest.raises(BatchError) as exc_info:
+        cloudns.add_txt_records([(DOMAIN, record_name, "token"),
+                                 ("*." + DOMAIN, record_name, "token")], 60)
+
+    assert set(exc_info.value.failures) == {DOMAIN, "*." + DOMAIN}
+    assert api_request.call_count == 1
+
+
+def test_del_txt_records_lists_each_name_once(credentials, api_request):
+    cloudns = ClouDNSClient(credentials)
+    record_name = "_acme-challenge." + DOMAIN
+
+    def list_records(api_method, **kwargs):
+        if api_method is transport.RECORD_LIST:
+            return {str(i): {"host": kwargs["host"], "record": f"token{i}"}
+                    for i in range(30)}
+        return fake_api(api_method, **kwargs)
+    api_request.side_effect = list_records
+
+    cloudns.add_txt_record(DOMAIN, record_name, "created", 60)
+    api_request.reset_mock()
+    cloudns.del_txt_records(
+        [(f"{i}.example.org", record_name, f"token{i}") for i in range(20)]
+        + [(DOMAIN, record_name, "token0"), (DOMAIN, record_name, "created"),
+           (DOMAIN, record_name, "unknown")]
+    )
+
+    methods = _methods(api_request)
+    assert methods.count(transport.RECORD_LIST) == 1
+    deleted = sorted(call.kwargs["record_id"]
+                     for call in api_request.mock_calls
+                     if call.args[0] is transport.RECORD_DELETE)
+    assert deleted == sorted([str(i) for i in range(20)] + ["42"])
+
+
+def _record_pages(count):
+    records = {str(i): {"host": "_acme-challenge", "record": f"token{i}"}
+               for i in range(count)}
+
+    def list_records(api_method, **kwargs):
+        if api_method is not transport.RECORD_LIST:
+            return fake_api(api_method, **kwargs)
+        size = kwargs["rows_per_page"]
+        start = (kwargs["page"] - 1) * size
+        return dict(list(records.items())[start:start + size]) or []
+    return list_records
+
+
+def test_record_listing_is_paginated(credentials, api_request):
+    api_request.side_effect = _record_pages(250)
+    cloudns = ClouDNSClient(credentials)
+
+    assert len(cloudns.list_txt_records(DOMAIN, "_acme-challenge")) == 250
+    assert [call.kwargs["page"] for call in api_request.mock_calls] == \
+        [1, 2, 3]
+
+
+def test_record_listing_stops_at_last_match(credentials, api_request):
+    api_request.side_effect = _record_pages(1000)
+    cloudns = ClouDNSClient(credentials)
+    api_request.reset_mock()
+
+    record_name = "_acme-challenge." + DOMAIN
+    cloudns.del_txt_records([(DOMAIN, record_name, "token5"),
+                             (DOMAIN, record_name, "token150")])
+
+    pages = [call.kwargs["page"] for call in api_request.mock_calls
+             if call.args[0] is transport.RECORD_LIST]
+    assert pages == [1, 2]
+
+
+def test_prepare_finds_zones_ahead(credentials, api_request):
+    cloudns = ClouDNSClient(credentials)
+
+    with pytest.raises(BatchError) as exc_info:
+        cloudns.prepare(["_acme-challenge." + DOMAIN,
+                         "_acme-challenge.www." + DOMAIN,
+                         "_acme-challenge.example.org"])
+    assert list(exc_info.value.failures) == ["_acme-challenge.example.org"]
+
+    api_request.reset_mock()
+    cloudns.add_txt_records([(DOMAIN, "_acme-challenge." + DOMAIN, "token"),
+                             ("www." + DOMAIN, "_acme-challenge.www." + DOMAIN,
+                              "token")], 60)
+    assert _methods(api_request) == [transport.RECORD_CREATE] * 2
+
+
+def test_wait_for_updates_polls_each_zone(credentials, api_request):
+    updates = iter([False, True])
+    api_request.side_effect = lambda api_method, **kwargs: (
+        next(updates) if api_method is transport.ZONE_IS_UPDATED
+        else fake_api(api_method, **kwargs)
+    )
+    cloudns = ClouDNSClient(credentials)
+
+    with mock.patch("time.sleep") as mock_sleep:
+        assert cloudns.wait_for_updates(
+            ["_acme-challenge." + DOMAIN, "_acme-challenge.www." + DOMAIN], 30
+        )
+
+    assert mock_sleep.call_count == 1
+    assert [call.kwargs for call in api_request.mock_calls
+            if call.args[0] is transport.ZONE_IS_UPDATED] == \
+        [{"domain_name": DOMAIN}] * 2
+
+
+def test_wait_for_updates_times_out(credentials, api_request):
+    cloudns = ClouDNSClient(credentials)
+
+    assert not cloudns.wait_for_updates(["_acme-challenge." + DOMAIN], 0)
+
+
+def test_iter_zone_txt_records(credentials, api_request):
+    def list_records(api_method, **kwargs):
+        if kwargs["domain_name"] == "missing.example":
+            raise client.ApiErrorResponse({"error": "Missing domain-name"})
+        assert kwargs["host"] is None
+        return {"1": {"host": "_acme-challenge",
+                      "record": kwargs["domain_name"]}}
+
+    api_request.side_effect = list_records
+    cloudns = ClouDNSClient(credentials, max_workers=2)
+    zones = ["zone%d.example" % i for i in range(5)] + ["missing.example"]
+
+    listed = dict(cloudns.iter_zone_txt_records(iter(zones)))
+
+    assert sorted(listed) == zones[:5]
+    assert listed["zone3.example"]["1"]["record"] == "zone3.example"
+
+
+def test_delete_records(credentials, api_request):
+    def delete(api_method, **kwargs):
+        if kwargs["record_id"] == "2":
+            raise client.ApiErrorResponse({"error": "Invalid record-id"})
+
+    api_request.side_effect = delete
+    cloudns = ClouDNSClient(credentials)
+
+    failures = cloudns.delete_records([(DOMAIN, "1"), (DOMAIN, "2")])
+
+    assert list(failures) == [(DOMAIN, "2")]
+    assert api_request.call_count == 2
+
+
+def test_leftover_records_are_deleted_from_journal(
+        credentials, api_request, tmp_path):
+    def create(api_method, **kwargs):
+        if api_method is transport.RECORD_CREATE:
+            return {"status": "Success", "data": {"id": kwargs["record"]}}
+        return fake_api(api_method, **kwargs)
+
+    def delete(api_method, **kwargs):
+        if kwargs["record_id"] == "token2":
+            raise client.ApiErrorResponse(
+                {"status_code": 200, "error": "Invalid record-id param."}
+            )
+
+    path = str(tmp_path / "records.jsonl")
+    api_request.side_effect = create
+    ClouDNSClient(credentials, journal=RecordJournal(path)).add_txt_records([
+        (DOMAIN, "_acme-challenge." + DOMAIN, "token1"),
+        ("www." + DOMAIN, "_acme-challenge.www." + DOMAIN, "token2"),
+    ], 60)
+
+    # The next run finds both records in the journal
+    journal = RecordJournal(path)
+    assert sorted(journal.records("auth-id=1234")) == [
+        (DOMAIN, "_acme-challenge", "token1", "token1"),
+        (DOMAIN, "_acme-challenge.www", "token2", "token2"),
+    ]
+    api_request.reset_mock()
+    api_request.side_effect = delete
+    ClouDNSClient(credentials, journal=journal).delete_journaled_records()
+
+    assert _methods(api_request) == [transport.RECORD_DELETE] * 2
+    assert not os.path.exists(path)
+
+
+@pytest.mark.parametrize("response", [
+    {"status_code": 200, "error": "Too many requests"},
+    {"status_code": 200, "error": "Invalid authentication, incorrect auth-id "
+                                  "or auth-password."},
+    {"status_code": 200, "error": "Failed"},
+    {"status_code": 500, "error": "HTTP response 500"},
+])
+def test_journal_keeps_records_on_other_failures(
+        credentials, api_request, tmp_path, response):
+    path = str(tmp_path / "records.jsonl")
+    journal = RecordJournal(path)
+    journal.add("auth-id=1234", DOMAIN, "_acme-challenge", "token1", "1")
+    journal.flush()
+    api_request.side_effect = client.ApiErrorResponse(response)
+
+    ClouDNSClient(credentials, journal=journal).delete_journaled_records()
+
+    assert RecordJournal(path).records("auth-id=1234") == [
+        (DOMAIN, "_acme-challenge", "token1", "1")
+    ]
+
+
+def test_auth_params_are_sent_per_client():
+    clients = [ClouDNSClient(Credentials(auth_id=str(i),
+                                         auth_password=f"secret{i}"))
+               for i in range(2)]
+    response = mock.MagicMock(status_code=200)
+    response.json.return_value = ZONE_PAYLOAD
+
+    with mock.patch("requests.Session.request",
+                    return_value=response) as request:
+        for cloudns in clients + clients:
+            cloudns._api_request(transport.ZONE_GET, domain_name=DOMAIN)
+
+    assert [
+        (call.kwargs["params"]["auth-id"],
+         call.kwargs["params"]["auth-password"])
+        for call in request.call_args_list
+    ] == [("0", "secret0"), ("1", "secret1")] * 2
+
+
+def _zone_lookups(api_request):
+    return [call.kwargs["domain_name"] for call in api_request.mock_calls
+            if call.args[0] is transport.ZONE_GET]
+
+
+def test_zone_lookups_are_cached_across_clients(credentials, api_request,
+                                                tmp_path):
+    path = str(tmp_path / "zones.json")
+    record_name = "_acme-challenge.www." + DOMAIN
+
+    ClouDNSClient(credentials, zone_cache=ZoneCache(path)).add_txt_record(
+        DOMAIN, record_name, "token", 60
+    )
+    assert _zone_lookups(api_request) == ["www." + DOMAIN, DOMAIN]
+
+    # The lookups were written to the file by the first client
+    api_request.reset_mock()
+    ClouDNSClient(credentials, zone_cache=ZoneCache(path)).add_txt_record(
+        DOMAIN, record_name, "token", 60
+    )
+    assert _zone_lookups(api_request) == []
+    assert api_request.call_count == 1
+
+
+def test_missing_zone_invalidates_cache(credentials, api_request, tmp_path):
+    zone_cache = ZoneCache(str(tmp_path / "zones.json"))
+    record_name = "_acme-challenge.www." + DOMAIN
+    zone_cache.set("auth-id=1234", record_name, "www." + DOMAIN,
+                   "_acme-challenge")
+
+    def create_fails_for_stale_zone(api_method, **kwargs):
+        if (
+                api_method is transport.RECORD_CREATE
+                and kwargs["domain_name"] != DOMAIN
+        ):
+            raise client.ApiErrorResponse(
+                {"status_code": 200, "error": "Missing domain-name"}
+            )
+        return fake_api(api_method, **kwargs)
+    api_request.side_effect = create_fails_for_stale_zone
+
+    ClouDNSClient(credentials, zone_cache=zone_cache).add_txt_record(
+        DOMAIN, record_name, "token", 60
+    )
+
+    created = [call.kwargs["domain_name"] for call in api_request.mock_calls
+               if call.args[0] is transport.RECORD_CREATE]
+    assert created == ["www." + DOMAIN, DOMAIN]
+    assert zone_cache.get("auth-id=1234", record_name) == \
+        (DOMAIN, "_acme-challenge.www")
+
+
+def test_inventory_zone_lookup(credentials, api_request):
+    zones = [{"name": f"zone{i}.example.org"} for i in range(250)]
+    zones.append({"name": DOMAIN})
+
+    def list_zones(api_method, **kwargs):
+        if api_method is transport.ZONE_PAGE_COUNT:
+            return 3
+        if api_method is transport.ZONE_LIST:
+            start = (kwargs["page"] - 1) * kwargs["rows_per_page"]
+            return zones[start:start + kwargs["rows_per_page"]]
+        return fake_api(api_method, **kwargs)
+    api_request.side_effect = list_zones
+
+    cloudns = ClouDNSClient(credentials,
+                            zone_lookup=client.ZONE_LOOKUP_INVENTORY)
+    cloudns.add_txt_records([
+        (DOMAIN, "_acme-challenge.a.b.c." + DOMAIN, "token1"),
+        ("zone7.example.org", "_acme-challenge.zone7.example.org", "token2"),
+    ], 60)
+
+    assert _zone_lookups(api_request) == []
+    methods = [call.args[0] for call in api_request.mock_calls]
+    assert methods.count(transport.ZONE_LIST) == 3
+    created = sorted(
+        (call.kwargs["domain_name"], call.kwargs["host"])
+        for call in api_request.mock_calls
+        if call.args[0] is transport.RECORD_CREATE
+    )
+    assert created == [(DOMAIN, "_acme-challenge.a.b.c"),
+                       ("zone7.example.org", "_acme-challenge")]
+
+    with pytest.raises(errors.PluginError):
+        cloudns.add_txt_record(DOMAIN, "_acme-challenge.example.net",
+                               "token", 60)
+
+
+def test_requests_use_pooled_session(credentials):
+    cloudns = ClouDNSClient(credentials)
+    response = mock.MagicMock(status_code=200)
+    response.json.return_value = ZONE_PAYLOAD
+
+    metrics.REGISTRY.reset()
+    with mock.patch("requests.Session.request",
+                    return_value=response) as request:
+        cloudns._api_request(transport.ZONE_GET, domain_name=DOMAIN)
+        session = cloudns.transport.get_session()
+        cloudns._api_request(transport.RECORD_LIST,
+                             domain_name=DOMAIN, host="www")
+
+    assert request.call_count == 2
+    for call in request.call_args_list:
+        assert call.kwargs["timeout"] == client.DEFAULT_TIMEOUT
+        assert call.kwargs["params"]["auth-id"] == "1234"
+    assert cloudns.transport.get_session() is session
+    assert set(metrics.REGISTRY.summary()) == {"api.zone.get",
+                                               "api.record.list"}
+
+    adapter = session.get_adapter("https://api.cloudns.net/")
+    assert adapter._pool_maxsize == client.DEFAULT_POOL_SIZE
+
+
+def test_transport_settings_from_credentials():
+    cloudns = ClouDNSClient(Credentials(pool_size="25", timeout="2.5",
+                                        retries="0", rate_limit="5",
+                                        rate_burst="10"))
+
+    assert cloudns.transport.pool_size == 25
+    assert cloudns.transport.timeout == 2.5
+    assert cloudns.scheduler.retries == 0
+    assert cloudns.scheduler.rate == 5
+    assert cloudns.scheduler.burst == 10
+    assert cloudns.transport.get_session().get_adapter(
+        "https://api.cloudns.net/"
+    )._pool_maxsize == 25
+
+
+def test_api_endpoint_from_credentials():
+    cloudns = ClouDNSClient(Credentials(
+        auth_id="1234", api_endpoint="http://127.0.0.1:8080/"
+    ))
+    response = mock.MagicMock(status_code=200)
+    response.json.return_value = ZONE_PAYLOAD
+
+    with mock.patch("requests.Session.request",
+                    return_value=response) as request:
+        cloudns._api_request(transport.ZONE_GET, domain_name=DOMAIN)
+
+    assert request.call_args.args == (
+        "GET", "http://127.0.0.1:8080/dns/get-zone-info.json"
+    )
+
+
+def test_invalid_transport_settings():
+    with pytest.raises(errors.PluginError):
+        ClouDNSClient(Credentials(pool_size="many"))
+
+
+ApiResponse = transport.ApiResponse
+
+
+@pytest.fixture
+def no_sleep():
+    with mock.patch("time.sleep") as sleep:
+        yield sleep
+
+
+@pytest.mark.parametrize("failure", [
+    ApiResponse(status_code=429, error="HTTP response 429"),
+    ApiResponse(200, error="Too many requests. Please try again later."),
+    ApiResponse(status_code=500, error="API Network Connection error."),
+    ApiResponse(status_code=504, error="API Connection timed out."),
+])
+def test_retries_throttled_and_transient_failures(credentials, no_sleep,
+                                                  failure):
+    cloudns = ClouDNSClient(credentials)
+    cloudns.transport.request = mock.MagicMock(side_effect=[
+        failure, failure, ApiResponse(200, payload=ZONE_PAYLOAD)
+    ])
+
+    assert cloudns._api_request(transport.ZONE_GET, domain_name=DOMAIN) == \
+        ZONE_PAYLOAD
+
+    assert cloudns.transport.request.call_count == 3
+    assert cloudns.request_stats["requests"] == 3
+    assert cloudns.request_stats["retried"] == 2
+    assert sum(delay for (delay,), _ in no_sleep.call_args_list) <= \
+        client.DEFAULT_BACKOFF * 3
+
+
+def test_gives_up_after_retries(credentials, no_sleep):
+    cloudns = ClouDNSClient(Credentials(auth_id="1234", retries="2"))
+    cloudns.transport.request = mock.MagicMock(
+        return_value=ApiResponse(status_code=429, error="HTTP response 429")
+    )
+
+    with pytest.raises(client.ApiErrorResponse):
+        cloudns._api_request(transport.ZONE_GET, domain_name=DOMAIN)
+
+    assert cloudns.transport.request.call_count == 3
+    assert cloudns.request_stats == {"requests": 3, "throttled": 3,
+                                     "retried": 2}
+
+
+def test_create_is_not_retried_after_transient_failure(credentials,
+                                                       no_sleep):
+    cloudns = ClouDNSClient(credentials)
+    response = ApiResponse(status_code=504, error="API Connection timed out.")
+
+    cloudns.transport.request = mock.MagicMock(return_value=response)
+
+    with pytest.raises(client.ApiErrorResponse):
+        cloudns._api_request(transport.RECORD_CREATE, domain_name=DOMAIN)
+
+    assert cloudns.transport.request.call_count == 1
+    assert cloudns.request_stats == {"requests": 1, "transient": 1}
+
+
+def test_errors_are_not_retried(credentials, no_sleep):
+    cloudns = ClouDNSClient(credentials)
+    cloudns.transport.request = mock.MagicMock(
+        return_value=ApiResponse(200, error="Missing domain-name")
+    )
+
+    with pytest.raises(client.ApiErrorResponse):
+        cloudns._api_request(transport.ZONE_GET, domain_name=DOMAIN)
+
+    assert cloudns.transport.request.call_count == 1
+
+
+def test_rate_limit(credentials):
+    scheduler = client.RequestScheduler(rate=50, burst=5)
+
+    start = time.monotonic()
+    for _ in range(15):
+        scheduler.run(lambda: None, lambda response: None)
+
+    # 5 requests are admitted immediately, the others at 50 per second
+    assert 0.18 <= time.monotonic() - start < 0.5
+    assert scheduler.stats["delayed"] == 10
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))  # pragma: no cover
@@ -0,0 +1,195 @@
+"""Tests for certbot_dns_cloudns._internal.daemon."""
+
+import os
+import socket
+import stat
+import sys
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from certbot import errors
+
+from certbot_dns_cloudns._internal.client import BatchError
+from certbot_dns_cloudns._internal.daemon import ChallengeDaemon
+from certbot_dns_cloudns._internal.daemon import DaemonClient
+
+DOMAIN = "example.com"
+RECORDS = [(DOMAIN, "_acme-challenge." + DOMAIN, "token1"),
+           ("www." + DOMAIN, "_acme-challenge.www." + DOMAIN, "token2")]
+
+
+def resolve(names, **kwargs):
+    return {name: name.replace("_acme-challenge.", "_acme-challenge.dns.")
+            for name in names}
+
+
+@pytest.fixture
+def client():
+    client = mock.MagicMock(max_workers=10)
+    client.request_stats = {"requests": 2}
+    client.del_txt_records.return_value = {}
+    return client
+
+
+@pytest.fixture
+def daemon(client, tmp_path):
+    daemon = ChallengeDaemon(client, str(tmp_path / "cloudns.sock"))
+    daemon.thread = threading.Thread(target=daemon.serve_forever)
+
+    with mock.patch("certbot_dns_cloudns._internal.daemon.resolve_aliases",
+                    side_effect=resolve):
+        daemon.thread.start()
+        while daemon._server is None:
+            time.sleep(0.01)
+        yield daemon
+
+    daemon.shutdown()
+    daemon.thread.join()
+
+
+def resolved(records):
+    return [(domain, resolve([name])[name], content)
+            for domain, name, content in records]
+
+
+def test_add_and_delete(daemon, client):
+    daemon_client = DaemonClient(daemon.socket_path)
+
+    daemon_client.add_txt_records(RECORDS, 60)
+    assert daemon_client.del_txt_records(RECORDS) == {}
+
+    assert client.mock_calls == [
+        mock.call.add_txt_records(resolved(RECORDS), 60),
+        mock.call.del_txt_records(resolved(RECORDS)),
+    ]
+
+
+def test_wait_for_updates(daemon, client):
+    client.wait_for_updates.return_value = True
+
+    assert DaemonClient(daemon.socket_path).wait_for_updates(RECORDS, 30)
+    client.wait_for_updates.assert_called_once_with(
+        {name for _, name, _ in resolved(RECORDS)}, 30
+    )
+
+
+def test_prepare(daemon, client):
+    DaemonClient(daemon.socket_path).prepare(RECORDS)
+
+    client.prepare.assert_called_once_with(
+        {name for _, name, _ in resolved(RECORDS)}
+    )
+
+
+def test_socket_is_private(daemon):
+    assert stat.S_IMODE(os.stat(daemon.socket_path).st_mode) == 0o600
+
+
+def test_add_failures_are_reported_per_domain(daemon, client):
+    client.add_txt_records.side_effect = BatchError(
+        {DOMAIN: errors.PluginError("boom")}
+    )
+
+    with pytest.raises(BatchError) as exc_info:
+        DaemonClient(daemon.socket_path).add_txt_records(RECORDS, 60)
+
+    assert list(exc_info.value.failures) == [DOMAIN]
+    assert "boom" in str(exc_info.value)
+
+
+def test_delete_failures_are_reported_per_domain(daemon, client):
+    client.del_txt_records.return_value = {
+        DOMAIN: errors.PluginError("boom")
+    }
+
+    failures = DaemonClient(daemon.socket_path).del_txt_records(RECORDS)
+
+    assert list(failures) == [DOMAIN]
+    assert "boom" in str(failures[DOMAIN])
+
+
+def test_unexpected_errors_are_reported(daemon, client):
+    client.del_txt_records.side_effect = RuntimeError("timeout")
+
+    with pytest.raises(errors.PluginError, match="timeout"):
+        DaemonClient(daemon.socket_path)._request(
+            {"action": "delete", "records": RECORDS}
+        )
+
+
+def test_stats(daemon):
+    assert DaemonClient(daemon.socket_path).stats()["requests"] == \
+        {"requests": 2}
+
+
+def test_invalid_requests(daemon):
+    daemon_client = DaemonClient(daemon.socket_path)
+
+    with pytest.raises(errors.PluginError, match="Unknown action"):
+        daemon_client._request({"action": "drop"})
+    with pytest.raises(errors.PluginError, match="records"):
+        daemon_client._request({"action": "add"})
+
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.connect(daemon.socket_path)
+        sock.sendall(b"[]\n")
+        assert b"Invalid request" in sock.makefile("rb").readline()
+
+
+def test_unavailable_daemon(tmp_path):
+    daemon_client = DaemonClient(str(tmp_path / "missing.sock"))
+
+    with pytest.raises(errors.PluginError):
+        daemon_client.add_txt_records(RECORDS, 60)
+    assert sorted(daemon_client.del_txt_records(RECORDS)) == \
+        sorted(domain for domain, _, _ in RECORDS)
+
+
+def test_socket_is_removed_on_shutdown(daemon, client):
+    daemon.shutdown()
+    daemon.thread.join()
+
+    assert not os.path.exists(daemon.socket_path)
+    client.close.assert_called_once()
+
+
+def test_stale_socket_is_replaced(client, tmp_path):
+    path = str(tmp_path / "cloudns.sock")
+    # Bound, but nobody listens on it
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.bind(path)
+
+    daemon = ChallengeDaemon(client, path)
+    thread = threading.Thread(target=daemon.serve_forever)
+    thread.start()
+    try:
+        while daemon._server is None:
+            time.sleep(0.01)
+        assert DaemonClient(path).stats()["requests"] == {"requests": 2}
+    finally:
+        daemon.shutdown()
+        thread.join()
+
+
+def test_socket_path_is_not_a_socket(client, tmp_path):
+    path = tmp_path / "cloudns.sock"
+    path.write_text("data")
+
+    with pytest.raises(errors.PluginError, match="not a socket"):
+        ChallengeDaemon(client, str(path)).serve_forever()
+    assert path.read_text() == "data"
+
+
+def test_socket_in_use(daemon, client):
+    with pytest.raises(errors.PluginError, match="already listening"):
+        ChallengeDaemon(client, daemon.socket_path).serve_forever()
+
+    assert DaemonClient(daemon.socket_path).stats()["requests"] == \
+        {"requests": 2}
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))  # pragma: no cover
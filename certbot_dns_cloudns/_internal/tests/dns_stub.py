@@ -0,0 +1,121 @@
+"""A minimal authoritative DNS server answering from an in-memory table."""
+import socket
+import threading
+
+import dns.flags
+import dns.message
+import dns.name
+import dns.query
+import dns.rcode
+import dns.rdatatype
+import dns.rrset
+
+
+class StubDNSServer:
+    """
+    Serves records over UDP and TCP on localhost until stopped.
+
+    Records are stored as text rdata keyed by owner name and record type, so
+    they can be changed while the server is running. If `truncate` is set,
+    answers over UDP are empty and have the TC flag set.
+    """
+
+    def __init__(self, ttl=60, truncate=False, address='127.0.0.1', port=0):
+        self.ttl = ttl
+        self.truncate = truncate
+        self.records = {}
+        self.queries = []
+        self._lock = threading.Lock()
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((address, port))
+        self._socket.settimeout(0.1)
+        self._tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._tcp_socket.bind((address, self.port))
+        self._tcp_socket.listen()
+        self._tcp_socket.settimeout(0.1)
+        self._running = False
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._tcp_thread = threading.Thread(target=self._serve_tcp,
+                                            daemon=True)
+
+    @property
+    def address(self):
+        return self._socket.getsockname()[0]
+
+    @property
+    def port(self):
+        return self._socket.getsockname()[1]
+
+    def set(self, name, rdtype, *values):
+        key = (dns.name.from_text(name), dns.rdatatype.from_text(rdtype))
+        with self._lock:
+            if values:
+                self.records[key] = list(values)
+            else:
+                self.records.pop(key, None)
+
+    def set_txt(self, name, *values):
+        self.set(name, 'TXT', *(f'"{value}"' for value in values))
+
+    def start(self):
+        self._running = True
+        self._thread.start()
+        self._tcp_thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._thread.join()
+        self._tcp_thread.join()
+        self._socket.close()
+        self._tcp_socket.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _serve(self):
+        while self._running:
+            try:
+                data, peer = self._socket.recvfrom(65535)
+            except socket.timeout:
+                continue
+            query = dns.message.from_wire(data)
+            if self.truncate:
+                response = dns.message.make_response(query)
+                response.flags |= dns.flags.TC
+            else:
+                response = self._answer(query)
+            self._socket.sendto(response.to_wire(), peer)
+
+    def _serve_tcp(self):
+        while self._running:
+            try:
+                connection, _ = self._tcp_socket.accept()
+            except socket.timeout:
+                continue
+            with connection:
+                connection.settimeout(1)
+                query, _ = dns.query.receive_tcp(connection)
+                dns.query.send_tcp(connection, self._answer(query))
+
+    def _answer(self, query):
+        response = dns.message.make_response(query)
+        response.flags |= dns.flags.AA
+        question = query.question[0]
+
+        with self._lock:
+            self.queries.append((question.name, question.rdtype))
+            values = self.records.get((question.name, question.rdtype))
+            known = any(name == question.name for name, _ in self.records)
+
+        if values:
+            response.answer.append(dns.rrset.from_text_list(
+                question.name, self.ttl, 'IN', question.rdtype, values
+            ))
+        elif not known:
+            response.set_rcode(dns.rcode.NXDOMAIN)
+
+        return response
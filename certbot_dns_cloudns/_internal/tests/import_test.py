@@ -0,0 +1,72 @@
+"""Tests for the cost of importing the plugin."""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import certbot_dns_cloudns
+
+# Certbot imports every installed plugin on startup, so importing the plugin
+# must stay cheap. The budgets leave room for slow CI machines; the import
+# takes about 35 ms and 1.6 MiB on a workstation.
+IMPORT_SECONDS_BUDGET = 0.25
+IMPORT_MEMORY_BUDGET = 3 * 1024 * 1024
+
+# Modules which are only needed once the plugin is used
+DEFERRED_MODULES = ("dns", "certbot_dns_cloudns._internal.propagation",
+                    "certbot_dns_cloudns._internal.resolve",
+                    "certbot_dns_cloudns._internal.daemon", "socketserver")
+
+MEASURE = """
+import json
+import sys
+import time
+import tracemalloc
+
+# Loaded by certbot before the plugins
+import zope.interface
+from acme import challenges
+from certbot.plugins import dns_common
+
+if sys.argv[1] == "memory":
+    tracemalloc.start()
+start = time.perf_counter()
+import certbot_dns_cloudns._internal.authenticator
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "memory": tracemalloc.get_traced_memory()[1],
+    "modules": sorted(sys.modules),
+}))
+"""
+
+
+def measure_import(mode):
+    # Run from the directory containing the package, so it is importable
+    # without being installed
+    root = os.path.dirname(os.path.dirname(certbot_dns_cloudns.__file__))
+    output = subprocess.run([sys.executable, "-c", MEASURE, mode], cwd=root,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def test_import_time_budget():
+    # The best of several runs, to ignore noise from other processes
+    seconds = min(measure_import("time")["seconds"] for _ in range(3))
+
+    assert seconds < IMPORT_SECONDS_BUDGET
+
+
+def test_import_memory_budget():
+    result = measure_import("memory")
+
+    assert result["memory"] < IMPORT_MEMORY_BUDGET
+    assert not [module for module in result["modules"]
+                for deferred in DEFERRED_MODULES
+                if module == deferred or module.startswith(deferred + ".")]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))  # pragma: no cover
@@ -0,0 +1,73 @@
+"""Tests for certbot_dns_cloudns._internal.journal."""
+
+import sys
+from unittest import mock
+
+import pytest
+
+from certbot_dns_cloudns._internal.journal import RecordJournal
+
+ACCOUNT = "auth-id=1234"
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "records.jsonl")
+
+
+def test_records_survive_until_deleted(path):
+    journal = RecordJournal(path)
+    journal.add(ACCOUNT, "example.com", "_acme-challenge", "token1", 1)
+    journal.add(ACCOUNT, "example.com", "_acme-challenge", "token2", 2)
+    journal.add("auth-id=5678", "example.net", "_acme-challenge", "t", 3)
+    journal.flush()
+    journal.remove(ACCOUNT, "example.com", "1")
+    journal.flush()
+
+    assert RecordJournal(path).records(ACCOUNT) == [
+        ("example.com", "_acme-challenge", "token2", "2")
+    ]
+
+
+def test_entries_are_written_on_flush_with_one_fsync(path):
+    journal = RecordJournal(path)
+    for record_id in range(10):
+        journal.add(ACCOUNT, "example.com", "_acme-challenge", "t", record_id)
+    assert RecordJournal(path).records(ACCOUNT) == []
+
+    with mock.patch("os.fsync") as mock_fsync:
+        journal.flush()
+        journal.flush()
+
+    mock_fsync.assert_called_once()
+    assert len(RecordJournal(path).records(ACCOUNT)) == 10
+
+
+def test_file_is_removed_once_all_records_are_deleted(path):
+    journal = RecordJournal(path)
+    journal.add(ACCOUNT, "example.com", "_acme-challenge", "token1", 1)
+    journal.flush()
+    journal.remove(ACCOUNT, "example.com", 1)
+    journal.flush()
+
+    with pytest.raises(FileNotFoundError):
+        open(path)
+
+
+def test_interrupted_write_is_repaired(path):
+    journal = RecordJournal(path)
+    journal.add(ACCOUNT, "example.com", "_acme-challenge", "token1", 1)
+    journal.flush()
+    with open(path, "a") as journal_file:
+        journal_file.write('{"op": "add", "acc')
+
+    journal = RecordJournal(path)
+    journal.add(ACCOUNT, "example.com", "_acme-challenge", "token2", 2)
+    journal.flush()
+
+    assert [record[3] for record in RecordJournal(path).records(ACCOUNT)] == \
+        ["1", "2"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))  # pragma: no cover
@@ -0,0 +1,79 @@
+"""Tests for certbot_dns_cloudns._internal.metrics."""
+
+import json
+import sys
+
+import pytest
+
+from certbot_dns_cloudns._internal import metrics
+from certbot_dns_cloudns._internal.metrics import Metrics
+
+
+@pytest.fixture
+def registry():
+    registry = Metrics()
+    registry.record("api.zone.get", 0.25)
+    registry.record("api.zone.get", 0.5, error=True)
+    registry.record("resolve_alias", 0.125)
+    return registry
+
+
+def test_timer():
+    registry = Metrics()
+
+    with registry.timer("operation"):
+        pass
+    with pytest.raises(ValueError):
+        with registry.timer("operation"):
+            raise ValueError()
+
+    stats = registry.summary()["operation"]
+    assert stats["calls"] == 2
+    assert stats["errors"] == 1
+    assert stats["seconds_max"] <= stats["seconds_total"]
+
+
+def test_timed():
+    metrics.REGISTRY.reset()
+
+    @metrics.timed("decorated")
+    def decorated(value):
+        return value
+
+    assert decorated(42) == 42
+    assert metrics.REGISTRY.summary()["decorated"]["calls"] == 1
+
+
+def test_to_json(registry):
+    assert json.loads(registry.to_json()) == {"operations": {
+        "api.zone.get": {"calls": 2, "errors": 1, "seconds_total": 0.75,
+                         "seconds_max": 0.5},
+        "resolve_alias": {"calls": 1, "errors": 0, "seconds_total": 0.125,
+                          "seconds_max": 0.125},
+    }}
+
+
+def test_to_prometheus(registry):
+    lines = registry.to_prometheus().splitlines()
+
+    assert "# TYPE certbot_dns_cloudns_operation_calls_total counter" in lines
+    assert 'certbot_dns_cloudns_operation_calls_total' \
+           '{operation="api.zone.get"} 2' in lines
+    assert 'certbot_dns_cloudns_operation_errors_total' \
+           '{operation="resolve_alias"} 0' in lines
+    assert 'certbot_dns_cloudns_operation_duration_seconds_max' \
+           '{operation="api.zone.get"} 0.5' in lines
+
+
+@pytest.mark.parametrize("output_format", metrics.FORMATS)
+def test_write(registry, tmp_path, output_format):
+    path = tmp_path / "metrics"
+    registry.write(str(path), output_format)
+
+    content = path.read_text()
+    assert "api.zone.get" in content
+    assert list(tmp_path.iterdir()) == [path]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))  # pragma: no cover
@@ -0,0 +1,75 @@
+"""Tests for certbot_dns_cloudns._internal.profiling."""
+
+import json
+import os
+import pstats
+import subprocess
+import sys
+import time
+
+import pytest
+
+import certbot_dns_cloudns
+from certbot_dns_cloudns._internal import profiling
+
+
+def timings(directory):
+    with open(directory / profiling.TIMINGS_FILE) as timings_file:
+        return [json.loads(line) for line in timings_file]
+
+
+def test_disabled_by_default(tmp_path, monkeypatch):
+    monkeypatch.delenv(profiling.PROFILE_ENV, raising=False)
+
+    with profiling.Phase("perform"):
+        pass
+
+    assert not list(tmp_path.iterdir())
+
+
+def test_phases_are_profiled(tmp_path, monkeypatch):
+    monkeypatch.setenv(profiling.PROFILE_ENV, str(tmp_path))
+
+    @profiling.profiled("perform")
+    def perform():
+        with profiling.Phase("setup_credentials"):
+            time.sleep(0.01)
+
+    perform()
+
+    inner, outer = timings(tmp_path)
+    assert (inner["phase"], outer["phase"]) == ("setup_credentials",
+                                                "perform")
+    assert outer["seconds"] >= inner["seconds"] >= 0.01
+    # Nested phases are only timed
+    assert "profile" not in inner
+    stats = pstats.Stats(outer["profile"])
+    assert any("sleep" in function for _, _, function in stats.stats)
+
+
+def test_failing_phase_releases_the_profiler(tmp_path, monkeypatch):
+    monkeypatch.setenv(profiling.PROFILE_ENV, str(tmp_path))
+
+    with pytest.raises(ImportError):
+        with profiling.Phase("import"):
+            raise ImportError("broken")
+
+    assert not profiling._profiler_lock.locked()
+    with profiling.Phase("perform") as phase:
+        assert phase._profiler is not None
+
+
+def test_import_is_profiled(tmp_path):
+    subprocess.run(
+        [sys.executable, "-c",
+         "import certbot_dns_cloudns._internal.authenticator"],
+        cwd=os.path.dirname(os.path.dirname(certbot_dns_cloudns.__file__)),
+        env={**os.environ, profiling.PROFILE_ENV: str(tmp_path)},
+        check=True
+    )
+
+    assert [entry["phase"] for entry in timings(tmp_path)] == ["import"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))  # pragma: no cover
@@ -0,0 +1,195 @@
+"""Tests for certbot_dns_cloudns._internal.propagation."""
+
+import socket
+import sys
+import threading
+import time
+
+import dns.resolver
+import pytest
+from certbot import errors
+
+from certbot_dns_cloudns._internal import propagation
+from certbot_dns_cloudns._internal.tests.dns_stub import StubDNSServer
+
+RECORD_NAME = "_acme-challenge.example.com"
+
+
+@pytest.fixture
+def server():
+    with StubDNSServer() as server:
+        yield server
+
+
+def _wait(server, values, timeout):
+    return propagation.wait_for_txt_records(
+        {RECORD_NAME: ([server.address], set(values))},
+        timeout,
+        port=server.port,
+        initial_interval=0.05,
+        max_interval=0.2,
+        query_timeout=1,
+    )
+
+
+def test_records_already_visible(server):
+    server.set_txt(RECORD_NAME, "token1", "token2")
+
+    start = time.monotonic()
+    assert _wait(server, ["token1", "token2"], timeout=5)
+    assert time.monotonic() - start < 1
+    assert len(server.queries) == 1
+
+
+def test_records_become_visible(server):
+    server.set_txt(RECORD_NAME, "token1")
+    timer = threading.Timer(
+        0.3, server.set_txt, (RECORD_NAME, "token1", "token2")
+    )
+    timer.start()
+
+    start = time.monotonic()
+    try:
+        assert _wait(server, ["token1", "token2"], timeout=5)
+    finally:
+        timer.cancel()
+
+    assert 0.3 <= time.monotonic() - start < 2
+    assert len(server.queries) > 1
+
+
+def test_timeout(server):
+    server.set_txt(RECORD_NAME, "token1")
+
+    start = time.monotonic()
+    assert not _wait(server, ["token2"], timeout=0.5)
+    assert 0.5 <= time.monotonic() - start < 1.5
+
+
+def test_unreachable_nameserver(server):
+    server.set_txt(RECORD_NAME, "token1")
+
+    assert not propagation.wait_for_txt_records(
+        {RECORD_NAME: ([server.address, "127.0.0.2"], {"token1"})},
+        0.3,
+        port=server.port,
+        initial_interval=0.05,
+        query_timeout=0.1,
+    )
+
+
+def test_rounds_are_capped_at_the_deadline(server):
+    records = {f"_acme-challenge.{index}.example.com": (
+        [server.address, "127.0.0.2"], {"token1"}
+    ) for index in range(5)}
+    for record_name in records:
+        server.set_txt(record_name, "token1")
+
+    # A nameserver which never answers
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as silent:
+        silent.bind(("127.0.0.2", server.port))
+
+        start = time.monotonic()
+        assert not propagation.wait_for_txt_records(
+            records, 0.5, port=server.port, initial_interval=0.05,
+            query_timeout=1, max_workers=2
+        )
+        assert time.monotonic() - start < 0.8
+
+
+def test_nothing_to_wait_for(server):
+    with pytest.raises(errors.PluginError):
+        propagation.wait_for_txt_records({}, 1)
+    with pytest.raises(errors.PluginError):
+        propagation.wait_for_txt_records({RECORD_NAME: ([], {"token1"})}, 1)
+    with pytest.raises(errors.PluginError):
+        propagation.wait_for_txt_records(
+            {RECORD_NAME: ([server.address], set())}, 1
+        )
+
+
+def test_find_authoritative_nameservers(server):
+    server.set("example.com", "SOA",
+               "ns1.example.com. admin.example.com. 1 7200 3600 86400 60")
+    server.set("example.com", "NS", "ns1.example.com.", "ns2.example.com.")
+    server.set("ns1.example.com", "A", "192.0.2.1")
+    server.set("ns2.example.com", "A", "192.0.2.2")
+    server.set("ns2.example.com", "AAAA", "2001:db8::2")
+
+    resolver = dns.resolver.Resolver(configure=False)
+    resolver.nameservers = [server.address]
+    resolver.port = server.port
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(propagation, "_get_resolver",
+                            lambda nameserver: resolver)
+        monkeypatch.setattr(propagation, "_is_routable",
+                            lambda address: True)
+        addresses = propagation.find_authoritative_nameservers(RECORD_NAME)
+
+    assert addresses == ["192.0.2.1", "192.0.2.2", "2001:db8::2"]
+
+
+def test_find_authoritative_nameservers_skips_unreachable(server):
+    server.set("example.com", "SOA",
+               "ns1.example.com. admin.example.com. 1 7200 3600 86400 60")
+    server.set("example.com", "NS", "ns1.example.com.")
+    server.set("ns1.example.com", "A", "192.0.2.1")
+    server.set("ns1.example.com", "AAAA", "2001:db8::1")
+
+    resolver = dns.resolver.Resolver(configure=False)
+    resolver.nameservers = [server.address]
+    resolver.port = server.port
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(propagation, "_get_resolver",
+                            lambda nameserver: resolver)
+        monkeypatch.setattr(propagation, "_is_routable",
+                            lambda address: ":" not in address)
+        assert propagation.find_authoritative_nameservers(
+            RECORD_NAME
+        ) == ["192.0.2.1"]
+
+        monkeypatch.setattr(propagation, "_is_routable",
+                            lambda address: False)
+        with pytest.raises(errors.PluginError):
+            propagation.find_authoritative_nameservers(RECORD_NAME)
+
+
+def test_is_routable():
+    assert propagation._is_routable("127.0.0.1")
+
+
+def test_wait_for_zone_updates():
+    checks = []
+
+    def is_updated(zone):
+        checks.append(zone)
+        if zone == "example.org":
+            raise RuntimeError("temporarily unavailable")
+        return zone == "example.com" or checks.count(zone) > 1
+
+    assert propagation.wait_for_zone_updates(
+        is_updated, {"example.com", "example.net"}, 5, initial_interval=0.05
+    )
+    assert sorted(checks) == ["example.com", "example.net", "example.net"]
+
+    assert not propagation.wait_for_zone_updates(
+        is_updated, {"example.org"}, 0.2, initial_interval=0.05
+    )
+
+
+def test_find_nameservers():
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(propagation, "find_authoritative_nameservers",
+                            lambda name, nameserver: [name[-3:]])
+        nameservers = propagation.find_nameservers(
+            ["a.example.com", "b.example.net", "a.example.com"]
+        )
+
+    assert nameservers == {"a.example.com": ["com"],
+                           "b.example.net": ["net"]}
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))  # pragma: no cover
@@ -0,0 +1,266 @@
+"""Tests for certbot_dns_cloudns._internal.resolve."""
+
+import asyncio
+import socket
+import sys
+import time
+from unittest import mock
+
+import dns.exception
+import dns.resolver
+import pytest
+
+from certbot import errors
+
+from certbot_dns_cloudns._internal import resolve
+from certbot_dns_cloudns._internal.cache import TTLCache
+from certbot_dns_cloudns._internal.tests.dns_stub import StubDNSServer
+
+VALIDATION_NAME = "_acme-challenge.example.com"
+SOA = "ns1.example.com. admin.example.com. 1 7200 3600 86400 30"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    clock = Clock()
+    with mock.patch.object(resolve, "_aliases", TTLCache(clock=clock)):
+        yield clock
+
+
+@pytest.fixture
+def server(clock):
+    with StubDNSServer(ttl=300) as server:
+        resolver = dns.resolver.Resolver(configure=False)
+        resolver.nameservers = [server.address]
+        resolver.port = server.port
+        with mock.patch.object(resolve, "_get_resolver",
+                               return_value=resolver):
+            yield server
+
+
+def test_resolve_alias(server):
+    server.set(VALIDATION_NAME, "CNAME", "_acme-challenge.example.org.")
+    server.set("_acme-challenge.example.org", "CNAME",
+               "challenges.example.net.")
+
+    assert resolve.resolve_alias(VALIDATION_NAME, None) == \
+        "challenges.example.net"
+
+
+def test_positive_answers_are_cached_for_their_ttl(server, clock):
+    server.set(VALIDATION_NAME, "CNAME", "challenges.example.net.")
+
+    assert resolve.resolve_alias(VALIDATION_NAME, None) == \
+        "challenges.example.net"
+    queries = len(server.queries)
+
+    server.set(VALIDATION_NAME, "CNAME", "challenges.example.org.")
+    clock.now = 50
+    assert resolve.resolve_alias(VALIDATION_NAME, None) == \
+        "challenges.example.net"
+    assert len(server.queries) == queries
+
+    clock.now = 301
+    assert resolve.resolve_alias(VALIDATION_NAME, None) == \
+        "challenges.example.org"
+
+
+def test_negative_answers_are_cached(server, clock):
+    server.set("example.com", "SOA", SOA)
+
+    assert resolve.resolve_alias(VALIDATION_NAME, None) == VALIDATION_NAME
+    queries = len(server.queries)
+    assert resolve.resolve_alias(VALIDATION_NAME, None) == VALIDATION_NAME
+    assert len(server.queries) == queries
+
+    server.set(VALIDATION_NAME, "CNAME", "challenges.example.net.")
+    clock.now = resolve.DEFAULT_NEGATIVE_TTL + 1
+    assert resolve.resolve_alias(VALIDATION_NAME, None) == \
+        "challenges.example.net"
+
+
+def test_negative_ttl_from_soa():
+    response = dns.message.make_response(
+        dns.message.make_query(VALIDATION_NAME, "CNAME")
+    )
+    response.authority.append(
+        dns.rrset.from_text("example.com", 300, "IN", "SOA", SOA)
+    )
+
+    assert resolve._negative_ttl(dns.resolver.NoAnswer(response=response)) \
+        == 30
+    assert resolve._negative_ttl(dns.resolver.NoAnswer()) == \
+        resolve.DEFAULT_NEGATIVE_TTL
+
+
+def test_alias_loop(server):
+    server.set(VALIDATION_NAME, "CNAME", "_acme-challenge.example.org.")
+    server.set("_acme-challenge.example.org", "CNAME", VALIDATION_NAME + ".")
+
+    with pytest.raises(errors.PluginError):
+        resolve.resolve_alias(VALIDATION_NAME, None)
+
+
+def test_resolve_aliases(server):
+    server.set(VALIDATION_NAME, "CNAME", "challenges.example.net.")
+    names = [f"_acme-challenge.host{i}.example.com" for i in range(20)]
+
+    resolved = resolve.resolve_aliases(names + [VALIDATION_NAME] * 2, None,
+                                       max_workers=5)
+
+    assert resolved == {**{name: name for name in names},
+                        VALIDATION_NAME: "challenges.example.net"}
+
+
+def test_cache_eviction():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1, 60)
+    cache.set("b", 2, 60)
+    assert cache.get("a") == 1
+    cache.set("c", 3, 60)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_parse_nameservers():
+    assert resolve.parse_nameservers(None) == []
+    assert resolve.parse_nameservers("1.1.1.1, 8.8.8.8 9.9.9.9") == \
+        ["1.1.1.1", "8.8.8.8", "9.9.9.9"]
+
+
+def test_configure():
+    try:
+        resolve.configure(query_timeout=1.5)
+        resolver = resolve._get_resolver("192.0.2.1")
+        pool = resolve._get_resolver("192.0.2.1,192.0.2.2")
+
+        assert (resolver.timeout, resolver.lifetime) == (1.5, 1.5)
+        assert isinstance(pool, resolve.ResolverPool)
+        assert pool.nameservers == ["192.0.2.1", "192.0.2.2"]
+    finally:
+        resolve.configure()
+
+
+def test_nameserver_health(clock):
+    health = resolve.NameserverHealth(threshold=2, duration=60, clock=clock)
+    nameservers = ["192.0.2.1", "192.0.2.2"]
+
+    health.record("192.0.2.1", False)
+    assert health.select(nameservers) == nameservers
+    health.record("192.0.2.1", False)
+    assert health.select(nameservers) == ["192.0.2.2"]
+
+    health.record("192.0.2.2", False)
+    health.record("192.0.2.2", False)
+    assert health.select(nameservers) == nameservers
+
+    clock.now = 60
+    health.record("192.0.2.2", True)
+    assert health.select(nameservers) == nameservers
+    health.record("192.0.2.1", False)
+    assert health.select(nameservers) == ["192.0.2.2"]
+
+
+@pytest.fixture
+def silent_server():
+    """A nameserver on 127.0.0.2 which never answers."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as silent:
+        silent.bind(("127.0.0.2", 0))
+        silent.setblocking(False)
+        yield silent
+
+
+@pytest.fixture
+def health(clock):
+    return resolve.NameserverHealth(threshold=1, clock=clock)
+
+
+def test_pool_uses_first_answer(silent_server, health):
+    address, port = silent_server.getsockname()
+    with StubDNSServer(port=port) as server:
+        server.set(VALIDATION_NAME, "CNAME", "challenges.example.net.")
+        pool = resolve.ResolverPool([address, server.address], timeout=2,
+                                    health=health, port=port)
+
+        start = time.monotonic()
+        answer = pool.resolve(VALIDATION_NAME, "CNAME")
+
+    assert time.monotonic() - start < 1
+    assert str(answer[0].target) == "challenges.example.net."
+
+
+def test_pool_raises_negative_answers(silent_server, health):
+    address, port = silent_server.getsockname()
+    with StubDNSServer(port=port) as server:
+        pool = resolve.ResolverPool([address, server.address], timeout=2,
+                                    health=health, port=port)
+
+        with pytest.raises(dns.resolver.NXDOMAIN):
+            pool.resolve(VALIDATION_NAME, "CNAME")
+
+
+def test_pool_skips_unhealthy_nameservers(silent_server, health):
+    address, port = silent_server.getsockname()
+    with StubDNSServer(port=port) as server:
+        server.set(VALIDATION_NAME, "CNAME", "challenges.example.net.")
+        pool = resolve.ResolverPool([address, server.address], timeout=0.5,
+                                    health=health, port=port)
+        health.record(address, False)
+
+        pool.resolve(VALIDATION_NAME, "CNAME")
+
+    with pytest.raises(BlockingIOError):
+        silent_server.recv(512)
+
+
+def test_pool_raises_when_all_nameservers_fail(silent_server, health):
+    address, port = silent_server.getsockname()
+    pool = resolve.ResolverPool([address, "127.0.0.3"], timeout=0.2,
+                                health=health, port=port)
+
+    with pytest.raises(dns.exception.DNSException):
+        pool.resolve(VALIDATION_NAME, "CNAME")
+
+    assert set(health._unhealthy_until) == set(pool.nameservers)
+
+
+def test_async_pool_uses_first_answer(silent_server, health):
+    address, port = silent_server.getsockname()
+    with StubDNSServer(port=port) as server:
+        server.set(VALIDATION_NAME, "CNAME", "challenges.example.net.")
+        pool = resolve.AsyncResolverPool([address, server.address],
+                                         timeout=2, health=health, port=port)
+
+        start = time.monotonic()
+        answer = asyncio.run(pool.resolve(VALIDATION_NAME, "CNAME"))
+
+    assert time.monotonic() - start < 1
+    assert str(answer[0].target) == "challenges.example.net."
+
+
+def test_truncated_answers_are_retried_over_tcp():
+    with StubDNSServer(truncate=True) as server:
+        server.set(VALIDATION_NAME, "CNAME", "challenges.example.net.")
+        resolver = resolve._configure_resolver(
+            dns.resolver.Resolver, [server.address], 2, server.port
+        )
+
+        answer = resolver.resolve(VALIDATION_NAME, "CNAME")
+
+    assert str(answer[0].target) == "challenges.example.net."
+    assert len(server.queries) == 1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))  # pragma: no cover
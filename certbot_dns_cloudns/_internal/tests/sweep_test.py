@@ -0,0 +1,125 @@
+"""Tests for certbot_dns_cloudns._internal.sweep."""
+
+import sys
+from unittest import mock
+
+import pytest
+
+from certbot_dns_cloudns._internal import sweep
+
+ACCOUNT = "auth-id=1234"
+RECORDS = {
+    "example.com": {
+        "1": {"host": "_acme-challenge", "record": "token1"},
+        "2": {"host": "_acme-challenge.www", "record": "token2"},
+        "3": {"host": "www", "record": "v=spf1 -all"},
+    },
+    "example.net": {},
+}
+
+
+@pytest.fixture
+def client():
+    client = mock.MagicMock()
+    client.iter_zones.return_value = iter(RECORDS)
+    client.iter_zone_txt_records.side_effect = \
+        lambda zones, predicate: ((zone, {
+            record_id: record for record_id, record in RECORDS[zone].items()
+            if predicate(record)
+        }) for zone in zones)
+    client.delete_records.return_value = {}
+    return client
+
+
+@pytest.fixture
+def sightings(tmp_path):
+    return sweep.SightingLog(str(tmp_path / "sweep.json"))
+
+
+def _sweep(client, sightings, now, **kwargs):
+    with mock.patch("time.time", return_value=now):
+        return sweep.sweep(client, sightings, ACCOUNT, **kwargs)
+
+
+def test_is_challenge_host():
+    assert sweep.is_challenge_host("_acme-challenge")
+    assert sweep.is_challenge_host("_acme-challenge.www")
+    assert not sweep.is_challenge_host("www._acme-challenge")
+    assert not sweep.is_challenge_host("")
+    assert sweep.is_challenge_host("www.acme", ["*.acme"])
+    assert not sweep.is_challenge_host("www", ["*.acme"])
+
+
+def test_delegated_records_are_swept(client, sightings):
+    RECORDS["example.net"] = {
+        "4": {"host": "www.example.com.acme", "record": "token4"},
+        "5": {"host": "www", "record": "v=spf1 -all"},
+    }
+    try:
+        _sweep(client, sightings, 1000, challenge_hosts=["*.acme"])
+        client.iter_zones.return_value = iter(RECORDS)
+        records, _ = _sweep(client, sightings, 5000, min_age=3600,
+                            challenge_hosts=["*.acme"])
+    finally:
+        RECORDS["example.net"] = {}
+
+    assert sorted(record.host for record in records) == \
+        ["_acme-challenge", "_acme-challenge.www", "www.example.com.acme"]
+    client.delete_records.assert_called_once_with(
+        [("example.com", "1"), ("example.com", "2"), ("example.net", "4")]
+    )
+
+
+def test_records_are_deleted_once_stale(client, sightings):
+    records, failures = _sweep(client, sightings, 1000, min_age=3600)
+
+    assert sorted((record.host, record.age) for record in records) == \
+        [("_acme-challenge", 0), ("_acme-challenge.www", 0)]
+    client.delete_records.assert_not_called()
+
+    client.iter_zones.return_value = iter(RECORDS)
+    records, failures = _sweep(client, sightings, 5000, min_age=3600)
+
+    assert {record.age for record in records} == {4000}
+    assert failures == {}
+    client.delete_records.assert_called_once_with(
+        [("example.com", "1"), ("example.com", "2")]
+    )
+
+
+def test_changed_records_are_seen_again(client, sightings):
+    _sweep(client, sightings, 1000)
+    RECORDS["example.com"]["1"] = {"host": "_acme-challenge",
+                                   "record": "token3"}
+    try:
+        records, _ = _sweep(client, sightings, 5000, zones=["example.com"],
+                            min_age=3600)
+    finally:
+        RECORDS["example.com"]["1"]["record"] = "token1"
+
+    assert sorted((record.content, record.age) for record in records) == \
+        [("token2", 4000), ("token3", 0)]
+    client.delete_records.assert_called_once_with([("example.com", "2")])
+
+
+def test_dry_run(client, sightings):
+    _sweep(client, sightings, 1000)
+    records, failures = _sweep(client, sightings, 5000, zones=RECORDS,
+                               min_age=0, dry_run=True)
+
+    assert len(records) == 2
+    client.delete_records.assert_not_called()
+
+
+def test_sighting_log_forgets_missing_records(sightings):
+    sightings.record(ACCOUNT, {"example.com": {"1": "token1"}}, now=1000)
+    sightings.record(ACCOUNT, {"example.com": {}}, now=2000)
+
+    assert sightings._read() == {}
+    assert sightings.record(
+        ACCOUNT, {"example.com": {"1": "token1"}}, now=3000
+    ) == {("example.com", "1"): 3000}
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))  # pragma: no cover
@@ -0,0 +1,105 @@
+"""Tests for certbot_dns_cloudns._internal.transport."""
+
+import subprocess
+import sys
+from unittest import mock
+
+import pytest
+import requests
+
+from certbot_dns_cloudns._internal import transport
+
+AUTH = {"auth-id": "1234", "auth-password": "secret"}
+
+
+def http_response(status_code=200, payload=None):
+    response = mock.MagicMock(status_code=status_code)
+    if payload is None:
+        response.json.side_effect = ValueError("No JSON")
+    else:
+        response.json.return_value = payload
+    return response
+
+
+@pytest.fixture
+def session_request():
+    with mock.patch("requests.Session.request") as request:
+        yield request
+
+
+def test_request_parameters(session_request):
+    session_request.return_value = http_response(payload={
+        "status": "Success", "data": {"id": 42}
+    })
+
+    response = transport.Transport("https://example.org/", 5).request(
+        transport.RECORD_CREATE, AUTH, domain_name="example.com",
+        host="_acme-challenge", record_type="TXT", record="token", ttl=60
+    )
+
+    assert response.error is None
+    assert response.json() == {
+        "status_code": 200, "success": True,
+        "payload": {"status": "Success", "data": {"id": 42}},
+    }
+    session_request.assert_called_once_with(
+        "POST", "https://example.org/dns/add-record.json",
+        params={"auth-id": "1234", "auth-password": "secret",
+                "domain-name": "example.com", "host": "_acme-challenge",
+                "record-type": "TXT", "record": "token", "ttl": 60},
+        timeout=5
+    )
+
+
+def test_failed_status(session_request):
+    session_request.return_value = http_response(payload={
+        "status": "Failed", "statusDescription": "Missing domain-name"
+    })
+
+    response = transport.Transport().request(
+        transport.ZONE_GET, AUTH, domain_name="example.com"
+    )
+
+    assert response.json()["error"] == "Missing domain-name"
+    assert response.json()["success"] is False
+
+
+@pytest.mark.parametrize("response, status_code, error", [
+    (http_response(429), 429, "HTTP response 429"),
+    (http_response(502, {"status": "Failed"}), 502, "HTTP response 502"),
+    (requests.ConnectTimeout(), 504, "API Connection timed out."),
+    (requests.ConnectionError(), 500, "API Network Connection error."),
+])
+def test_http_errors(session_request, response, status_code, error):
+    session_request.side_effect = [response]
+
+    response = transport.Transport().request(transport.RECORD_LIST, AUTH)
+
+    assert (response.status_code, response.error) == (status_code, error)
+
+
+def test_auth_params():
+    credentials = mock.MagicMock()
+    credentials.conf.side_effect = {"sub-auth-user": "user",
+                                    "auth-password": "secret"}.get
+
+    assert transport.auth_params(credentials) == {
+        "sub-auth-user": "user", "auth-password": "secret"
+    }
+
+
+@pytest.mark.parametrize("module, unused", [
+    ("transport", "requests"),
+    ("client", "cloudns_api"),
+])
+def test_import_is_lazy(module, unused):
+    code = (f"import sys; import certbot_dns_cloudns._internal.{module}; "
+            f"print({unused!r} in sys.modules)")
+
+    assert subprocess.check_output(
+        [sys.executable, "-c", code], text=True
+    ).strip() == "False"
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))  # pragma: no cover
@@ -0,0 +1,39 @@
+"""Tests for certbot_dns_cloudns._internal.zones."""
+
+import sys
+
+import pytest
+
+from certbot_dns_cloudns._internal.zones import ZoneIndex
+
+
+@pytest.fixture
+def index():
+    return ZoneIndex(["example.com", "sub.example.com", "example.org.",
+                      "Example.net"])
+
+
+def test_len(index):
+    assert len(index) == 4
+    index.add("example.com")
+    assert len(index) == 4
+
+
+@pytest.mark.parametrize("domain,zone", [
+    ("example.com", "example.com"),
+    ("_acme-challenge.example.com", "example.com"),
+    ("_acme-challenge.www.example.com", "example.com"),
+    ("_acme-challenge.sub.example.com", "sub.example.com"),
+    ("a.b.c.sub.example.com.", "sub.example.com"),
+    ("_acme-challenge.EXAMPLE.org", "example.org"),
+    ("_acme-challenge.example.net", "Example.net"),
+    ("_acme-challenge.example.info", None),
+    ("com", None),
+    ("notexample.com", None),
+])
+def test_find(index, domain, zone):
+    assert index.find(domain) == zone
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:] + [__file__]))  # pragma: no cover
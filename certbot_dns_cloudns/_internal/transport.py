@@ -0,0 +1,179 @@
+"""Minimal transport for the ClouDNS API endpoints used by the plugin."""
+import collections
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_ENDPOINT = 'https://api.cloudns.net'
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 45
+
+AUTH_PARAMS = ('auth-id', 'sub-auth-id', 'sub-auth-user', 'auth-password')
+
+ApiMethod = collections.namedtuple(
+    'ApiMethod', ('name', 'http_method', 'path', 'params')
+)
+ApiMethod.__doc__ = """
+An endpoint of the ClouDNS API.
+
+`params` maps the keyword arguments accepted for the endpoint to the names of
+the API parameters.
+"""
+
+ZONE_GET = ApiMethod('zone.get', 'GET', '/dns/get-zone-info.json', {
+    'domain_name': 'domain-name',
+})
+ZONE_LIST = ApiMethod('zone.list', 'GET', '/dns/list-zones.json', {
+    'page': 'page',
+    'rows_per_page': 'rows-per-page',
+})
+ZONE_PAGE_COUNT = ApiMethod(
+    'zone.get_page_count', 'GET', '/dns/get-pages-count.json', {
+        'rows_per_page': 'rows-per-page',
+    }
+)
+ZONE_IS_UPDATED = ApiMethod('zone.is_updated', 'GET', '/dns/is-updated.json', {
+    'domain_name': 'domain-name',
+})
+RECORD_CREATE = ApiMethod('record.create', 'POST', '/dns/add-record.json', {
+    'domain_name': 'domain-name',
+    'host': 'host',
+    'record_type': 'record-type',
+    'record': 'record',
+    'ttl': 'ttl',
+})
+RECORD_LIST = ApiMethod('record.list', 'GET', '/dns/records.json', {
+    'domain_name': 'domain-name',
+    'host': 'host',
+    'record_type': 'type',
+    'page': 'page',
+    'rows_per_page': 'rows-per-page',
+})
+RECORD_DELETE = ApiMethod('record.delete', 'POST', '/dns/delete-record.json', {
+    'domain_name': 'domain-name',
+    'record_id': 'record-id',
+})
+
+
+def auth_params(credentials):
+    """
+    Get the auth params to send with each request.
+
+    :param credentials: The credentials configuration of the plugin.
+    :returns: The auth params found in the configuration.
+    :rtype: dict
+    """
+    return {key: credentials.conf(key)
+            for key in AUTH_PARAMS
+            if credentials.conf(key) is not None}
+
+
+class ApiResponse:
+    """
+    The outcome of an API request.
+
+    `error` is set if the request failed, either because it could not be sent,
+    the API responded with an HTTP error or with a failed status.
+    """
+
+    def __init__(self, status_code, payload=None, error=None):
+        self.status_code = status_code
+        self.payload = payload
+        self.error = error
+
+    @classmethod
+    def from_http_response(cls, response):
+        try:
+            payload = response.json()
+        except ValueError:
+            return cls(response.status_code,
+                       error=f'HTTP response {response.status_code}')
+
+        error = None
+        if response.status_code != 200:
+            error = f'HTTP response {response.status_code}'
+        elif isinstance(payload, dict) and payload.get('status') == 'Failed':
+            error = payload.get('statusDescription', 'Failed')
+        return cls(response.status_code, payload, error)
+
+    def json(self):
+        content = {
+            'status_code': self.status_code,
+            'success': self.status_code == 200 and not self.error,
+            'payload': self.payload,
+        }
+        if self.error:
+            content['error'] = self.error
+        return content
+
+
+class Transport:
+    """
+    Sends requests to the ClouDNS API, keeping up to `pool_size` connections
+    alive.
+
+    The HTTP library is only loaded once the first request is sent.
+    """
+
+    def __init__(self, endpoint=DEFAULT_API_ENDPOINT, timeout=DEFAULT_TIMEOUT,
+                 pool_size=DEFAULT_POOL_SIZE):
+        self.endpoint = endpoint.rstrip('/')
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    def request(self, api_method, auth, **kwargs):
+        """
+        Send a request to an endpoint of the API.
+
+        :param .ApiMethod api_method: The endpoint.
+        :param dict auth: The auth params.
+        :param kwargs: The arguments of the endpoint, see `ApiMethod.params`.
+        :rtype: .ApiResponse
+        """
+        import requests
+
+        params = dict(auth)
+        params.update((api_method.params[key], value)
+                      for key, value in kwargs.items() if value is not None)
+
+        try:
+            response = self.get_session().request(
+                api_method.http_method, self.endpoint + api_method.path,
+                params=params, timeout=self.timeout
+            )
+        except requests.Timeout as e:
+            logger.debug('ClouDNS API request timed out', exc_info=e)
+            return ApiResponse(504, error='API Connection timed out.')
+        except requests.RequestException as e:
+            logger.debug('ClouDNS API request failed', exc_info=e)
+            return ApiResponse(500, error='API Network Connection error.')
+
+        return ApiResponse.from_http_response(response)
+
+    def get_session(self):
+        """
+        Get the HTTP session of this transport, creating it on first use.
+
+        :rtype: requests.Session
+        """
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                adapter = HTTPAdapter(pool_connections=1,
+                                      pool_maxsize=self.pool_size)
+                self._session = requests.Session()
+                self._session.mount('https://', adapter)
+                self._session.mount('http://', adapter)
+            return self._session
+
+    def close(self):
+        """Close all pooled connections."""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
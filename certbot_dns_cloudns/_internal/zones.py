@@ -0,0 +1,52 @@
+"""Local index of the zones of a ClouDNS account."""
+
+# Key marking a trie node as the apex of a zone (labels are never None)
+_ZONE = None
+
+
+class ZoneIndex:
+    """
+    Answers longest-suffix lookups of domain names against a set of zones.
+
+    Zones are stored in a trie keyed by their labels in reverse order, so a
+    lookup only needs to walk the labels of the domain name once.
+    """
+
+    def __init__(self, zones=()):
+        self._root = {}
+        self._size = 0
+        for zone in zones:
+            self.add(zone)
+
+    def __len__(self):
+        return self._size
+
+    def add(self, zone):
+        """Add a zone name to the index."""
+        node = self._root
+        for label in _reversed_labels(zone):
+            node = node.setdefault(label, {})
+        if _ZONE not in node:
+            self._size += 1
+        node[_ZONE] = zone.rstrip('.')
+
+    def find(self, domain):
+        """
+        Find the most specific zone containing a domain name.
+
+        :param str domain: The domain name.
+        :returns: The zone name, or `None` if no zone contains the domain.
+        :rtype: str
+        """
+        node = self._root
+        match = None
+        for label in _reversed_labels(domain):
+            node = node.get(label)
+            if node is None:
+                break
+            match = node.get(_ZONE, match)
+        return match
+
+
+def _reversed_labels(name):
+    return reversed(name.rstrip('.').lower().split('.'))